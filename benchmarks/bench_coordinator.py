@@ -0,0 +1,203 @@
+"""Benchmarks del ciclo del coordinador sobre instalaciones sintéticas."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import math
+
+import pytest
+
+from custom_components.spock_energy_control import SpockEnergyCoordinator
+from custom_components.spock_energy_control import push
+from custom_components.spock_energy_control.const import CONF_PUSH_ENABLED
+
+from .fake_spock import PATH_STATUS, FakeSpockConfig, FakeSpockServer
+from .harness import Baselines, assert_no_regression, async_measure
+
+SIZES = [100, 1000, 3000]
+
+
+async def _async_settle(coordinator: SpockEnergyCoordinator) -> None:
+    """Espera a la telemetría y a las actuaciones lanzadas por el ciclo."""
+    tasks = [
+        task
+        for running in coordinator._actuation_tasks.values()
+        for _service, _entities, task in running
+    ]
+    if coordinator._telemetry_task is not None:
+        tasks.append(coordinator._telemetry_task)
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _async_wait_for(condition: Callable[[], bool], timeout_s: float = 5) -> None:
+    """Espera a que se cumpla una condición que depende de otra tarea."""
+    async with asyncio.timeout(timeout_s):
+        while not condition():
+            await asyncio.sleep(0.005)
+
+
+def _status(round_index: int) -> dict[str, str]:
+    """Alterna la orden en cada ronda para forzar transiciones."""
+    if round_index % 2:
+        return {"green": "stop", "yellow": "start"}
+    return {"green": "start", "yellow": "stop"}
+
+
+@pytest.mark.parametrize("devices", SIZES)
+async def test_update_cycle(
+    devices: int,
+    make_coordinator,
+    spock_api: FakeSpockServer,
+    baselines: Baselines,
+    bench_rounds: int,
+) -> None:
+    """Ciclo completo: estado, telemetría y actuación."""
+    coordinator = await make_coordinator(devices)
+
+    async def _run(round_index: int) -> None:
+        spock_api.config.status = _status(round_index)
+        await coordinator._async_update_data()
+        await _async_settle(coordinator)
+
+    result = await async_measure(
+        f"update_cycle[{devices}]",
+        _run,
+        bench_rounds,
+        lambda: spock_api.total_requests,
+        spock_api.reset_counters,
+    )
+    # La primera ronda lo envía todo; después filtra la banda muerta
+    assert spock_api.telemetry_records <= devices
+    assert coordinator.telemetry_filter.sent >= devices
+    assert_no_regression(baselines, result)
+
+
+@pytest.mark.parametrize(
+    "fake_config",
+    [
+        FakeSpockConfig(latency_s=0.05),
+        FakeSpockConfig(latency_s=0.05, batch_telemetry=False),
+        FakeSpockConfig(error_every=3),
+        FakeSpockConfig(throttle_every=4),
+    ],
+    ids=["latency", "latency-no-batch", "errors", "throttled"],
+)
+async def test_update_cycle_degraded(
+    fake_config: FakeSpockConfig,
+    request: pytest.FixtureRequest,
+    make_coordinator,
+    spock_api: FakeSpockServer,
+    baselines: Baselines,
+    bench_rounds: int,
+) -> None:
+    """Ciclo con una API lenta, con errores o limitando peticiones."""
+    coordinator = await make_coordinator(1000)
+
+    async def _run(round_index: int) -> None:
+        spock_api.config.status = _status(round_index)
+        try:
+            await coordinator._async_update_data()
+        except Exception:  # noqa: BLE001 - los fallos forman parte del escenario
+            pass
+        await _async_settle(coordinator)
+
+    result = await async_measure(
+        f"update_cycle_{request.node.callspec.id}[1000]",
+        _run,
+        bench_rounds,
+        lambda: spock_api.total_requests,
+        spock_api.reset_counters,
+    )
+    assert_no_regression(baselines, result)
+
+
+@pytest.mark.parametrize("devices", SIZES)
+async def test_find_power_sensors(
+    devices: int, make_coordinator, baselines: Baselines, bench_rounds: int
+) -> None:
+    """Resolución de sensores de potencia (síncrona: todo es bloqueo del loop)."""
+    coordinator = await make_coordinator(devices)
+
+    async def _run(_round_index: int) -> None:
+        assert len(coordinator._find_power_sensors()) == devices
+
+    result = await async_measure(f"find_power_sensors[{devices}]", _run, bench_rounds)
+    assert_no_regression(baselines, result)
+
+
+@pytest.mark.parametrize("devices", SIZES)
+async def test_execute_sgready_actions(
+    devices: int, make_coordinator, baselines: Baselines, bench_rounds: int
+) -> None:
+    """Reparto de una transición de orden a todas las entidades."""
+    coordinator = await make_coordinator(devices)
+    round_start = {"calls": 0}
+
+    def _reset_calls() -> None:
+        round_start["calls"] = coordinator.actuation.service_calls
+
+    def _count_calls() -> int:
+        return coordinator.actuation.service_calls - round_start["calls"]
+
+    async def _run(round_index: int) -> None:
+        await coordinator._execute_sgready_actions(_status(round_index))
+        await _async_settle(coordinator)
+
+    result = await async_measure(
+        f"execute_sgready_actions[{devices}]",
+        _run,
+        bench_rounds,
+        _count_calls,
+        _reset_calls,
+    )
+    # Sin escalonado: cada grupo (la mitad de los dispositivos, todos en
+    # el mismo dominio) va en bloques de max_concurrent entidades
+    per_group = math.ceil(devices / 2 / coordinator.actuation.max_concurrent)
+    assert result.requests == 2 * per_group
+    assert_no_regression(baselines, result)
+
+
+async def test_push_status(
+    make_coordinator,
+    spock_api: FakeSpockServer,
+    baselines: Baselines,
+    bench_rounds: int,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Orden recibida por el canal push hasta aplicarse, sin sondeo. Después
+    se corta la conexión: se vuelve al sondeo y el cliente reconecta.
+    """
+    monkeypatch.setattr(push, "PUSH_BACKOFF_BASE_S", 0.01)
+    coordinator = await make_coordinator(100, **{CONF_PUSH_ENABLED: True})
+    assert coordinator.push_client is not None
+    await _async_wait_for(lambda: spock_api.push_clients == 1)
+    assert spock_api.push_subscriptions == [coordinator.plant_id]
+    await _async_wait_for(lambda: coordinator.push_client.connected)
+
+    async def _run(round_index: int) -> None:
+        status = _status(round_index)
+        await spock_api.async_push(status)
+        await _async_wait_for(
+            lambda: coordinator.data is not None
+            and all(coordinator.data.get(group) == state for group, state in status.items())
+        )
+        await _async_settle(coordinator)
+
+    result = await async_measure(
+        "push_status[100]",
+        _run,
+        bench_rounds,
+        lambda: spock_api.total_requests,
+        spock_api.reset_counters,
+    )
+    # Las órdenes llegan por push: ninguna petición HTTP de estado
+    assert spock_api.requests[PATH_STATUS] == 0
+
+    # Caída del canal: se pide el estado por HTTP y se reconecta
+    await spock_api.async_drop_push()
+    await _async_wait_for(lambda: spock_api.requests[PATH_STATUS] >= 1)
+    await _async_wait_for(lambda: spock_api.push_clients == 1)
+    await _async_wait_for(lambda: coordinator.push_client.connected)
+    assert coordinator.push_client.reconnects >= 1
+    assert_no_regression(baselines, result)
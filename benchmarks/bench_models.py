@@ -0,0 +1,99 @@
+"""Micro-benchmarks de los modelos y de la codificación de la telemetría."""
+from __future__ import annotations
+
+from datetime import timedelta
+import json
+
+import pytest
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.spock_energy_control.models import (
+    SpockStatus,
+    TelemetryRecord,
+    encode_telemetry_batch,
+)
+from custom_components.spock_energy_control.telemetry import AGGREGATE_FIELDS
+
+from .harness import Baselines, assert_no_regression, async_measure
+
+SIZES = [100, 1000, 3000]
+# Repeticiones por ronda para que las medidas superen el ruido
+STATUS_REPEAT = 10_000
+
+STATUS_PAYLOAD = {
+    "green": "start",
+    "yellow": "stop",
+    "version": 42,
+    "next_change_at": "2026-01-01T12:00:00+00:00",
+    "power_target_w": 3500,
+}
+
+
+def _records(count: int) -> list[TelemetryRecord]:
+    """Registros sintéticos; uno de cada dos con agregados."""
+    now = dt_util.utcnow()
+    aggregates = dict(zip(AGGREGATE_FIELDS, (60.0, 16.6667, 900.0, 1100.0, 1000.0, 1000.0, 12)))
+    return [
+        TelemetryRecord(
+            f"sensor.power_{index}",
+            f"Dispositivo {index}",
+            1000.0 + index,
+            now - timedelta(seconds=index),
+            aggregates if index % 2 else None,
+        )
+        for index in range(count)
+    ]
+
+
+def _encode_stdlib(plant_id: str, records: list[TelemetryRecord]) -> bytes:
+    """Referencia: diccionarios con marcas ISO y json de la biblioteca estándar."""
+    payload = {
+        "plant_id": plant_id,
+        "records": [
+            {**record.as_payload(), "timestamp": record.timestamp.isoformat()}
+            for record in records
+        ],
+    }
+    return json.dumps(payload).encode()
+
+
+async def test_parse_status(baselines: Baselines, bench_rounds: int) -> None:
+    """Validación estricta de la respuesta de estado."""
+
+    async def _run(_round_index: int) -> None:
+        for _ in range(STATUS_REPEAT):
+            SpockStatus.from_payload(STATUS_PAYLOAD).as_dict()
+
+    result = await async_measure("parse_status", _run, bench_rounds)
+    assert_no_regression(baselines, result)
+
+
+@pytest.mark.parametrize("count", SIZES)
+async def test_build_records(count: int, baselines: Baselines, bench_rounds: int) -> None:
+    """Coste de crear los registros de un ciclo."""
+
+    async def _run(_round_index: int) -> None:
+        _records(count)
+
+    result = await async_measure(f"build_records[{count}]", _run, bench_rounds)
+    assert_no_regression(baselines, result)
+
+
+@pytest.mark.parametrize("encoder", [encode_telemetry_batch, _encode_stdlib], ids=["fast", "stdlib"])
+@pytest.mark.parametrize("count", SIZES)
+async def test_encode_telemetry_batch(
+    count: int, encoder, baselines: Baselines, bench_rounds: int
+) -> None:
+    """Serialización de un lote: orjson de Home Assistant frente a json."""
+    records = _records(count)
+    assert json.loads(encoder("plant", records)) == json.loads(
+        _encode_stdlib("plant", records)
+    )
+
+    async def _run(_round_index: int) -> None:
+        encoder("plant", records)
+
+    name = "fast" if encoder is encode_telemetry_batch else "stdlib"
+    result = await async_measure(f"encode_telemetry_batch[{name}-{count}]", _run, bench_rounds)
+    assert_no_regression(baselines, result)
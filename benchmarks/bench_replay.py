@@ -0,0 +1,96 @@
+"""Reproducción del bucle de control a tiempo acelerado."""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import pytest
+from freezegun.api import FrozenDateTimeFactory
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.spock_energy_control.session_log import (
+    EVENT_POWER,
+    EVENT_STATE,
+    EVENT_STATUS,
+    EVENT_STATUS_ERROR,
+    SessionLog,
+    load_session_log,
+)
+
+from .replay import ReplaySimulator, async_setup_replay
+
+def synthetic_day_log(devices: int = 10, hours: int = 24) -> SessionLog:
+    """
+    Día sintético: green/yellow alternan cada hora, la API cae una hora a
+    media tarde y cada tres horas alguien apaga a mano un dispositivo.
+    Las lecturas de potencia llegan cada cinco minutos.
+    """
+    switches = [f"switch.replay_device_{index}" for index in range(devices)]
+    half = devices // 2
+    log = SessionLog(
+        datetime(2026, 1, 1, tzinfo=timezone.utc),
+        switches[:half],
+        switches[half:],
+        {f"sensor.replay_device_{index}_power": [switch] for index, switch in enumerate(switches)},
+    )
+    events: list[list[Any]] = []
+    outage = range(16 * 3600, 17 * 3600)
+
+    for hour in range(hours):
+        t = hour * 3600.0
+        if t in outage:
+            events.append([t, EVENT_STATUS_ERROR, "connect"])
+            continue
+        on = "start" if hour % 2 else "stop"
+        off = "stop" if hour % 2 else "start"
+        events.append([t, EVENT_STATUS, 200, {"green": on, "yellow": off}])
+        if hour % 3 == 2:
+            victim = switches[hour % devices]
+            events.append([t + 600, EVENT_STATE, victim, "off"])
+
+    for t in range(0, hours * 3600, 300):
+        for index in range(devices):
+            value = 100 + (index * 37 + t // 300 * 11) % 900
+            events.append([float(t) + 1, EVENT_POWER, f"sensor.replay_device_{index}_power", value])
+
+    log.events = sorted(events, key=lambda event: event[0])
+    return log
+
+
+async def test_replay_synthetic_day(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory, replay_reports: dict[str, str]
+) -> None:
+    """Un día de transiciones, una caída de la API y desviaciones."""
+    log = synthetic_day_log()
+    coordinator = await async_setup_replay(hass, log, freezer)
+    try:
+        report = await ReplaySimulator(hass, coordinator, log, freezer).async_run()
+    finally:
+        await coordinator.async_shutdown()
+
+    replay_reports["synthetic_day"] = report.summary()
+    assert not report.missed, report.missed
+    assert report.latencies_s
+    assert report.drift_injected > 0
+    assert report.total_switches >= len(report.latencies_s)
+
+
+async def test_replay_recorded_session(
+    hass: HomeAssistant,
+    freezer: FrozenDateTimeFactory,
+    replay_log_path: str | None,
+    replay_reports: dict[str, str],
+) -> None:
+    """Reproduce la sesión indicada con --replay-log."""
+    if replay_log_path is None:
+        pytest.skip("Sin --replay-log")
+    log = await hass.async_add_executor_job(load_session_log, replay_log_path)
+    coordinator = await async_setup_replay(hass, log, freezer)
+    try:
+        report = await ReplaySimulator(hass, coordinator, log, freezer).async_run()
+    finally:
+        await coordinator.async_shutdown()
+
+    replay_reports[Path(replay_log_path).name] = report.summary()
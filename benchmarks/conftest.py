@@ -0,0 +1,242 @@
+"""
+Benchmarks de Spock Energy Control.
+
+Necesitan `pytest-homeassistant-custom-component` (que registra el plugin
+de pytest con las fixtures `hass`). Se ejecutan desde la raíz del repo con:
+
+    pytest benchmarks
+
+Opciones:
+    --bench-rounds N        rondas por benchmark (mediana)
+    --bench-tolerance X     margen de memoria y fracción de bloqueo antes de
+                            marcar una regresión (0.5 = 50 %)
+    --bench-update          reescribe baselines.json con los resultados
+                            (sin esta opción el fichero no se modifica)
+    --replay-log RUTA       sesión grabada con el servicio `record` para
+                            reproducirla en bench_replay.py
+"""
+from __future__ import annotations
+
+from collections.abc import AsyncGenerator, Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from homeassistant.config_entries import current_entry
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+import custom_components.spock_energy_control as spock
+from custom_components.spock_energy_control import SpockEnergyCoordinator
+from custom_components.spock_energy_control import transport
+from custom_components.spock_energy_control.const import (
+    CONF_API_TOKEN,
+    CONF_GREEN_DEVICES,
+    CONF_PLANT_ID,
+    CONF_YELLOW_DEVICES,
+    DOMAIN,
+)
+
+from .fake_spock import (
+    PATH_PUSH,
+    PATH_STATUS,
+    PATH_TELEMETRY,
+    FakeSpockConfig,
+    FakeSpockServer,
+)
+from .harness import Baselines
+
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+_BASELINES_KEY = pytest.StashKey[Baselines]()
+_REPLAY_REPORTS_KEY = pytest.StashKey[dict[str, str]]()
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("spock-bench")
+    group.addoption("--bench-rounds", type=int, default=5)
+    group.addoption("--bench-tolerance", type=float, default=0.5)
+    group.addoption("--bench-update", action="store_true", default=False)
+    group.addoption("--replay-log", default=None)
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.stash[_BASELINES_KEY] = Baselines(
+        BASELINES_PATH,
+        config.getoption("--bench-tolerance"),
+        config.getoption("--bench-update"),
+    )
+    config.stash[_REPLAY_REPORTS_KEY] = {}
+
+
+def pytest_sessionfinish(session: pytest.Session) -> None:
+    # Las referencias solo se reescriben si se pide expresamente
+    baselines = session.config.stash[_BASELINES_KEY]
+    if baselines.update and baselines.results:
+        baselines.save()
+
+
+def pytest_terminal_summary(terminalreporter: Any, config: pytest.Config) -> None:
+    baselines = config.stash[_BASELINES_KEY]
+    if baselines.results:
+        terminalreporter.section("Spock benchmarks")
+        terminalreporter.write_line(baselines.report())
+    for name, summary in config.stash[_REPLAY_REPORTS_KEY].items():
+        terminalreporter.section(f"Spock replay: {name}")
+        terminalreporter.write_line(summary)
+
+
+@pytest.fixture
+def baselines(request: pytest.FixtureRequest) -> Baselines:
+    """Referencias de la sesión."""
+    return request.config.stash[_BASELINES_KEY]
+
+
+@pytest.fixture
+def replay_reports(request: pytest.FixtureRequest) -> dict[str, str]:
+    """Resúmenes de las reproducciones, por test, para el informe final."""
+    return request.config.stash[_REPLAY_REPORTS_KEY]
+
+
+@pytest.fixture
+def bench_rounds(request: pytest.FixtureRequest) -> int:
+    """Rondas por benchmark."""
+    return request.config.getoption("--bench-rounds")
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations: None) -> None:
+    """Permite cargar la integración desde custom_components."""
+
+
+@pytest.fixture
+def replay_log_path(request: pytest.FixtureRequest) -> str | None:
+    """Sesión grabada indicada con --replay-log."""
+    return request.config.getoption("--replay-log")
+
+
+@pytest.fixture
+def fake_config() -> FakeSpockConfig:
+    """Comportamiento del servidor; los tests lo parametrizan indirectamente."""
+    return FakeSpockConfig()
+
+
+@pytest.fixture
+async def spock_api(
+    fake_config: FakeSpockConfig, monkeypatch: pytest.MonkeyPatch, socket_enabled: None
+) -> AsyncGenerator[FakeSpockServer, None]:
+    """
+    Servidor emulado con el transporte apuntando a él. El plugin de
+    Home Assistant bloquea los sockets: aquí se permiten (solo localhost).
+    """
+    server = FakeSpockServer(fake_config)
+    await server.async_start()
+    monkeypatch.setitem(transport.ENDPOINT_URLS, transport.ENDPOINT_STATUS, server.url(PATH_STATUS))
+    monkeypatch.setitem(
+        transport.ENDPOINT_URLS, transport.ENDPOINT_TELEMETRY, server.url(PATH_TELEMETRY)
+    )
+    monkeypatch.setattr(spock, "HARDCODED_API_URL_PUSH", server.url(PATH_PUSH))
+    yield server
+    await server.async_stop()
+
+
+def build_installation(
+    hass: HomeAssistant, entry: MockConfigEntry, devices: int
+) -> list[str]:
+    """
+    Crea `devices` dispositivos sintéticos, cada uno con un interruptor y
+    un sensor de potencia. Devuelve los interruptores.
+    """
+    device_registry = dr.async_get(hass)
+    entity_registry = er.async_get(hass)
+    switches: list[str] = []
+
+    for index in range(devices):
+        device = device_registry.async_get_or_create(
+            config_entry_id=entry.entry_id,
+            identifiers={("bench", f"device_{index}")},
+            name=f"Bench device {index}",
+            manufacturer="Bench",
+            model="Relay",
+        )
+        switch = entity_registry.async_get_or_create(
+            "switch", "bench", f"switch_{index}", device_id=device.id
+        )
+        sensor = entity_registry.async_get_or_create(
+            "sensor",
+            "bench",
+            f"power_{index}",
+            device_id=device.id,
+            suggested_object_id=f"bench_device_{index}_power",
+            original_device_class="power",
+        )
+        hass.states.async_set(switch.entity_id, "off")
+        hass.states.async_set(
+            sensor.entity_id, str(100 + index % 900), {"unit_of_measurement": "W"}
+        )
+        switches.append(switch.entity_id)
+
+    return switches
+
+
+def _register_switch_services(hass: HomeAssistant) -> None:
+    """Servicios homeassistant.turn_on/turn_off que cambian el estado al instante."""
+
+    def _handler(new_state: str) -> Callable[[ServiceCall], None]:
+        async def _handle(call: ServiceCall) -> None:
+            entity_ids = call.data["entity_id"]
+            if isinstance(entity_ids, str):
+                entity_ids = [entity_ids]
+            for entity_id in entity_ids:
+                hass.states.async_set(entity_id, new_state)
+
+        return _handle
+
+    hass.services.async_register("homeassistant", "turn_on", _handler("on"))
+    hass.services.async_register("homeassistant", "turn_off", _handler("off"))
+
+
+@pytest.fixture
+async def make_coordinator(
+    hass: HomeAssistant, spock_api: FakeSpockServer
+) -> AsyncGenerator[Callable[..., Any], None]:
+    """
+    Crea un coordinador sobre una instalación sintética de N dispositivos.
+    Las opciones adicionales se añaden a su configuración.
+    """
+    created: list[SpockEnergyCoordinator] = []
+
+    async def _make(devices: int, **options: Any) -> SpockEnergyCoordinator:
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={CONF_API_TOKEN: "bench-token", CONF_PLANT_ID: f"bench-{devices}"},
+        )
+        entry.add_to_hass(hass)
+        switches = build_installation(hass, entry, devices)
+        half = len(switches) // 2
+        config = {
+            **entry.data,
+            CONF_GREEN_DEVICES: switches[:half],
+            CONF_YELLOW_DEVICES: switches[half:],
+            **options,
+        }
+        _register_switch_services(hass)
+
+        # DataUpdateCoordinator toma la entrada del contexto, como en el setup
+        current_entry.set(entry)
+        coordinator = SpockEnergyCoordinator(hass, config, entry)
+        hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {
+            "coordinator": coordinator,
+            "run_actions": True,
+        }
+        coordinator.async_start()
+        await hass.async_block_till_done()
+        created.append(coordinator)
+        return coordinator
+
+    yield _make
+
+    for coordinator in created:
+        await coordinator.async_shutdown()
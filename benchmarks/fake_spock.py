@@ -0,0 +1,150 @@
+"""Servidor local que emula la API de Spock para los benchmarks."""
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+PATH_STATUS = "/api/status"
+PATH_TELEMETRY = "/api/iot_telemetry"
+PATH_PUSH = "/api/ws"
+
+
+@dataclass
+class FakeSpockConfig:
+    """Comportamiento del servidor emulado."""
+
+    # Latencia añadida a cada respuesta (segundos)
+    latency_s: float = 0.0
+    # Cada N peticiones una responde 503 (0 = nunca)
+    error_every: int = 0
+    # Cada N peticiones una responde 429 con Retry-After (0 = nunca)
+    throttle_every: int = 0
+    retry_after_s: int = 1
+    # False = la telemetría por lotes responde 404
+    batch_telemetry: bool = True
+    status: dict[str, Any] = field(
+        default_factory=lambda: {"green": "start", "yellow": "stop"}
+    )
+
+
+class FakeSpockServer:
+    """
+    Emula `/api/status` y `/api/iot_telemetry` con latencia, errores y
+    throttling deterministas. Cuenta las peticiones y los registros
+    recibidos por ruta.
+
+    `/api/ws` emula el canal push: cada cliente se suscribe con su
+    plant_id y recibe las órdenes enviadas con async_push.
+    """
+
+    def __init__(self, config: FakeSpockConfig | None = None) -> None:
+        """Inicializa el servidor (se arranca con async_start)."""
+        self.config = config or FakeSpockConfig()
+        self.requests: Counter[str] = Counter()
+        self.telemetry_records = 0
+        self._seen = 0
+        self._server: TestServer | None = None
+        # Conexiones push abiertas y plantas suscritas (en orden de conexión)
+        self._push_sockets: set[web.WebSocketResponse] = set()
+        self.push_subscriptions: list[str | None] = []
+
+        app = web.Application()
+        app.router.add_post(PATH_STATUS, self._handle_status)
+        app.router.add_post(PATH_TELEMETRY, self._handle_telemetry)
+        app.router.add_get(PATH_PUSH, self._handle_push)
+        self._app = app
+
+    async def async_start(self) -> None:
+        """Arranca el servidor en un puerto libre."""
+        self._server = TestServer(self._app)
+        await self._server.start_server()
+
+    async def async_stop(self) -> None:
+        """Detiene el servidor."""
+        if self._server is not None:
+            await self._server.close()
+
+    def url(self, path: str) -> str:
+        """URL absoluta de una ruta del servidor."""
+        assert self._server is not None
+        return str(self._server.make_url(path))
+
+    def reset_counters(self) -> None:
+        """Pone a cero los contadores."""
+        self.requests.clear()
+        self.telemetry_records = 0
+
+    @property
+    def total_requests(self) -> int:
+        """Peticiones recibidas desde el último reset."""
+        return sum(self.requests.values())
+
+    @property
+    def push_clients(self) -> int:
+        """Clientes push conectados y suscritos."""
+        return len(self._push_sockets)
+
+    async def async_push(self, status: dict[str, Any]) -> None:
+        """Envía una orden a todos los clientes push."""
+        for ws in list(self._push_sockets):
+            await ws.send_json(status)
+
+    async def async_drop_push(self) -> None:
+        """Cierra las conexiones push, como una caída del servidor."""
+        for ws in list(self._push_sockets):
+            await ws.close()
+
+    async def _fault(self) -> web.Response | None:
+        """Aplica latencia y, si toca, devuelve un error simulado."""
+        self._seen += 1
+        if self.config.latency_s:
+            await asyncio.sleep(self.config.latency_s)
+        if self.config.throttle_every and self._seen % self.config.throttle_every == 0:
+            return web.Response(
+                status=429, headers={"Retry-After": str(self.config.retry_after_s)}
+            )
+        if self.config.error_every and self._seen % self.config.error_every == 0:
+            return web.Response(status=503, text="Servicio no disponible")
+        return None
+
+    async def _handle_status(self, request: web.Request) -> web.Response:
+        self.requests[PATH_STATUS] += 1
+        payload = await request.json()
+        if (fault := await self._fault()) is not None:
+            return fault
+        if "plant_ids" in payload:
+            return web.json_response(
+                {"plants": {plant_id: self.config.status for plant_id in payload["plant_ids"]}}
+            )
+        return web.json_response(self.config.status)
+
+    async def _handle_telemetry(self, request: web.Request) -> web.Response:
+        self.requests[PATH_TELEMETRY] += 1
+        payload = await request.json()
+        if (fault := await self._fault()) is not None:
+            return fault
+        if "records" in payload:
+            if not self.config.batch_telemetry:
+                return web.Response(status=404)
+            self.telemetry_records += len(payload["records"])
+        else:
+            self.telemetry_records += 1
+        return web.json_response({"ok": True})
+
+    async def _handle_push(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        subscription = await ws.receive_json()
+        self.push_subscriptions.append(subscription.get("plant_id"))
+        self._push_sockets.add(ws)
+        try:
+            async for _msg in ws:
+                pass
+        finally:
+            self._push_sockets.discard(ws)
+        return ws
@@ -0,0 +1,171 @@
+"""Medición de latencia, asignaciones y bloqueo del event loop."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+import json
+from pathlib import Path
+import statistics
+import time
+import tracemalloc
+from typing import Any
+
+MONITOR_TICK_S = 0.001
+
+
+@dataclass
+class BenchResult:
+    """
+    Resultado de un benchmark (mediana de las rondas). `block_ratio` es
+    la fracción del tiempo de la ronda que ocupa el mayor bloqueo del loop.
+    """
+
+    name: str
+    wall_s: float
+    max_loop_block_s: float
+    alloc_peak_kib: float
+    requests: float
+    block_ratio: float
+
+    def as_dict(self) -> dict[str, Any]:
+        """Representación serializable (sin el nombre)."""
+        data = asdict(self)
+        data.pop("name")
+        return data
+
+
+async def _async_monitor_loop(stop: asyncio.Event, gaps: list[float]) -> None:
+    """Mide el mayor retraso de un tick periódico: tiempo con el loop bloqueado."""
+    while not stop.is_set():
+        started = time.monotonic()
+        await asyncio.sleep(MONITOR_TICK_S)
+        gaps.append(max(0.0, time.monotonic() - started - MONITOR_TICK_S))
+
+
+async def async_measure(
+    name: str,
+    run: Callable[[int], Awaitable[Any]],
+    rounds: int,
+    count_requests: Callable[[], int] = lambda: 0,
+    reset_requests: Callable[[], None] = lambda: None,
+) -> BenchResult:
+    """
+    Ejecuta `run(ronda)` varias veces y devuelve la mediana de cada medida.
+
+    Las peticiones por ronda se leen con `count_requests` tras llamar a
+    `reset_requests` antes de cada ronda.
+    """
+    walls: list[float] = []
+    blocks: list[float] = []
+    ratios: list[float] = []
+    allocs: list[float] = []
+    requests: list[int] = []
+
+    for round_index in range(rounds):
+        reset_requests()
+        gaps: list[float] = []
+        stop = asyncio.Event()
+        monitor = asyncio.ensure_future(_async_monitor_loop(stop, gaps))
+        await asyncio.sleep(0)
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            await run(round_index)
+        finally:
+            walls.append(time.perf_counter() - started)
+            allocs.append(tracemalloc.get_traced_memory()[1] / 1024)
+            tracemalloc.stop()
+            stop.set()
+            await monitor
+
+        blocks.append(max(gaps, default=0.0))
+        ratios.append(min(1.0, blocks[-1] / walls[-1]) if walls[-1] else 0.0)
+        requests.append(count_requests())
+
+    return BenchResult(
+        name,
+        round(statistics.median(walls), 6),
+        round(statistics.median(blocks), 6),
+        round(statistics.median(allocs), 1),
+        statistics.median(requests),
+        round(statistics.median(ratios), 3),
+    )
+
+
+class Baselines:
+    """
+    Referencias guardadas en JSON. Solo se comparan medidas que no dependen
+    de la velocidad de la máquina: las peticiones por ciclo no pueden
+    aumentar y las asignaciones y la fracción de bloqueo del loop no pueden
+    superar la referencia en más de `tolerance` (0.5 = un 50 %). Los
+    tiempos absolutos se guardan y se informan, pero no se comparan.
+    """
+
+    def __init__(self, path: Path, tolerance: float, update: bool) -> None:
+        """Carga las referencias existentes."""
+        self.path = path
+        self.tolerance = tolerance
+        self.update = update
+        self.data: dict[str, dict[str, Any]] = (
+            json.loads(path.read_text()) if path.exists() else {}
+        )
+        self.results: list[BenchResult] = []
+        # Benchmarks sin referencia en esta sesión
+        self.missing: list[str] = []
+
+    def check(self, result: BenchResult) -> list[str]:
+        """
+        Compara un resultado con su referencia. Devuelve las regresiones.
+        Con `update` el resultado pasa a ser la nueva referencia.
+        """
+        self.results.append(result)
+        if self.update:
+            self.data[result.name] = result.as_dict()
+            return []
+        baseline = self.data.get(result.name)
+        if baseline is None:
+            self.missing.append(result.name)
+            return []
+
+        regressions: list[str] = []
+        for metric in ("alloc_peak_kib", "block_ratio"):
+            limit = baseline[metric] * (1 + self.tolerance)
+            value = getattr(result, metric)
+            # Con bloqueos por debajo de 1 ms el ruido domina: no se compara
+            if metric == "block_ratio" and result.max_loop_block_s < 0.001:
+                continue
+            if value > limit:
+                regressions.append(f"{metric}: {value} > {baseline[metric]} (+{self.tolerance:.0%})")
+        if result.requests > baseline["requests"]:
+            regressions.append(f"requests: {result.requests} > {baseline['requests']}")
+        return regressions
+
+    def save(self) -> None:
+        """Escribe las referencias."""
+        self.path.write_text(json.dumps(self.data, indent=2, sort_keys=True) + "\n")
+
+    def report(self) -> str:
+        """Tabla de resultados de la sesión."""
+        lines = [
+            f"{'benchmark':<48} {'wall ms':>9} {'block ms':>9} {'block %':>8} "
+            f"{'alloc KiB':>10} {'req':>5}"
+        ]
+        for result in self.results:
+            lines.append(
+                f"{result.name:<48} {result.wall_s * 1000:>9.2f} "
+                f"{result.max_loop_block_s * 1000:>9.2f} {result.block_ratio:>8.1%} "
+                f"{result.alloc_peak_kib:>10.1f} {result.requests:>5g}"
+            )
+        if self.missing:
+            lines.append(
+                f"Sin referencia (se guardan con --bench-update): {', '.join(self.missing)}"
+            )
+        return "\n".join(lines)
+
+
+def assert_no_regression(baselines: Baselines, result: BenchResult) -> None:
+    """Falla si el resultado empeora su referencia."""
+    regressions = baselines.check(result)
+    assert not regressions, f"{result.name}: " + "; ".join(regressions)
@@ -0,0 +1,407 @@
+"""
+Reproducción de sesiones grabadas a tiempo simulado.
+
+Monta la instalación de la cabecera de la sesión en un Home Assistant de
+pruebas, sustituye la sesión HTTP del transporte por una que responde lo
+grabado y avanza un reloj simulado (freezer + async_fire_time_changed)
+evento a evento. Los dispositivos son simulados: cambian de estado
+`actuation_delay_s` segundos simulados después de cada llamada.
+
+El informe cuenta las conmutaciones, la latencia entre cada orden de la
+API y el cambio de estado de cada entidad, y las transiciones perdidas
+(entidades que no llegan al estado pedido antes de la siguiente orden).
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import timedelta
+import statistics
+from typing import Any
+
+import aiohttp
+from freezegun import api as freezegun_api
+from freezegun.api import FrozenDateTimeFactory
+from multidict import CIMultiDict
+
+from homeassistant.config_entries import current_entry
+from homeassistant.core import Event, HomeAssistant, ServiceCall, callback, split_entity_id
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.event import async_call_later, async_track_state_change_event
+from pytest_homeassistant_custom_component.common import MockConfigEntry, async_fire_time_changed
+
+from custom_components.spock_energy_control import SpockEnergyCoordinator
+from custom_components.spock_energy_control.const import (
+    CONF_API_TOKEN,
+    CONF_GREEN_DEVICES,
+    CONF_PLANT_ID,
+    CONF_YELLOW_DEVICES,
+    DOMAIN,
+)
+from custom_components.spock_energy_control.models import GROUPS
+from custom_components.spock_energy_control.ratelimit import SpockRateLimiter, TokenBucket
+from custom_components.spock_energy_control.session_log import (
+    EVENT_CALL,
+    EVENT_POWER,
+    EVENT_PUSH,
+    EVENT_STATE,
+    EVENT_STATUS,
+    EVENT_STATUS_ERROR,
+    SessionLog,
+)
+from custom_components.spock_energy_control.transport import ENDPOINT_STATUS, ENDPOINT_URLS
+
+# Vueltas al event loop tras cada paso del reloj para que terminen los
+# ciclos y las actuaciones disparadas en él. No se usa
+# async_block_till_done: las esperas de confirmación de la actuación
+# solo terminan cuando el reloj simulado sigue avanzando.
+SETTLE_YIELDS = 50
+# Un cambio de estado grabado sin llamada previa en esta ventana es una
+# desviación externa (alguien tocó el dispositivo)
+DRIFT_WINDOW_S = 30.0
+# Segundos simulados que se siguen tras el último evento
+TAIL_S = 120.0
+
+DESIRED_STATE = {"start": "on", "stop": "off"}
+
+# Errores de red grabados -> excepción equivalente de aiohttp
+_TRANSPORT_ERRORS: dict[str, type[Exception]] = {
+    "timeout": asyncio.TimeoutError,
+    "connect": aiohttp.ClientConnectionError,
+    "protocol": aiohttp.ClientError,
+}
+
+
+class _ScriptedResponse:
+    """Respuesta HTTP ya resuelta."""
+
+    def __init__(self, status: int, body: Any) -> None:
+        self.status = status
+        self.headers: CIMultiDict[str] = CIMultiDict()
+        self._body = body
+
+    async def __aenter__(self) -> _ScriptedResponse:
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        return None
+
+    async def json(self, **_kwargs: Any) -> Any:
+        return self._body
+
+    async def text(self) -> str:
+        return ""
+
+
+class ScriptedSession:
+    """
+    Sustituye a la sesión aiohttp del transporte. El estado responde lo
+    último grabado (o eleva el error de red grabado); la telemetría
+    siempre se acepta.
+    """
+
+    closed = False
+
+    def __init__(self) -> None:
+        self.status = 200
+        self.body: Any = {"green": "stop", "yellow": "stop"}
+        self.error: str | None = None
+        self.requests: Counter[str] = Counter()
+
+    def post(self, url: str, **_kwargs: Any) -> _ScriptedResponse:
+        if url != ENDPOINT_URLS[ENDPOINT_STATUS]:
+            self.requests["telemetry"] += 1
+            return _ScriptedResponse(200, {"ok": True})
+        self.requests["status"] += 1
+        if self.error is not None:
+            raise _TRANSPORT_ERRORS[self.error]()
+        return _ScriptedResponse(self.status, self.body if self.status == 200 else None)
+
+    def detach(self) -> None:
+        return None
+
+
+@dataclass
+class ReplayReport:
+    """Resultado de una reproducción."""
+
+    simulated_s: float = 0.0
+    wall_s: float = 0.0
+    # Cambios on/off de cada entidad controlada (incluye las desviaciones inyectadas)
+    switching: Counter[str] = field(default_factory=Counter)
+    service_calls: int = 0
+    recorded_calls: int = 0
+    drift_injected: int = 0
+    latencies_s: list[float] = field(default_factory=list)
+    # (t, entidad, estado pedido) de las transiciones que no se completaron
+    missed: list[tuple[float, str, str]] = field(default_factory=list)
+
+    @property
+    def speedup(self) -> float:
+        """Veces más rápido que el tiempo real."""
+        return self.simulated_s / self.wall_s if self.wall_s else 0.0
+
+    @property
+    def total_switches(self) -> int:
+        """Conmutaciones de todas las entidades."""
+        return sum(self.switching.values())
+
+    def latency(self, q: float) -> float | None:
+        """Percentil `q` (0-100) de la latencia orden-actuación, en segundos."""
+        if not self.latencies_s:
+            return None
+        if len(self.latencies_s) == 1:
+            return self.latencies_s[0]
+        return statistics.quantiles(self.latencies_s, n=100, method="inclusive")[
+            min(98, max(0, int(q) - 1))
+        ]
+
+    def summary(self) -> str:
+        """Resumen en texto."""
+        p50, p90 = self.latency(50), self.latency(90)
+        return "\n".join(
+            [
+                f"simulado {self.simulated_s / 3600:.1f} h en {self.wall_s:.1f} s "
+                f"(x{self.speedup:.0f})",
+                f"conmutaciones {self.total_switches}, llamadas {self.service_calls} "
+                f"(grabadas {self.recorded_calls}), desviaciones inyectadas {self.drift_injected}",
+                f"latencia orden-actuación p50 {p50} s, p90 {p90} s, "
+                f"máx {max(self.latencies_s, default=None)} s",
+                f"transiciones perdidas {len(self.missed)}",
+            ]
+        )
+
+
+async def async_setup_replay(
+    hass: HomeAssistant, log: SessionLog, freezer: FrozenDateTimeFactory
+) -> SpockEnergyCoordinator:
+    """
+    Lleva el reloj al inicio de la sesión y crea la instalación y un
+    coordinador sobre ella.
+    """
+    freezer.move_to(log.started)
+    entry = MockConfigEntry(
+        domain=DOMAIN, data={CONF_API_TOKEN: "replay-token", CONF_PLANT_ID: "replay"}
+    )
+    entry.add_to_hass(hass)
+    device_registry = dr.async_get(hass)
+    entity_registry = er.async_get(hass)
+
+    devices: dict[str, str] = {}
+    for entity_id in log.green + log.yellow:
+        device = device_registry.async_get_or_create(
+            config_entry_id=entry.entry_id,
+            identifiers={("replay", entity_id)},
+            name=entity_id,
+        )
+        domain, object_id = split_entity_id(entity_id)
+        entity_registry.async_get_or_create(
+            domain, "replay", entity_id, suggested_object_id=object_id, device_id=device.id
+        )
+        devices[entity_id] = device.id
+        hass.states.async_set(entity_id, "off")
+
+    for sensor_id, controlled in log.power_sensors.items():
+        device_id = next((devices[e] for e in controlled if e in devices), None)
+        if device_id is None:
+            continue
+        domain, object_id = split_entity_id(sensor_id)
+        entity_registry.async_get_or_create(
+            domain,
+            "replay",
+            sensor_id,
+            suggested_object_id=object_id,
+            device_id=device_id,
+            original_device_class="power",
+        )
+        hass.states.async_set(sensor_id, "0", {"unit_of_measurement": "W"})
+
+    config = {**entry.data, CONF_GREEN_DEVICES: log.green, CONF_YELLOW_DEVICES: log.yellow}
+    # DataUpdateCoordinator toma la entrada del contexto, como en el setup
+    current_entry.set(entry)
+    coordinator = SpockEnergyCoordinator(hass, config, entry)
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {
+        "coordinator": coordinator,
+        "run_actions": True,
+    }
+    coordinator.async_start()
+    return coordinator
+
+
+class ReplaySimulator:
+    """Reproduce una sesión sobre un coordinador a tiempo simulado."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinator: SpockEnergyCoordinator,
+        log: SessionLog,
+        freezer: FrozenDateTimeFactory,
+        step_s: float = 1.0,
+        actuation_delay_s: float = 1.0,
+    ) -> None:
+        """Prepara la reproducción."""
+        self.hass = hass
+        self.coordinator = coordinator
+        self.log = log
+        self.freezer = freezer
+        self.step_s = step_s
+        self.actuation_delay_s = actuation_delay_s
+        self.session = ScriptedSession()
+        self.report = ReplayReport()
+        self._now_s = 0.0
+        self._group_of = {
+            entity_id: group
+            for group in GROUPS
+            for entity_id in getattr(log, group)
+        }
+        self._commands: dict[str, str] = {}
+        # entidad -> (t de la orden, estado pedido)
+        self._pending: dict[str, tuple[float, str]] = {}
+        self._last_call: dict[str, float] = {}
+
+    async def async_run(self) -> ReplayReport:
+        """Reproduce todos los eventos y devuelve el informe."""
+        transport = self.coordinator.hub.transport
+        transport._session = self.session
+        # El limitador espera en tiempo real: fuera de la simulación
+        transport.limiter = SpockRateLimiter(
+            {endpoint: TokenBucket(1e9, 1e9, 1e9) for endpoint in transport.limiter.buckets},
+            ENDPOINT_STATUS,
+        )
+        self._register_devices()
+        unsub_states = async_track_state_change_event(
+            self.hass, list(self._group_of), self._async_state_changed
+        )
+        # Sin oyentes el coordinador no programa el sondeo
+        unsub_listener = self.coordinator.async_add_listener(lambda: None)
+
+        # Tiempo real: el reloj congelado también afecta a perf_counter. Se
+        # lee a través del módulo porque freezegun sustituye también las
+        # copias importadas en otros módulos
+        started = freezegun_api.real_perf_counter()
+        try:
+            for event in self.log.events:
+                await self._async_advance_to(event[0])
+                self._apply(event)
+            await self._async_advance_to(self.log.duration_s + TAIL_S)
+        finally:
+            unsub_listener()
+            unsub_states()
+
+        self.report.wall_s = freezegun_api.real_perf_counter() - started
+        self.report.simulated_s = self._now_s
+        for entity_id, (t_command, desired) in self._pending.items():
+            self.report.missed.append((t_command, entity_id, desired))
+        return self.report
+
+    async def _async_advance_to(self, t: float) -> None:
+        """Avanza el reloj simulado hasta `t` en pasos de `step_s`."""
+        while self._now_s < t:
+            step = min(self.step_s, t - self._now_s)
+            self._now_s += step
+            self.freezer.tick(timedelta(seconds=step))
+            async_fire_time_changed(self.hass)
+            for _ in range(SETTLE_YIELDS):
+                await asyncio.sleep(0)
+
+    def _apply(self, event: list[Any]) -> None:
+        """Aplica un evento grabado."""
+        kind = event[1]
+        if kind == EVENT_STATUS:
+            status, body = event[2], event[3]
+            if status == 304:
+                return
+            self.session.error = None
+            self.session.status = status
+            if status == 200:
+                self.session.body = body
+                self._async_command(body)
+        elif kind == EVENT_STATUS_ERROR:
+            # circuit_open y rate_limited son decisiones locales, no del servidor
+            if event[2] in _TRANSPORT_ERRORS:
+                self.session.error = event[2]
+        elif kind == EVENT_PUSH:
+            self._async_command(event[2])
+            self.hass.async_create_task(
+                self.coordinator._async_handle_push_status(event[2])
+            )
+        elif kind == EVENT_POWER:
+            self.hass.states.async_set(event[2], str(event[3]), {"unit_of_measurement": "W"})
+        elif kind == EVENT_STATE:
+            self._inject_drift(event[2], event[3])
+        elif kind == EVENT_CALL:
+            self.report.recorded_calls += 1
+            for entity_id in event[4]:
+                self._last_call[entity_id] = event[0]
+
+    @callback
+    def _async_command(self, body: dict[str, Any]) -> None:
+        """Nueva orden de la API: abre una transición por cada entidad afectada."""
+        for group in GROUPS:
+            api_state = body.get(group)
+            if api_state not in DESIRED_STATE or self._commands.get(group) == api_state:
+                continue
+            self._commands[group] = api_state
+            desired = DESIRED_STATE[api_state]
+            for entity_id in getattr(self.log, group):
+                previous = self._pending.pop(entity_id, None)
+                if previous is not None and previous[1] != desired:
+                    self.report.missed.append((previous[0], entity_id, previous[1]))
+                state = self.hass.states.get(entity_id)
+                if state is None or state.state != desired:
+                    self._pending[entity_id] = (self._now_s, desired)
+
+    def _inject_drift(self, entity_id: str, state: str) -> None:
+        """Reproduce un cambio de estado grabado que no vino de la integración."""
+        last_call = self._last_call.get(entity_id)
+        if last_call is not None and self._now_s - last_call <= DRIFT_WINDOW_S:
+            return
+        current = self.hass.states.get(entity_id)
+        if current is not None and current.state != state:
+            self.report.drift_injected += 1
+            self.hass.states.async_set(entity_id, state)
+
+    def _register_devices(self) -> None:
+        """Servicios turn_on/turn_off que cambian el estado tras el retardo."""
+
+        def _handler(new_state: str):
+            async def _handle(call: ServiceCall) -> None:
+                entity_ids = call.data["entity_id"]
+                if isinstance(entity_ids, str):
+                    entity_ids = [entity_ids]
+                self.report.service_calls += 1
+
+                @callback
+                def _actuate(_now: Any = None) -> None:
+                    for entity_id in entity_ids:
+                        self.hass.states.async_set(entity_id, new_state)
+
+                if self.actuation_delay_s:
+                    async_call_later(self.hass, self.actuation_delay_s, _actuate)
+                else:
+                    _actuate()
+
+            return _handle
+
+        domains = {split_entity_id(entity_id)[0] for entity_id in self._group_of}
+        for domain in domains | {"homeassistant"}:
+            self.hass.services.async_register(domain, "turn_on", _handler("on"))
+            self.hass.services.async_register(domain, "turn_off", _handler("off"))
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Cuenta conmutaciones y cierra las transiciones completadas."""
+        entity_id = event.data["entity_id"]
+        old_state, new_state = event.data.get("old_state"), event.data.get("new_state")
+        if new_state is None:
+            return
+        if old_state is not None and old_state.state != new_state.state:
+            self.report.switching[entity_id] += 1
+
+        pending = self._pending.get(entity_id)
+        if pending is not None and new_state.state == pending[1]:
+            del self._pending[entity_id]
+            self.report.latencies_s.append(round(self._now_s - pending[0], 3))
@@ -3,15 +3,25 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from datetime import timedelta
+import time
+from datetime import datetime, timedelta
 from typing import Any
 
-from homeassistant.core import HomeAssistant, State
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, State, callback
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers import entity_registry as er 
 from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import restore_state
+from homeassistant.helpers.json import json_bytes
+from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_point_in_utc_time,
+    async_track_state_change_event,
+    async_track_time_interval,
+)
+from homeassistant.util import dt as dt_util
 
 from .const import (
     DOMAIN,
@@ -19,52 +29,180 @@ from .const import (
     CONF_PLANT_ID,
     CONF_GREEN_DEVICES,
     CONF_YELLOW_DEVICES,
+    CONF_TELEMETRY_BATCH,
+    CONF_TELEMETRY_CONCURRENCY,
+    CONF_TELEMETRY_MODE,
+    CONF_TELEMETRY_FLUSH_INTERVAL,
+    CONF_TELEMETRY_QUEUE_SIZE,
+    CONF_PUSH_ENABLED,
+    CONF_ACTUATION_STAGGER,
+    CONF_ACTUATION_MAX_CONCURRENT,
+    CONF_RECONCILE_GRACE,
+    CONF_MIN_SWITCH_INTERVAL,
+    CONF_FAST_START,
+    CONF_FALLBACK_GREEN,
+    CONF_FALLBACK_YELLOW,
+    CONF_SURPLUS_SENSOR,
+    CONF_SURPLUS_THRESHOLD,
+    CONF_DEADBAND_ABSOLUTE,
+    CONF_DEADBAND_RELATIVE,
+    CONF_TELEMETRY_HEARTBEAT,
+    CONF_DISPATCH_ENABLED,
+    CONF_DISPATCH_TARGET_SENSOR,
     DEFAULT_SCAN_INTERVAL_S, 
+    MIN_SCAN_INTERVAL_S,
+    MAX_SCAN_INTERVAL_S,
+    DEFAULT_PUSH_ENABLED,
+    DEFAULT_ACTUATION_STAGGER_S,
+    DEFAULT_ACTUATION_MAX_CONCURRENT,
+    DEFAULT_RECONCILE_GRACE_S,
+    DEFAULT_MIN_SWITCH_INTERVAL_S,
+    DEFAULT_FAST_START,
+    DEFAULT_FALLBACK_POLICY,
+    DEFAULT_SURPLUS_THRESHOLD_W,
+    DEFAULT_DEADBAND_ABSOLUTE_W,
+    DEFAULT_DEADBAND_RELATIVE_PCT,
+    DEFAULT_TELEMETRY_HEARTBEAT_S,
+    DEFAULT_DISPATCH_ENABLED,
+    DISPATCH_DEFAULT_DRAW_W,
+    DISPATCH_MIN_ON_W,
+    DISPATCH_RESOLVE_DELAY_S,
+    DISPATCH_TOLERANCE_W,
+    STATUS_POWER_TARGET,
+    FALLBACK_SAFE_OFF,
+    FALLBACK_SURPLUS,
+    ACTUATION_CONFIRM_TIMEOUT_S,
+    METRICS_CYCLE_HISTORY,
+    ACTUATION_MAX_RETRIES,
+    PUSH_FALLBACK_SCAN_INTERVAL_S,
+    SCHEDULE_SCAN_INTERVAL_S,
+    DEFAULT_TELEMETRY_BATCH,
+    DEFAULT_TELEMETRY_CONCURRENCY,
+    DEFAULT_TELEMETRY_MODE,
+    DEFAULT_TELEMETRY_FLUSH_INTERVAL_S,
+    DEFAULT_TELEMETRY_QUEUE_SIZE,
+    TELEMETRY_BUFFER_MAX_SAMPLES,
+    TELEMETRY_REPLAY_BATCH_SIZE,
+    TELEMETRY_REPLAY_INTERVAL_S,
+    TELEMETRY_MODE_SNAPSHOT,
+    TELEMETRY_MODE_STREAM,
+    BATCH_UNSUPPORTED_STATUS,
     PLATFORMS,
     HARDCODED_API_URL,
-    HARDCODED_API_URL_TELEMETRIA,
+    HARDCODED_API_URL_PUSH,
+)
+from .actuation import ActuationPipeline
+from .breaker import STATE_CLOSED, CircuitBreaker
+from .dispatcher import LoadDispatcher
+from .hub import async_get_hub
+from .metrics import CYCLE_ERROR, CYCLE_FALLBACK, CYCLE_OK, CoordinatorMetrics
+from .models import SpockStatus, StatusFormatError, TelemetryRecord, encode_telemetry_batch
+from .offline_queue import TelemetryQueue
+from .power_index import PowerSensorIndex
+from .profiler import async_get_profiler
+from .push import SpockPushClient
+from .reconciler import DesiredStateReconciler
+from .schedule import SgReadySchedule
+from .scheduler import AdaptivePollScheduler, parse_retry_after
+from .services import async_setup_services, async_unload_services
+from .session_log import SessionRecorder
+from .telemetry import DeadbandFilter, PowerAggregator, TelemetryBuffer
+from .transport import (
+    ENDPOINT_STATUS,
+    ENDPOINT_TELEMETRY,
+    ERROR_CIRCUIT_OPEN,
+    ERROR_RATE_LIMITED,
+    SpockResponse,
+    SpockTransportError,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
 
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Recarga la entrada de configuración."""
+    """
+    Aplica los cambios de opciones al coordinador en marcha. Solo se
+    recarga la entrada si cambian el token o la planta.
+    """
+    entry_data = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if entry_data is not None:
+        coordinator: SpockEnergyCoordinator = entry_data["coordinator"]
+        if await coordinator.async_apply_config({**entry.data, **entry.options}):
+            return
     await hass.config_entries.async_reload(entry.entry_id)
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Configura Spock Energy Control."""
+    started = time.monotonic()
     cfg = {**entry.data, **entry.options}
     
     coordinator = SpockEnergyCoordinator(hass, cfg, entry)
+    await coordinator.telemetry_queue.async_load()
+    await coordinator.schedule.async_load()
 
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {
         "coordinator": coordinator,
-        "run_actions": True,
+        # El primer fetch puede actuar antes de que el interruptor se restaure
+        "run_actions": _restored_run_actions(hass, entry),
     }
 
     entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    async_setup_services(hass)
 
-    await asyncio.sleep(2)
-    await coordinator.async_config_entry_first_refresh()
-    _LOGGER.info("Spock Energy Control: primer fetch realizado.")
+    coordinator.async_start()
+
+    if cfg.get(CONF_FAST_START, DEFAULT_FAST_START):
+        # Las entidades restauran su último estado y el primer fetch
+        # se hace en segundo plano, sin retrasar el arranque de HA
+        await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+        entry.async_create_background_task(
+            hass, coordinator.async_first_refresh_background(), f"{DOMAIN}_first_refresh"
+        )
+    else:
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            # HA no llama a async_unload_entry si el setup falla: hay que
+            # deshacer aquí lo que arrancó async_start antes de reintentar
+            hass.data[DOMAIN].pop(entry.entry_id, None)
+            await coordinator.async_shutdown()
+            async_unload_services(hass)
+            raise
+        _LOGGER.info("Spock Energy Control: primer fetch realizado.")
+        await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    coordinator.startup_duration_s = round(time.monotonic() - started, 3)
     _LOGGER.info(
-         "Spock Energy Control: ciclo automático iniciado cada %s.", 
+         "Spock Energy Control: configurado en %.3f s; ciclo automático cada %s.", 
+         coordinator.startup_duration_s,
          coordinator.update_interval
     )
-    
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     return True
 
 
+def _restored_run_actions(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Último estado guardado del interruptor de acciones (activado si no hay)."""
+    entity_id = er.async_get(hass).async_get_entity_id(
+        "switch", DOMAIN, f"{entry.entry_id}_actions_enabled"
+    )
+    if entity_id is None:
+        return True
+    stored = restore_state.async_get(hass).last_states.get(entity_id)
+    if stored is None or stored.state.state not in ("on", "off"):
+        return True
+    return stored.state.state == "on"
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Descarga la entrada de configuración."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
-    hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
+    entry_data = hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
+    if entry_data:
+        await entry_data["coordinator"].async_shutdown()
+    async_unload_services(hass)
     
     return unload_ok
 
@@ -80,15 +218,106 @@ class SpockEnergyCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         self.plant_id: str = config[CONF_PLANT_ID]
         self.green_devices: list[str] = config.get(CONF_GREEN_DEVICES, [])
         self.yellow_devices: list[str] = config.get(CONF_YELLOW_DEVICES, [])
+        self.telemetry_batch: bool = config.get(CONF_TELEMETRY_BATCH, DEFAULT_TELEMETRY_BATCH)
+        self.telemetry_concurrency: int = config.get(
+            CONF_TELEMETRY_CONCURRENCY, DEFAULT_TELEMETRY_CONCURRENCY
+        )
+        # None = aún no se sabe si el servidor admite lotes
+        self._telemetry_batch_supported: bool | None = None
+        self._telemetry_task: asyncio.Task | None = None
+        self.telemetry_mode: str = config.get(CONF_TELEMETRY_MODE, DEFAULT_TELEMETRY_MODE)
+        self.fallback_policies: dict[str, str] = {
+            "green": config.get(CONF_FALLBACK_GREEN, DEFAULT_FALLBACK_POLICY),
+            "yellow": config.get(CONF_FALLBACK_YELLOW, DEFAULT_FALLBACK_POLICY),
+        }
+        self.surplus_sensor: str | None = config.get(CONF_SURPLUS_SENSOR)
+        self._unsub_surplus: CALLBACK_TYPE | None = None
+        self.surplus_threshold: float = config.get(
+            CONF_SURPLUS_THRESHOLD, DEFAULT_SURPLUS_THRESHOLD_W
+        )
+        self.telemetry_flush_interval: int = config.get(
+            CONF_TELEMETRY_FLUSH_INTERVAL, DEFAULT_TELEMETRY_FLUSH_INTERVAL_S
+        )
+        self._telemetry_buffer = TelemetryBuffer(TELEMETRY_BUFFER_MAX_SAMPLES)
+        self._power_aggregator = PowerAggregator()
+        self.telemetry_filter = DeadbandFilter(
+            config.get(CONF_DEADBAND_ABSOLUTE, DEFAULT_DEADBAND_ABSOLUTE_W),
+            config.get(CONF_DEADBAND_RELATIVE, DEFAULT_DEADBAND_RELATIVE_PCT) / 100,
+            config.get(CONF_TELEMETRY_HEARTBEAT, DEFAULT_TELEMETRY_HEARTBEAT_S),
+        )
+        self._unsub_power_events: CALLBACK_TYPE | None = None
+        self._unsub_flush: CALLBACK_TYPE | None = None
+        self.telemetry_queue = TelemetryQueue(
+            hass,
+            entry.entry_id,
+            config.get(CONF_TELEMETRY_QUEUE_SIZE, DEFAULT_TELEMETRY_QUEUE_SIZE),
+        )
+        self._replay_task: asyncio.Task | None = None
+
+        self.push_client: SpockPushClient | None = None
+        if config.get(CONF_PUSH_ENABLED, DEFAULT_PUSH_ENABLED):
+            self.push_client = SpockPushClient(
+                hass,
+                async_get_clientsession(hass),
+                HARDCODED_API_URL_PUSH,
+                self.api_token,
+                self.plant_id,
+                self._async_handle_push_status,
+                self._async_push_connection_changed,
+            )
         
         self.entity_registry: er.EntityRegistry = er.async_get(hass)
         self.device_registry: dr.DeviceRegistry = dr.async_get(hass) 
-        self._power_sensor_entity_ids: set[str] | None = None
+        self.power_index = PowerSensorIndex(hass, self.entity_registry, self.device_registry)
+        self.power_index.async_set_controlled(self.green_devices + self.yellow_devices)
+        self._unsub_power_index: CALLBACK_TYPE | None = None
+        self.schedule = SgReadySchedule(hass, entry.entry_id)
+        self.actuation = ActuationPipeline(
+            hass,
+            config.get(CONF_ACTUATION_STAGGER, DEFAULT_ACTUATION_STAGGER_S),
+            config.get(CONF_ACTUATION_MAX_CONCURRENT, DEFAULT_ACTUATION_MAX_CONCURRENT),
+            ACTUATION_CONFIRM_TIMEOUT_S,
+            ACTUATION_MAX_RETRIES,
+        )
+        self.actuation.async_set_entities(self.green_devices + self.yellow_devices)
+        # grupo -> [(servicio, entidades, tarea)] en curso
+        self._actuation_tasks: dict[str, list[tuple[str, set[str], asyncio.Task]]] = {}
+        self.reconciler = DesiredStateReconciler(
+            hass,
+            self._async_start_actuation,
+            self._actions_enabled,
+            config.get(CONF_RECONCILE_GRACE, DEFAULT_RECONCILE_GRACE_S),
+            config.get(CONF_MIN_SWITCH_INTERVAL, DEFAULT_MIN_SWITCH_INTERVAL_S),
+        )
+        self._unsub_schedule_timer: CALLBACK_TYPE | None = None
+
+        # Reparto por presupuesto de potencia (opcional)
+        self.dispatcher: LoadDispatcher | None = None
+        if config.get(CONF_DISPATCH_ENABLED, DEFAULT_DISPATCH_ENABLED):
+            self.dispatcher = LoadDispatcher(
+                DISPATCH_DEFAULT_DRAW_W, DISPATCH_MIN_ON_W, DISPATCH_TOLERANCE_W
+            )
+        self.dispatch_target_sensor: str | None = config.get(CONF_DISPATCH_TARGET_SENSOR)
+        self._unsub_dispatch_timer: CALLBACK_TYPE | None = None
+        self._unsub_dispatch_target: CALLBACK_TYPE | None = None
         
-        self._session = async_get_clientsession(hass)
+        self.hub = async_get_hub(hass, self.api_token)
+        self._unsub_hub: CALLBACK_TYPE | None = None
 
         seconds = DEFAULT_SCAN_INTERVAL_S
         _LOGGER.debug("Usando intervalo hardcoded de %s segundos", seconds)
+        self.scheduler = AdaptivePollScheduler(
+            seconds, MIN_SCAN_INTERVAL_S, MAX_SCAN_INTERVAL_S
+        )
+
+        self.metrics = CoordinatorMetrics(METRICS_CYCLE_HISTORY)
+        self.profiler = async_get_profiler(hass)
+        self.session_recorder = SessionRecorder(hass, self)
+        self._status_rtt_s: float | None = None
+
+        # Tiempos de arranque (segundos)
+        self.startup_duration_s: float | None = None
+        self.first_refresh_duration_s: float | None = None
 
         super().__init__(
             hass,
@@ -99,218 +328,1144 @@ class SpockEnergyCoordinator(DataUpdateCoordinator[dict[str, Any]]):
 
     def _find_power_sensors(self) -> set[str]:
         """
-        Encuentra automáticamente los sensores de potencia asociados
-        a los dispositivos listados en GREEN_DEVICES y YELLOW_DEVICES.
-        
-        Busca por 'device_class: power' O por entity_id que termine en '_power'.
+        Devuelve los sensores de potencia asociados a los dispositivos
+        listados en GREEN_DEVICES y YELLOW_DEVICES.
+
+        Los mantiene PowerSensorIndex a partir de los eventos de los
+        registros, por lo que esta llamada no consulta los registros.
         """
-        if self._power_sensor_entity_ids is not None:
-            return self._power_sensor_entity_ids 
+        return self.power_index.power_sensors
 
-        all_controlled_entities = self.green_devices + self.yellow_devices
-        if not all_controlled_entities:
-            _LOGGER.debug("No hay dispositivos Green/Yellow configurados, no se buscan sensores.")
-            self._power_sensor_entity_ids = set()
-            return set()
-        
-        found_sensor_ids = set()
-        processed_device_ids = set()
-        
-        _LOGGER.debug(f"Buscando sensores de potencia para entidades: {all_controlled_entities}")
+    def _describe_device(self, sensor_id: str) -> str:
+        """Devuelve el nombre del dispositivo al que pertenece el sensor."""
+        return self.power_index.describe(sensor_id)
 
-        for entity_id in all_controlled_entities:
-            entry = self.entity_registry.async_get(entity_id)
-            
-            if not entry or not entry.device_id:
-                _LOGGER.debug(f"Entidad '{entity_id}' no tiene device_id, omitiendo.")
-                continue
-                
-            device_id = entry.device_id
-            
-            if device_id in processed_device_ids:
-                continue
-            processed_device_ids.add(device_id)
-            
-            _LOGGER.debug(f"Inspeccionando dispositivo '{device_id}' (de la entidad '{entity_id}')")
+    def _make_telemetry_record(
+        self,
+        sensor_id: str,
+        power_value: float,
+        timestamp: datetime,
+        aggregates: dict[str, Any] | None = None,
+    ) -> TelemetryRecord:
+        """
+        Construye un registro de telemetría. Si hay agregados de la
+        ventana (energía, mínimo, máximo, medias) se envían como campos.
+        """
+        return TelemetryRecord(
+            sensor_id, self._describe_device(sensor_id), power_value, timestamp, aggregates
+        )
+
+    def _build_telemetry_records(self, power_sensor_ids: set[str]) -> list[TelemetryRecord]:
+        """
+        Lee los sensores de potencia y construye un registro por sensor,
+        cada uno con su propia marca de tiempo de lectura. Los sensores sin
+        cambios significativos se omiten (ver DeadbandFilter).
+        """
+        records: list[TelemetryRecord] = []
+
+        for sensor_id in power_sensor_ids:
+            try:
+                state: State | None = self.hass.states.get(sensor_id)
+                if not state or state.state in ("unknown", "unavailable"):
+                    _LOGGER.warning("No se pudo leer el sensor de potencia '%s'. Omitiendo.", sensor_id)
+                    continue
+
+                power_value = float(state.state)
+                now = dt_util.utcnow()
+                ts = now.timestamp()
+                # Sin cambio significativo no se envía; la ventana sigue
+                # abierta y el siguiente envío incluye toda su energía
+                if not self.telemetry_filter.should_send(
+                    sensor_id, power_value, ts, self._power_aggregator.window_avg(sensor_id, ts)
+                ):
+                    continue
+                aggregates = None
+                if sensor_id in self._power_aggregator:
+                    aggregates = self._power_aggregator.close_window(sensor_id, ts)
+                else:
+                    self._power_aggregator.track(sensor_id, power_value, ts)
+                records.append(
+                    self._make_telemetry_record(sensor_id, power_value, now, aggregates)
+                )
+
+            except Exception as err:
+                _LOGGER.error("Error al leer telemetría para %s: %s", sensor_id, err)
+
+        return records
+
+    async def _async_post_telemetry_batch(
+        self, records: list[TelemetryRecord]
+    ) -> list[bool] | None:
+        """
+        Envía todos los registros en un único POST.
+
+        Devuelve el resultado de cada registro, en el mismo orden, o None
+        si el servidor no admite el formato por lotes.
+        """
+        payload = encode_telemetry_batch(self.plant_id, records)
+
+        _LOGGER.debug("Enviando telemetría por lotes (%s registros)", len(records))
 
-            entities_on_device = er.async_entries_for_device(
-                self.entity_registry, device_id
+        resp = await self.hub.transport.async_post(ENDPOINT_TELEMETRY, payload)
+        if resp.status in BATCH_UNSUPPORTED_STATUS:
+            _LOGGER.info(
+                "El servidor no admite telemetría por lotes (HTTP %s). "
+                "Se usará el envío por sensor.",
+                resp.status,
             )
-            
-            for device_entity in entities_on_device:
-                # Condición 1: Es un sensor
-                is_sensor = device_entity.domain == "sensor"
-                
-                # Condición 2: La clase es 'power'
-                is_power_class = device_entity.device_class == "power"
-                
-                # Condición 3: El ID termina en '_power'
-                id_ends_with_power = device_entity.entity_id.endswith("_power")
-
-                if is_sensor and (is_power_class or id_ends_with_power):
-                    _LOGGER.info(
-                        "¡Sensor de potencia encontrado! (Dispositivo: '%s', Entidad: %s, Clase: %s)",
-                        device_id,
-                        device_entity.entity_id,
-                        device_entity.device_class
+            return None
+
+        # Un 400/422 rechaza el contenido del lote, no el formato: los
+        # registros vuelven a la cola y se siguen enviando por lotes
+        if resp.status >= 300:
+            for record in records:
+                _LOGGER.error(
+                    "Error al enviar telemetría para %s (HTTP %s, %s): %s",
+                    record.sensor_id,
+                    resp.status,
+                    resp.error_kind,
+                    resp.text,
+                )
+            return [False] * len(records)
+
+        body = resp.body
+        results = [True] * len(records)
+
+        # El servidor puede devolver el resultado de cada registro, por su
+        # posición en el lote (`index`) o, si no la da, por sensor_id
+        if isinstance(body, dict) and isinstance(body.get("results"), list):
+            for item in body["results"]:
+                if not isinstance(item, dict) or item.get("ok", True):
+                    continue
+                index = item.get("index")
+                if isinstance(index, int) and 0 <= index < len(records):
+                    rejected = [index]
+                else:
+                    rejected = [
+                        position
+                        for position, record in enumerate(records)
+                        if record.sensor_id == item.get("sensor_id")
+                    ]
+                for position in rejected:
+                    results[position] = False
+                if rejected:
+                    _LOGGER.error(
+                        "Telemetría rechazada para %s: %s",
+                        records[rejected[0]].sensor_id,
+                        item.get("error"),
                     )
-                    found_sensor_ids.add(device_entity.entity_id)
 
-        self._power_sensor_entity_ids = found_sensor_ids
-        if not found_sensor_ids:
-            _LOGGER.debug(f"No se encontraron sensores de potencia para los dispositivos: {processed_device_ids}")
-            
-        return self._power_sensor_entity_ids
-    # --- FIN DEL CAMBIO ---
+        return results
+
+    async def _async_post_telemetry_record(self, record: TelemetryRecord) -> bool:
+        """Envía un único registro con el formato por sensor."""
+        sensor_id = record.sensor_id
 
+        _LOGGER.debug("Enviando telemetría para %s: %s", sensor_id, record)
 
-    async def _async_send_telemetry(self) -> None:
+        try:
+            resp = await self.hub.transport.async_post(
+                ENDPOINT_TELEMETRY,
+                json_bytes(record.as_payload(self.plant_id, with_timestamp=False)),
+            )
+        except SpockTransportError as err:
+            if err.kind == ERROR_RATE_LIMITED:
+                _LOGGER.debug("Telemetría de %s aplazada por el límite de peticiones", sensor_id)
+                return False
+            _LOGGER.error(
+                "Error al enviar telemetría para %s (%s): %s", sensor_id, err.kind, err
+            )
+            return False
+        except Exception as err:
+            _LOGGER.error("Error al procesar/enviar telemetría para %s: %s", sensor_id, err)
+            return False
+
+        if resp.status >= 300:
+            _LOGGER.error(
+                "Error al enviar telemetría para %s (HTTP %s, %s): %s",
+                sensor_id,
+                resp.status,
+                resp.error_kind,
+                resp.text,
+            )
+            return False
+
+        _LOGGER.debug("Telemetría enviada con éxito para %s", sensor_id)
+        return True
+
+    async def _async_send_telemetry(self) -> list[bool]:
         """
-        Para cada sensor de potencia detectado, envía su telemetría al endpoint.
+        Envía la telemetría de todos los sensores de potencia detectados.
+
+        Si el modo por lotes está activo se envía un único POST; si el
+        servidor no lo admite se vuelve al envío por sensor. Devuelve el
+        resultado de cada registro.
         """
         power_sensor_ids = self._find_power_sensors()
         if not power_sensor_ids:
             # Este log ahora es 'debug' porque es normal si no hay sensores
             _LOGGER.debug("No se encontraron sensores de potencia asociados. Omitiendo telemetría.")
-            return
+            return []
 
-        headers = {"X-Auth-Token": self.api_token}
+        records = self._build_telemetry_records(power_sensor_ids)
+        return await self._async_deliver_records(records)
 
-        for sensor_id in power_sensor_ids:
-            try:
-                state: State | None = self.hass.states.get(sensor_id)
-                if not state or state.state in ("unknown", "unavailable"):
-                    _LOGGER.warning("No se pudo leer el sensor de potencia '%s'. Omitiendo.", sensor_id)
-                    continue
-                
-                power_value = float(state.state)
+    async def _async_deliver_records(
+        self, records: list[TelemetryRecord]
+    ) -> list[bool]:
+        """
+        Sube registros en vivo. Los que fallan se guardan en la cola
+        persistente; si la subida funciona y hay pendientes, se inicia
+        el reenvío de la cola.
+        """
+        results = await self._async_upload_records(records)
+        self.metrics.record_telemetry(results)
+
+        failed = [record for record, ok in zip(records, results) if not ok]
+        if failed:
+            _LOGGER.debug("Encolando %s registros de telemetría no enviados", len(failed))
+            self.telemetry_queue.push(failed)
+        elif records and len(self.telemetry_queue):
+            self._async_start_replay()
+
+        return results
 
-                desc_device = "Dispositivo Desconocido"
-                sensor_entry = self.entity_registry.async_get(sensor_id)
-                
-                if sensor_entry and sensor_entry.device_id:
-                    device_entry = self.device_registry.async_get(sensor_entry.device_id)
-                    if device_entry:
-                        desc_device = device_entry.name_by_user or device_entry.name
-
-                telemetry_data = {
-                   "plant_id": self.plant_id,
-                   "desc_device": desc_device,
-                   "sensor_id": sensor_id,
-                   "power": str(power_value),
-                }
-
-                _LOGGER.debug("Enviando telemetría para %s: %s", sensor_id, telemetry_data)
-                
-                async with self._session.post(
-                    HARDCODED_API_URL_TELEMETRIA,
-                    headers=headers, 
-                    json=telemetry_data,
-                    timeout=10
-                ) as resp:
-                    if resp.status >= 300:
-                        _LOGGER.error(
-                            "Error al enviar telemetría para %s (HTTP %s): %s",
-                            sensor_id,
-                            resp.status,
-                            await resp.text()
-                        )
-                    else:
-                        _LOGGER.debug("Telemetría enviada con éxito para %s", sensor_id)
-            
+    async def _async_upload_records(
+        self, records: list[TelemetryRecord]
+    ) -> list[bool]:
+        """
+        Sube los registros por lotes o, si el servidor no lo admite,
+        uno a uno. Devuelve el resultado de cada registro, en orden.
+        """
+        if not records:
+            return []
+
+        if self.telemetry_batch and self._telemetry_batch_supported is not False:
+            try:
+                results = await self._async_post_telemetry_batch(records)
+            except SpockTransportError as err:
+                if err.kind == ERROR_RATE_LIMITED:
+                    _LOGGER.debug("Telemetría por lotes aplazada por el límite de peticiones")
+                else:
+                    _LOGGER.error("Error al enviar telemetría por lotes: %s", err)
+                return [False] * len(records)
             except Exception as err:
-                _LOGGER.error("Error al procesar/enviar telemetría para %s: %s", sensor_id, err)
+                _LOGGER.error("Error al enviar telemetría por lotes: %s", err)
+                return [False] * len(records)
 
+            if results is not None:
+                self._telemetry_batch_supported = True
+                return results
 
-    async def _async_update_data(self) -> dict[str, Any]:
-        """Obtiene los datos de la API (sensores) y ejecuta acciones."""
-        _LOGGER.debug("Iniciando ciclo de actualización...")
-        
+            self._telemetry_batch_supported = False
+
+        return await self._async_post_telemetry_records(records)
+
+    async def _async_post_telemetry_records(
+        self, records: list[TelemetryRecord]
+    ) -> list[bool]:
+        """
+        Envía los registros por sensor con un pool de workers acotado
+        (CONF_TELEMETRY_CONCURRENCY peticiones simultáneas como máximo).
+        """
+        semaphore = asyncio.Semaphore(self.telemetry_concurrency)
+
+        async def _worker(record: TelemetryRecord) -> bool:
+            async with semaphore:
+                return await self._async_post_telemetry_record(record)
+
+        return list(await asyncio.gather(*(_worker(record) for record in records)))
+
+    def _async_start_telemetry(self) -> None:
+        """
+        Lanza la telemetría como tarea independiente del ciclo de estado.
+
+        Si la tarea del ciclo anterior sigue en curso no se lanza otra.
+        """
+        if self._telemetry_task is not None and not self._telemetry_task.done():
+            _LOGGER.debug("La telemetría del ciclo anterior sigue en curso. Se omite este ciclo.")
+            return
+
+        self._telemetry_task = self.hass.async_create_background_task(
+            self._async_run_telemetry(), f"{DOMAIN}_telemetry"
+        )
+
+    async def _async_run_telemetry(self) -> None:
+        """Ejecuta la telemetría sin propagar errores al ciclo de estado."""
         try:
-            await self._async_send_telemetry()
+            if self.telemetry_mode == TELEMETRY_MODE_STREAM:
+                await self._async_flush_stream()
+            else:
+                await self._async_send_telemetry()
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             _LOGGER.error("Error en _async_send_telemetry (no fatal): %s", e)
 
-        _LOGGER.debug("Fetching API data (SGReady status) from %s", HARDCODED_API_URL)
+    @callback
+    def async_start(self) -> None:
+        """Arranca el índice de sensores y, si procede, el streaming."""
+        if self._unsub_hub is None:
+            self._unsub_hub = self.hub.async_register(self)
+        self.power_index.async_start()
+        if self.push_client is not None:
+            self.push_client.start()
+        self._async_arm_schedule_timer()
+        self._update_base_interval()
+        if self._unsub_power_index is None:
+            self._unsub_power_index = self.power_index.async_add_listener(
+                self._async_power_sensors_changed
+            )
+        self.async_track_power_sensors()
+        if (
+            self.dispatcher is not None
+            and self.dispatch_target_sensor
+            and self._unsub_dispatch_target is None
+        ):
+            self._unsub_dispatch_target = async_track_state_change_event(
+                self.hass, [self.dispatch_target_sensor], self._async_schedule_dispatch
+            )
+        self._async_track_surplus_sensor()
+
+    @callback
+    def _async_track_surplus_sensor(self) -> None:
+        """Sigue el sensor de excedente si alguna política local lo usa."""
+        if self._unsub_surplus is not None:
+            self._unsub_surplus()
+            self._unsub_surplus = None
+        if self.surplus_sensor and FALLBACK_SURPLUS in self.fallback_policies.values():
+            self._unsub_surplus = async_track_state_change_event(
+                self.hass, [self.surplus_sensor], self._async_surplus_changed
+            )
+
+    @callback
+    def _async_surplus_changed(self, _event: Event) -> None:
+        """
+        Con el breaker abierto reevalúa la política local al cambiar el
+        excedente, sin esperar al siguiente sondeo.
+        """
+        if self.status_breaker.state == STATE_CLOSED:
+            return
+        # La planificación en caché manda sobre la política local
+        if self.schedule.state_at(dt_util.utcnow()) is not None:
+            return
+        planned = self._fallback_status()
+        if not planned or all(
+            (self.data or {}).get(group) == state for group, state in planned.items()
+        ):
+            return
+        _LOGGER.info("Excedente local cambiado; se aplica el estado local %s", planned)
+        self.hass.async_create_task(self._async_apply_planned(planned))
+
+    async def async_apply_config(self, config: dict) -> bool:
+        """
+        Aplica una configuración nueva sin recrear el coordinador ni las
+        entidades. Devuelve False si hace falta recargar la entrada
+        (cambio de token o de planta).
+        """
+        if (
+            config[CONF_API_TOKEN] != self.api_token
+            or config[CONF_PLANT_ID] != self.plant_id
+        ):
+            return False
+        if config == self.config:
+            return True
+
+        _LOGGER.debug("Aplicando opciones nuevas sin recargar la entrada")
+        self.config = config
+
+        # Grupos: el índice de sensores se actualiza en su sitio y avisa
+        # si cambian los sensores de potencia
+        green = config.get(CONF_GREEN_DEVICES, [])
+        yellow = config.get(CONF_YELLOW_DEVICES, [])
+        devices_changed = green != self.green_devices or yellow != self.yellow_devices
+        self.green_devices, self.yellow_devices = green, yellow
+        if devices_changed:
+            self.power_index.async_set_controlled(green + yellow)
+            self.actuation.async_set_entities(green + yellow)
+
+        # Telemetría
+        self.telemetry_batch = config.get(CONF_TELEMETRY_BATCH, DEFAULT_TELEMETRY_BATCH)
+        self.telemetry_concurrency = config.get(
+            CONF_TELEMETRY_CONCURRENCY, DEFAULT_TELEMETRY_CONCURRENCY
+        )
+        self.telemetry_queue.resize(
+            config.get(CONF_TELEMETRY_QUEUE_SIZE, DEFAULT_TELEMETRY_QUEUE_SIZE)
+        )
+        telemetry_mode = config.get(CONF_TELEMETRY_MODE, DEFAULT_TELEMETRY_MODE)
+        flush_interval = config.get(
+            CONF_TELEMETRY_FLUSH_INTERVAL, DEFAULT_TELEMETRY_FLUSH_INTERVAL_S
+        )
+        if (
+            telemetry_mode != self.telemetry_mode
+            or flush_interval != self.telemetry_flush_interval
+        ):
+            if self._unsub_flush is not None:
+                self._unsub_flush()
+                self._unsub_flush = None
+            if telemetry_mode != TELEMETRY_MODE_STREAM:
+                self._telemetry_buffer.drain()
+            self.telemetry_mode = telemetry_mode
+            self.telemetry_flush_interval = flush_interval
+            self.async_track_power_sensors()
+        self.telemetry_filter.absolute_w = config.get(
+            CONF_DEADBAND_ABSOLUTE, DEFAULT_DEADBAND_ABSOLUTE_W
+        )
+        self.telemetry_filter.relative = (
+            config.get(CONF_DEADBAND_RELATIVE, DEFAULT_DEADBAND_RELATIVE_PCT) / 100
+        )
+        self.telemetry_filter.heartbeat_s = config.get(
+            CONF_TELEMETRY_HEARTBEAT, DEFAULT_TELEMETRY_HEARTBEAT_S
+        )
+
+        # Canal push
+        push_enabled = config.get(CONF_PUSH_ENABLED, DEFAULT_PUSH_ENABLED)
+        if push_enabled and self.push_client is None:
+            self.push_client = SpockPushClient(
+                self.hass,
+                async_get_clientsession(self.hass),
+                HARDCODED_API_URL_PUSH,
+                self.api_token,
+                self.plant_id,
+                self._async_handle_push_status,
+                self._async_push_connection_changed,
+            )
+            self.push_client.start()
+        elif not push_enabled and self.push_client is not None:
+            await self.push_client.async_stop()
+            self.push_client = None
+            self._update_base_interval()
+
+        # Actuación y reconciliación
+        self.actuation.stagger_s = config.get(
+            CONF_ACTUATION_STAGGER, DEFAULT_ACTUATION_STAGGER_S
+        )
+        self.actuation.max_concurrent = max(
+            1, config.get(CONF_ACTUATION_MAX_CONCURRENT, DEFAULT_ACTUATION_MAX_CONCURRENT)
+        )
+        self.reconciler.grace_s = config.get(CONF_RECONCILE_GRACE, DEFAULT_RECONCILE_GRACE_S)
+        self.reconciler.min_hold_s = config.get(
+            CONF_MIN_SWITCH_INTERVAL, DEFAULT_MIN_SWITCH_INTERVAL_S
+        )
+
+        # Política local con la nube caída
+        self.fallback_policies = {
+            "green": config.get(CONF_FALLBACK_GREEN, DEFAULT_FALLBACK_POLICY),
+            "yellow": config.get(CONF_FALLBACK_YELLOW, DEFAULT_FALLBACK_POLICY),
+        }
+        self.surplus_sensor = config.get(CONF_SURPLUS_SENSOR)
+        self.surplus_threshold = config.get(
+            CONF_SURPLUS_THRESHOLD, DEFAULT_SURPLUS_THRESHOLD_W
+        )
+        self._async_track_surplus_sensor()
+
+        # Reparto por presupuesto de potencia
+        dispatch_enabled = config.get(CONF_DISPATCH_ENABLED, DEFAULT_DISPATCH_ENABLED)
+        if dispatch_enabled and self.dispatcher is None:
+            self.dispatcher = LoadDispatcher(
+                DISPATCH_DEFAULT_DRAW_W, DISPATCH_MIN_ON_W, DISPATCH_TOLERANCE_W
+            )
+        elif not dispatch_enabled:
+            self.dispatcher = None
+        target_sensor = config.get(CONF_DISPATCH_TARGET_SENSOR)
+        if target_sensor != self.dispatch_target_sensor or self.dispatcher is None:
+            if self._unsub_dispatch_target is not None:
+                self._unsub_dispatch_target()
+                self._unsub_dispatch_target = None
+            self.dispatch_target_sensor = target_sensor
+            if self.dispatcher is not None and target_sensor:
+                self._unsub_dispatch_target = async_track_state_change_event(
+                    self.hass, [target_sensor], self._async_schedule_dispatch
+                )
+
+        # Reaplicar la orden vigente con los grupos nuevos
+        if self.data:
+            self.reconciler.async_resync()
+            await self._execute_sgready_actions(self.data)
+        self.async_update_listeners()
+        return True
+
+    @callback
+    def _async_power_sensors_changed(self) -> None:
+        """Reajusta las suscripciones al cambiar los sensores de potencia."""
+        _LOGGER.debug("Sensores de potencia actualizados: %s", self._find_power_sensors())
+        self.async_track_power_sensors()
+
+    def _read_power(self, sensor_id: str) -> float | None:
+        """Potencia actual de un sensor, o None si no es un número."""
+        state = self.hass.states.get(sensor_id)
+        if not state or state.state in ("unknown", "unavailable"):
+            return None
         try:
-            headers = {"X-Auth-Token": self.api_token}
-            json_payload = {"plant_id": self.plant_id}
-            
-            async with self._session.post(
-                HARDCODED_API_URL, 
-                headers=headers, 
-                json=json_payload
-            ) as resp:
-                if resp.status == 403:
-                    raise UpdateFailed("API Token o Plant ID inválido (403)")
-                if resp.status != 200:
-                    txt = await resp.text()
-                    _LOGGER.error("API error %s: %s", resp.status, txt)
-                    raise UpdateFailed(f"HTTP {resp.status}")
-
-                data = await resp.json(content_type=None)
-
-            if not isinstance(data, dict) or "green" not in data or "yellow" not in data:
-                raise UpdateFailed(f"Formato de respuesta inesperado: {data}")
+            return float(state.state)
+        except ValueError:
+            return None
 
-            await self._execute_sgready_actions(data)
+    @callback
+    def async_track_power_sensors(self) -> None:
+        """
+        Se suscribe a los cambios de estado de los sensores de potencia
+        para calcular los agregados de cada ventana de envío. En modo
+        streaming además guarda los cambios en el buffer y lo vacía cada
+        CONF_TELEMETRY_FLUSH_INTERVAL segundos.
+        """
+        power_sensor_ids = self._find_power_sensors()
+        self._power_aggregator.retain(power_sensor_ids)
+        self.telemetry_filter.retain(power_sensor_ids)
+        self._telemetry_buffer.retain(power_sensor_ids)
+
+        if self._unsub_power_events is not None:
+            self._unsub_power_events()
+            self._unsub_power_events = None
+
+        if power_sensor_ids:
+            now = dt_util.utcnow().timestamp()
+            for sensor_id in power_sensor_ids:
+                if sensor_id in self._power_aggregator:
+                    continue
+                if (value := self._read_power(sensor_id)) is not None:
+                    self._power_aggregator.track(sensor_id, value, now)
+            self._unsub_power_events = async_track_state_change_event(
+                self.hass, list(power_sensor_ids), self._async_handle_power_event
+            )
+
+        if self.telemetry_mode != TELEMETRY_MODE_STREAM:
+            return
+
+        if self._unsub_flush is None:
+            self._unsub_flush = async_track_time_interval(
+                self.hass,
+                self._async_handle_flush_interval,
+                timedelta(seconds=self.telemetry_flush_interval),
+            )
+
+        _LOGGER.debug(
+            "Telemetría en streaming para %s sensores (vaciado cada %s s)",
+            len(power_sensor_ids),
+            self.telemetry_flush_interval,
+        )
+
+    @callback
+    def _async_handle_flush_interval(self, _now: datetime) -> None:
+        """Dispara el envío periódico del buffer de streaming."""
+        self._async_start_telemetry()
+
+    @callback
+    def _async_handle_power_event(self, event: Event) -> None:
+        """Acumula cada cambio de potencia (y lo guarda en el buffer en streaming)."""
+        new_state: State | None = event.data.get("new_state")
+        if not new_state or new_state.state in ("unknown", "unavailable"):
+            return
+
+        try:
+            power_value = float(new_state.state)
+        except ValueError:
+            return
+
+        self._power_aggregator.add(
+            new_state.entity_id, power_value, new_state.last_updated.timestamp()
+        )
+        if self.dispatcher is not None:
+            for entity_id in self.power_index.controlled_for_sensor(new_state.entity_id):
+                entity_state = self.hass.states.get(entity_id)
+                self.dispatcher.observe(
+                    entity_id,
+                    power_value,
+                    entity_state is not None and entity_state.state == "on",
+                )
+            self._async_schedule_dispatch()
+        if self.telemetry_mode == TELEMETRY_MODE_STREAM:
+            self._telemetry_buffer.add(
+                new_state.entity_id, power_value, new_state.last_updated
+            )
+
+    async def _async_flush_stream(self) -> list[bool]:
+        """Envía todos los cambios acumulados en el buffer."""
+        drained = self._telemetry_buffer.drain()
+        if not drained:
+            return []
+
+        # Los agregados de la ventana van en la última muestra de cada sensor
+        now = dt_util.utcnow().timestamp()
+        records: list[TelemetryRecord] = []
+        for sensor_id, samples in drained.items():
+            records.extend(
+                self._make_telemetry_record(sensor_id, value, timestamp)
+                for timestamp, value in samples[:-1]
+            )
+            timestamp, value = samples[-1]
+            records.append(
+                self._make_telemetry_record(
+                    sensor_id,
+                    value,
+                    timestamp,
+                    self._power_aggregator.close_window(sensor_id, now),
+                )
+            )
+        _LOGGER.debug("Vaciando buffer de telemetría: %s registros", len(records))
+        return await self._async_deliver_records(records)
+
+    @callback
+    def _async_start_replay(self) -> None:
+        """Lanza el reenvío de la cola si no está ya en curso."""
+        if self._replay_task is not None and not self._replay_task.done():
+            return
+
+        _LOGGER.info(
+            "Conexión recuperada: reenviando %s registros de telemetría pendientes",
+            len(self.telemetry_queue),
+        )
+        self._replay_task = self.hass.async_create_background_task(
+            self._async_replay_queue(), f"{DOMAIN}_telemetry_replay"
+        )
+
+    async def _async_replay_queue(self) -> None:
+        """
+        Reenvía la cola en orden, en lotes de TELEMETRY_REPLAY_BATCH_SIZE
+        separados TELEMETRY_REPLAY_INTERVAL_S segundos.
+        """
+        while len(self.telemetry_queue):
+            first, batch = self.telemetry_queue.peek(TELEMETRY_REPLAY_BATCH_SIZE)
+
+            try:
+                results = await self._async_upload_records(batch)
+            except Exception as err:
+                _LOGGER.error("Error al reenviar la cola de telemetría: %s", err)
+                return
+            self.metrics.record_telemetry(results)
+
+            # Si no ha pasado ningún registro el servidor sigue caído:
+            # se conserva el lote y se reintenta en el siguiente envío en vivo
+            if not any(results):
+                _LOGGER.debug("Reenvío de telemetría interrumpido; se reintentará más tarde")
+                return
+
+            # Los registros aplazados o rechazados se quedan al frente de
+            # la cola, en su orden, para el siguiente reenvío
+            self.telemetry_queue.ack(first, results)
+            self.async_update_listeners()
+            if not all(results):
+                _LOGGER.debug(
+                    "%s registros de la cola no se reenviaron; se reintentará más tarde",
+                    results.count(False),
+                )
+                return
+
+            if len(self.telemetry_queue):
+                await asyncio.sleep(TELEMETRY_REPLAY_INTERVAL_S)
+
+        _LOGGER.info("Cola de telemetría reenviada por completo")
+
+    async def async_shutdown(self) -> None:
+        """Cancela la telemetría pendiente al descargar la entrada."""
+        await super().async_shutdown()
+        self.session_recorder.async_stop()
+        if self._replay_task is not None and not self._replay_task.done():
+            self._replay_task.cancel()
+        self._replay_task = None
+        await self.telemetry_queue.async_save()
+        if self._unsub_power_index is not None:
+            self._unsub_power_index()
+            self._unsub_power_index = None
+        self.power_index.async_stop()
+        if self._unsub_schedule_timer is not None:
+            self._unsub_schedule_timer()
+            self._unsub_schedule_timer = None
+        for running in self._actuation_tasks.values():
+            for _service, _entity_ids, task in running:
+                task.cancel()
+        self._actuation_tasks.clear()
+        self.reconciler.async_stop()
+        if self._unsub_hub is not None:
+            self._unsub_hub()
+            self._unsub_hub = None
+        if self.push_client is not None:
+            await self.push_client.async_stop()
+        if self._unsub_power_events is not None:
+            self._unsub_power_events()
+            self._unsub_power_events = None
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+        if self._unsub_dispatch_timer is not None:
+            self._unsub_dispatch_timer()
+            self._unsub_dispatch_timer = None
+        if self._unsub_dispatch_target is not None:
+            self._unsub_dispatch_target()
+            self._unsub_dispatch_target = None
+        if self._unsub_surplus is not None:
+            self._unsub_surplus()
+            self._unsub_surplus = None
+        if self._telemetry_task is not None and not self._telemetry_task.done():
+            self._telemetry_task.cancel()
+        self._telemetry_task = None
+
+
+    @staticmethod
+    def _parse_status(data: Any) -> dict[str, Any]:
+        """Valida la respuesta de estado y devuelve solo sus campos conocidos."""
+        try:
+            return SpockStatus.from_payload(data).as_dict()
+        except StatusFormatError as err:
+            raise UpdateFailed(str(err)) from err
+
+    async def _async_handle_push_status(self, data: dict[str, Any]) -> None:
+        """Aplica una orden recibida por el canal push."""
+        _LOGGER.debug("Orden recibida por push: %s", data)
+        self.session_recorder.record_push(data)
+        # Igual que en el sondeo: la planificación se guarda y no pasa a data
+        data = self._async_process_schedule(data)
+        await self._execute_sgready_actions(data)
+        self.async_set_updated_data(data)
+
+    @callback
+    def _async_push_connection_changed(self, connected: bool) -> None:
+        """
+        Con el canal push activo el sondeo pasa a ser solo de respaldo;
+        si se cae se vuelve al intervalo normal.
+        """
+        self._update_base_interval()
+        _LOGGER.info(
+            "Canal push %s; sondeo cada %s s",
+            "conectado" if connected else "desconectado",
+            self.scheduler.base_interval_s,
+        )
+        if not connected:
+            # Recuperar de inmediato el estado que se haya podido perder
+            self.hass.async_create_task(self.async_request_refresh())
+
+    @callback
+    def _update_base_interval(self) -> None:
+        """
+        Intervalo base del sondeo: se relaja si el canal push está
+        conectado o si la planificación en caché cubre el próximo tramo.
+        """
+        seconds = DEFAULT_SCAN_INTERVAL_S
+        if self.push_client is not None and self.push_client.connected:
+            seconds = max(seconds, PUSH_FALLBACK_SCAN_INTERVAL_S)
+
+        horizon = self.schedule.horizon
+        if horizon is not None and horizon - dt_util.utcnow() > timedelta(
+            seconds=SCHEDULE_SCAN_INTERVAL_S
+        ):
+            seconds = max(seconds, SCHEDULE_SCAN_INTERVAL_S)
+
+        if seconds != self.scheduler.base_interval_s:
+            self.scheduler.base_interval_s = seconds
+            self.update_interval = self.scheduler.next_interval()
+
+    @callback
+    def _async_arm_schedule_timer(self) -> None:
+        """Programa un temporizador en el siguiente cambio planificado."""
+        if self._unsub_schedule_timer is not None:
+            self._unsub_schedule_timer()
+            self._unsub_schedule_timer = None
+
+        boundary = self.schedule.next_boundary(dt_util.utcnow())
+        if boundary is None:
+            return
+
+        _LOGGER.debug("Próximo cambio planificado a las %s", boundary)
+        self._unsub_schedule_timer = async_track_point_in_utc_time(
+            self.hass, self._async_handle_schedule_boundary, boundary
+        )
+
+    @callback
+    def _async_handle_schedule_boundary(self, now: datetime) -> None:
+        """Aplica el estado planificado al llegar a un cambio de tramo."""
+        self._unsub_schedule_timer = None
+        planned = self.schedule.state_at(now)
+        if planned is not None:
+            _LOGGER.info("Aplicando estado planificado: %s", planned)
+            self.hass.async_create_task(self._async_apply_planned(planned))
+        self._async_arm_schedule_timer()
+        self._update_base_interval()
+
+    async def _async_apply_planned(self, planned: dict[str, str]) -> None:
+        """Ejecuta las acciones de un estado planificado y lo publica."""
+        data = {**(self.data or {}), **planned}
+        await self._execute_sgready_actions(data)
+        self.async_set_updated_data(data)
+
+    @callback
+    def _async_process_schedule(self, data: dict[str, Any]) -> dict[str, Any]:
+        """Actualiza la planificación si la respuesta la incluye."""
+        if "schedule" not in data:
             return data
 
-        except UpdateFailed:
+        if self.schedule.update(data["schedule"]):
+            self._async_arm_schedule_timer()
+            self._update_base_interval()
+        return {key: value for key, value in data.items() if key != "schedule"}
+
+    @property
+    def status_breaker(self) -> CircuitBreaker:
+        """Circuit breaker del endpoint de estado."""
+        return self.hub.transport.breakers[ENDPOINT_STATUS]
+
+    def _fallback_status(self) -> dict[str, str] | None:
+        """
+        Estado de cada grupo según la política local elegida mientras el
+        circuit breaker está abierto. None si no hay nada que aplicar.
+        """
+        status: dict[str, str] = {}
+        for group, policy in self.fallback_policies.items():
+            if policy == FALLBACK_SAFE_OFF:
+                status[group] = "stop"
+            elif policy == FALLBACK_SURPLUS:
+                if (surplus := self._local_surplus()) is not None:
+                    status[group] = "start" if surplus >= self.surplus_threshold else "stop"
+            elif self.data and group in self.data:
+                status[group] = self.data[group]
+        return status or None
+
+    def _local_surplus(self) -> float | None:
+        """Excedente local (W) leído del sensor configurado."""
+        if not self.surplus_sensor:
+            return None
+        return self._read_power(self.surplus_sensor)
+
+    async def _async_update_data(self) -> dict[str, Any]:
+        """Ejecuta un ciclo y registra su duración en las métricas."""
+        profiling = self.profiler.active
+        if profiling:
+            self.profiler.async_cycle_started()
+
+        started_at = dt_util.utcnow()
+        started = time.monotonic()
+        self._status_rtt_s = None
+        try:
+            data, fallback_error = await self._async_run_cycle()
+        except Exception as err:
+            self.metrics.record_cycle(
+                started_at, time.monotonic() - started, self._status_rtt_s, CYCLE_ERROR, str(err)
+            )
             raise
+        finally:
+            if profiling:
+                self.profiler.async_cycle_finished(self._cycle_tasks())
+
+        self.metrics.record_cycle(
+            started_at,
+            time.monotonic() - started,
+            self._status_rtt_s,
+            CYCLE_OK if fallback_error is None else CYCLE_FALLBACK,
+            fallback_error,
+        )
+        return data
+
+    def _cycle_tasks(self) -> list[asyncio.Task]:
+        """Tareas en segundo plano lanzadas por el ciclo (telemetría y actuación)."""
+        tasks = [
+            task
+            for running in self._actuation_tasks.values()
+            for _service, _entity_ids, task in running
+            if not task.done()
+        ]
+        if self._telemetry_task is not None and not self._telemetry_task.done():
+            tasks.append(self._telemetry_task)
+        return tasks
+
+    async def _async_run_cycle(self) -> tuple[dict[str, Any], str | None]:
+        """
+        Obtiene los datos de la API (sensores) y ejecuta acciones.
+        Devuelve los datos y, si se usó el estado local, el error de la API.
+        """
+        _LOGGER.debug("Iniciando ciclo de actualización...")
+
+        # La telemetría corre en paralelo; no retrasa ni hace fallar el estado.
+        # En modo streaming se envía desde su propio temporizador.
+        if self.telemetry_mode == TELEMETRY_MODE_SNAPSHOT:
+            self._async_start_telemetry()
+
+        _LOGGER.debug("Fetching API data (SGReady status) from %s", HARDCODED_API_URL)
+        try:
+            try:
+                data = await self._async_fetch_status()
+            except UpdateFailed:
+                raise
+            except SpockTransportError as err:
+                self.session_recorder.record_status_error(err.kind)
+                # Con el breaker abierto no se contacta con la API: no es un
+                # fallo nuevo y no debe alargar el backoff del sondeo
+                if err.kind != ERROR_CIRCUIT_OPEN:
+                    self.scheduler.record_error()
+                raise UpdateFailed(f"Error de red ({err.kind}): {err}") from err
+            except Exception as err:
+                self.scheduler.record_error()
+                raise UpdateFailed(f"Fetcher error: {err}") from err
+        except UpdateFailed as err:
+            self.update_interval = self.scheduler.next_interval()
+            # Sin nube se sigue la planificación en caché mientras cubra el momento actual
+            planned = self.schedule.state_at(dt_util.utcnow())
+            if planned is None and self.status_breaker.state != STATE_CLOSED:
+                planned = self._fallback_status()
+            if planned is None:
+                raise
+            _LOGGER.warning(
+                "API no disponible (%s); se aplica el estado local %s", err, planned
+            )
+            data = {**(self.data or {}), **planned}
+            fallback_error: str | None = str(err)
+        else:
+            data = self._async_process_schedule(data)
+            self.update_interval = self.scheduler.next_interval()
+            fallback_error = None
+
+        try:
+            await self._execute_sgready_actions(data)
         except Exception as err:
             raise UpdateFailed(f"Fetcher error: {err}") from err
+        return data, fallback_error
 
-    async def _execute_sgready_actions(self, status: dict) -> None:
-        """Ejecuta las acciones on/off en los dispositivos."""
+    async def _async_fetch_status(self) -> dict[str, Any]:
+        """
+        Pide el estado de forma condicional (If-None-Match) y actualiza
+        el planificador con las indicaciones del servidor.
+
+        Si el estado no ha cambiado (304 o misma versión) se reutilizan
+        los datos anteriores sin volver a validarlos.
+        """
+        started = time.monotonic()
+        result = await self.hub.async_fetch_status(self)
+        self._status_rtt_s = time.monotonic() - started
+        return self._handle_status_result(result)
+
+    def _handle_status_result(self, result: SpockResponse) -> dict[str, Any]:
+        """Interpreta una respuesta de estado (propia o repartida por el hub)."""
+        self.session_recorder.record_status(result.status, result.body)
+        retry_after = parse_retry_after(result.headers.get("Retry-After"), dt_util.utcnow())
+
+        if result.status == 304 and self.data is not None:
+            _LOGGER.debug("Estado SGReady sin cambios (304)")
+            self.scheduler.record_success(
+                result.headers.get("ETag"), retry_after, self._next_change_at(self.data)
+            )
+            self.metrics.record_status_success()
+            return self.data
+
+        if result.status == 403:
+            self.scheduler.record_error(retry_after)
+            raise UpdateFailed("API Token o Plant ID inválido (403)")
+        if result.status != 200:
+            _LOGGER.error("API error %s: %s", result.status, result.text)
+            self.scheduler.record_error(retry_after)
+            raise UpdateFailed(f"HTTP {result.status}")
+
+        etag = result.headers.get("ETag")
+        data = result.body
+
+        version = data.get("version") if isinstance(data, dict) else None
+        if version is not None and self.data and self.data.get("version") == version:
+            _LOGGER.debug("Estado SGReady sin cambios (versión %s)", version)
+            data = self.data
+        else:
+            try:
+                data = self._parse_status(data)
+            except UpdateFailed:
+                self.scheduler.record_error(retry_after)
+                raise
+
+        self.scheduler.record_success(etag, retry_after, self._next_change_at(data))
+        self.metrics.record_status_success()
+        return data
+
+    async def async_handle_hub_status(self, result: SpockResponse) -> None:
+        """
+        Aplica el estado que el hub ha obtenido para esta planta en la
+        petición por lotes de otra. Cuenta como un ciclo completo: también
+        lanza la telemetría, de modo que las plantas quedan alineadas.
+        """
+        try:
+            data = self._handle_status_result(result)
+        except UpdateFailed as err:
+            _LOGGER.debug("Estado repartido por el hub no válido: %s", err)
+            return
+
+        data = self._async_process_schedule(data)
+        self.update_interval = self.scheduler.next_interval()
+        if self.telemetry_mode == TELEMETRY_MODE_SNAPSHOT:
+            self._async_start_telemetry()
+        await self._execute_sgready_actions(data)
+        self.async_set_updated_data(data)
+
+    @staticmethod
+    def _next_change_at(data: dict[str, Any]) -> datetime | None:
+        """Hora del próximo cambio de estado anunciada por el servidor."""
+        value = data.get("next_change_at")
+        if not isinstance(value, str):
+            return None
+        return dt_util.parse_datetime(value)
+
+    @callback
+    def _async_start_actuation(
+        self, group: str, entity_ids: list[str], service: str, desired_state: str
+    ) -> None:
+        """
+        Lanza la actuación escalonada de un grupo en segundo plano.
+
+        Las entidades que ya se están conmutando con la misma orden no se
+        repiten; si la orden ha cambiado se cancela lo que esté en curso.
+        """
+        running = [
+            item for item in self._actuation_tasks.get(group, []) if not item[2].done()
+        ]
+        if any(item[0] != service for item in running):
+            for item in running:
+                item[2].cancel()
+            running = []
+
+        in_progress = {entity_id for item in running for entity_id in item[1]}
+        pending = [entity_id for entity_id in entity_ids if entity_id not in in_progress]
+        if not pending:
+            _LOGGER.debug("Actuación %s del grupo %s aún en curso", service, group)
+            self._actuation_tasks[group] = running
+            return
+
+        task = self.hass.async_create_background_task(
+            self._async_run_actuation(group, pending, service, desired_state),
+            f"{DOMAIN}_actuation_{group}",
+        )
+        running.append((service, set(pending), task))
+        self._actuation_tasks[group] = running
+
+    async def _async_run_actuation(
+        self, group: str, entity_ids: list[str], service: str, desired_state: str
+    ) -> None:
+        """Ejecuta la actuación de un grupo y registra el resultado."""
+        results = await self.actuation.async_apply(entity_ids, service, desired_state)
+        failed = [entity_id for entity_id, ok in results.items() if not ok]
+        if failed:
+            _LOGGER.error(
+                "Acción %s para grupo %s no confirmada en: %s", service, group, failed
+            )
+            # Se vuelve a revisar el grupo con la próxima orden
+            self.reconciler.async_resync()
+        self.async_update_listeners()
+
+    async def async_first_refresh_background(self) -> None:
+        """Primer fetch en segundo plano (modo de arranque rápido)."""
+        started = time.monotonic()
+        await self.async_refresh()
+        self.first_refresh_duration_s = round(time.monotonic() - started, 3)
+        if self.last_update_success:
+            _LOGGER.info(
+                "Spock Energy Control: primer fetch realizado en %.3f s.",
+                self.first_refresh_duration_s,
+            )
+        self.async_update_listeners()
+
+    def _actions_enabled(self) -> bool:
+        """Indica si el interruptor de acciones está activado."""
         entry_id = self.config_entry.entry_id
-        run_actions = self.hass.data[DOMAIN].get(entry_id, {}).get("run_actions", True)
-        
-        if not run_actions:
+        return self.hass.data[DOMAIN].get(entry_id, {}).get("run_actions", True)
+
+    def _base_groups(self) -> dict[str, list[str]]:
+        """Entidades configuradas de cada grupo."""
+        return {"green": self.green_devices, "yellow": self.yellow_devices}
+
+    def _dispatch_target(self, status: dict) -> float | None:
+        """Objetivo de potencia: el sensor configurado o el enviado por la API."""
+        if self.dispatch_target_sensor:
+            return self._read_power(self.dispatch_target_sensor)
+        value = status.get(STATUS_POWER_TARGET)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        return None
+
+    @callback
+    def _async_dispatch(
+        self,
+        groups: dict[str, list[str]],
+        commands: dict[str, tuple[str, str, str]],
+        status: dict,
+    ) -> tuple[dict[str, list[str]], dict[str, tuple[str, str, str]]]:
+        """
+        Con un objetivo de potencia, divide cada grupo arrancado en las
+        entidades elegidas por el repartidor y el resto (grupo `<g>_shed`,
+        que se apaga). La prioridad es el orden de los grupos (green antes
+        que yellow) y, dentro de cada uno, el orden configurado.
+        """
+        assert self.dispatcher is not None
+        target = self._dispatch_target(status)
+        started = [
+            group for group in groups if group in commands and commands[group][1] == "on"
+        ]
+        if target is None or not started:
+            self.dispatcher.reset()
+            return groups, commands
+
+        plan = self.dispatcher.solve(
+            (entity_id for group in started for entity_id in groups[group]), target
+        )
+        selected = set(plan.selected)
+
+        split_groups = dict(groups)
+        split_commands = dict(commands)
+        for group in started:
+            split_groups[group] = [e for e in groups[group] if e in selected]
+            split_groups[f"{group}_shed"] = [e for e in groups[group] if e not in selected]
+            split_commands[f"{group}_shed"] = ("turn_off", "off", commands[group][2])
+        return split_groups, split_commands
+
+    @callback
+    def _async_schedule_dispatch(self, _event: Event | None = None) -> None:
+        """Programa un nuevo reparto tras un cambio de lecturas u objetivo."""
+        if (
+            self.dispatcher is None
+            or self.dispatcher.plan is None
+            or self._unsub_dispatch_timer is not None
+        ):
+            return
+        self._unsub_dispatch_timer = async_call_later(
+            self.hass, DISPATCH_RESOLVE_DELAY_S, self._async_handle_dispatch_timer
+        )
+
+    @callback
+    def _async_handle_dispatch_timer(self, _now: datetime) -> None:
+        """Recalcula el reparto con la última orden recibida."""
+        self._unsub_dispatch_timer = None
+        if self.data:
+            self.hass.async_create_background_task(
+                self._execute_sgready_actions(self.data), f"{DOMAIN}_dispatch"
+            )
+
+    async def _execute_sgready_actions(self, status: dict) -> None:
+        """
+        Pasa la orden de cada grupo al reconciliador, que solo actúa en
+        las transiciones (las desviaciones las corrige él mismo). Con el
+        reparto activo los grupos se dividen según el objetivo de potencia.
+        """
+        if not self._actions_enabled():
             _LOGGER.debug("Acciones deshabilitadas por el interruptor. Omitiendo ejecución.")
             return
 
-        groups = {"green": self.green_devices, "yellow": self.yellow_devices}
-        
+        groups = self._base_groups()
+        # grupo -> (servicio, estado deseado, estado de la API)
+        commands: dict[str, tuple[str, str, str]] = {}
+
         for group, api_state in status.items():
             all_targets = groups.get(group) or []
             if not all_targets:
                 _LOGGER.debug("Sin dispositivos en grupo %s; se omite.", group)
                 continue
 
-            service_to_call: str | None = None
-            desired_state: str | None = None
-
             if api_state == "start":
-                service_to_call = "turn_on"
-                desired_state = "on"
+                commands[group] = ("turn_on", "on", api_state)
             elif api_state == "stop":
-                service_to_call = "turn_off"
-                desired_state = "off"
-            
-            if not service_to_call or not desired_state:
+                commands[group] = ("turn_off", "off", api_state)
+            else:
                 _LOGGER.warning("Estado desconocido para %s: %s", group, api_state)
-                continue
 
-            entities_to_action = []
-            for entity_id in all_targets:
-                try:
-                    current_state_obj = self.hass.states.get(entity_id)
-
-                    if not current_state_obj:
-                        _LOGGER.warning(
-                            "No se pudo encontrar el estado de la entidad '%s' (grupo %s). Se omitirá.", 
-                            entity_id,
-                            group
-                        )
-                        continue
-                    
-                    current_state = current_state_obj.state
-                    if current_state != desired_state:
-                        entities_to_action.append(entity_id)
-                
-                except Exception as e:
-                    _LOGGER.error("Error al procesar entidad %s: %s", entity_id, e)
+        if self.dispatcher is not None:
+            groups, commands = self._async_dispatch(groups, commands, status)
+
+        self.reconciler.async_set_groups(groups)
+
+        for group, (service_to_call, desired_state, api_state) in commands.items():
+            entities_to_action = self.reconciler.async_set_command(
+                group, service_to_call, desired_state
+            )
 
             if entities_to_action:
                 _LOGGER.info(
@@ -320,14 +1475,8 @@ class SpockEnergyCoordinator(DataUpdateCoordinator[dict[str, Any]]):
                     group, 
                     entities_to_action
                 )
-                await self.hass.services.async_call(
-                    "homeassistant",
-                    service_to_call,
-                    {"entity_id": entities_to_action},
-                    blocking=False,
-                )
             else:
-                _LOGGER.info(
+                _LOGGER.debug(
                     "Acción %s (desde API=%s) para grupo %s: No se requieren cambios de estado.",
                     service_to_call,
                     api_state,
@@ -0,0 +1,323 @@
+"""Canal de actuación escalonada de Spock Energy Control."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+import logging
+import time
+
+from homeassistant.core import Event, HomeAssistant, callback, split_entity_id
+from homeassistant.helpers.event import async_track_state_change_event
+
+_LOGGER = logging.getLogger(__name__)
+
+# Dominio genérico que reparte por dominios cuando no hay servicio propio
+GENERIC_DOMAIN = "homeassistant"
+# Servicios con los que se actúa sobre los grupos
+ACTUATION_SERVICES = ("turn_on", "turn_off")
+
+
+@dataclass
+class EntityActuationStats:
+    """Estadísticas de actuación de una entidad."""
+
+    attempts: int = 0
+    failures: int = 0
+    last_latency_s: float | None = None
+
+
+@dataclass
+class ServiceCallStats:
+    """Tiempos de las llamadas a un servicio (p. ej. switch.turn_on)."""
+
+    calls: int = 0
+    entities: int = 0
+    total_s: float = 0.0
+    last_s: float | None = None
+
+
+class ActuationPipeline:
+    """
+    Conmuta las entidades de un grupo de forma escalonada.
+
+    - Entre el arranque de una entidad y la siguiente espera `stagger_s`.
+    - Como máximo `max_concurrent` entidades en curso a la vez por grupo.
+    - Sin escalonado se hace una llamada por dominio con hasta
+      `max_concurrent` entidades; el siguiente bloque no sale hasta que
+      el anterior se confirma.
+    - Se llama directamente al servicio del dominio (switch.turn_on,
+      automation.turn_on...) y solo se recurre a homeassistant.turn_on si
+      el dominio no lo tiene.
+    - Cada orden se confirma esperando el cambio de estado; si no llega
+      en `confirm_timeout_s` se reintenta hasta `max_retries` veces. Una
+      llamada al servicio que no responde en ese plazo cuenta como no
+      confirmada.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        stagger_s: float,
+        max_concurrent: int,
+        confirm_timeout_s: float,
+        max_retries: int,
+    ) -> None:
+        """Inicializa el canal."""
+        self.hass = hass
+        self.stagger_s = stagger_s
+        self.max_concurrent = max(1, max_concurrent)
+        self.confirm_timeout_s = confirm_timeout_s
+        self.max_retries = max_retries
+        self.stats: dict[str, EntityActuationStats] = {}
+        self.call_stats: dict[str, ServiceCallStats] = {}
+        self.service_calls = 0
+        # servicio -> entidad -> dominio del servicio, precalculado al
+        # cambiar la configuración
+        self._service_domains: dict[str, dict[str, str]] = {}
+        # Se avisa de cada llamada (dominio, servicio, entidades); lo usa
+        # la grabación de sesiones
+        self.call_listener: Callable[[str, str, list[str]], None] | None = None
+
+    @property
+    def total_failures(self) -> int:
+        """Número total de actuaciones no confirmadas."""
+        return sum(stats.failures for stats in self.stats.values())
+
+    @callback
+    def async_set_entities(self, entity_ids: Iterable[str]) -> None:
+        """Precalcula, para cada servicio, el dominio de cada entidad controlada."""
+        entity_ids = list(entity_ids)
+        self._service_domains = {
+            service: {
+                entity_id: self._resolve_domain(entity_id, service)
+                for entity_id in entity_ids
+            }
+            for service in ACTUATION_SERVICES
+        }
+
+    def _resolve_domain(self, entity_id: str, service: str) -> str:
+        """Dominio cuyo servicio `service` se usa para la entidad."""
+        domain = split_entity_id(entity_id)[0]
+        if self.hass.services.has_service(domain, service):
+            return domain
+        return GENERIC_DOMAIN
+
+    def _service_domain(self, entity_id: str, service: str) -> str:
+        """Dominio precalculado; solo se vuelve a consultar si no lo había."""
+        domains = self._service_domains.setdefault(service, {})
+        domain = domains.get(entity_id)
+        if domain is None or domain == GENERIC_DOMAIN:
+            # El dominio puede registrar su servicio después del arranque
+            domain = domains[entity_id] = self._resolve_domain(entity_id, service)
+        return domain
+
+    def _plan(self, entity_ids: list[str], service: str) -> dict[str, list[str]]:
+        """Agrupa las entidades por dominio de servicio, conservando el orden."""
+        plan: dict[str, list[str]] = {}
+        for entity_id in entity_ids:
+            plan.setdefault(self._service_domain(entity_id, service), []).append(entity_id)
+        return plan
+
+    async def async_apply(
+        self, entity_ids: list[str], service: str, desired_state: str
+    ) -> dict[str, bool]:
+        """Aplica `service` a las entidades. Devuelve si se confirmó cada una."""
+        if not self.stagger_s:
+            return await self._async_apply_by_domain(entity_ids, service, desired_state)
+
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        tasks: list[asyncio.Task[bool]] = []
+
+        try:
+            for index, entity_id in enumerate(entity_ids):
+                if index and self.stagger_s:
+                    await asyncio.sleep(self.stagger_s)
+                await semaphore.acquire()
+                tasks.append(
+                    self.hass.async_create_task(
+                        self._async_actuate(entity_id, service, desired_state, semaphore)
+                    )
+                )
+            confirmed = await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        return dict(zip(entity_ids, confirmed))
+
+    async def _async_apply_by_domain(
+        self, entity_ids: list[str], service: str, desired_state: str
+    ) -> dict[str, bool]:
+        """
+        Llamadas por dominio en bloques de `max_concurrent` entidades, uno
+        tras otro; los reintentos solo llevan las no confirmadas.
+        """
+        results = dict.fromkeys(entity_ids, False)
+        pending = list(entity_ids)
+
+        for attempt in range(self.max_retries + 1):
+            for entity_id in pending:
+                self.stats.setdefault(entity_id, EntityActuationStats()).attempts += 1
+
+            for domain, batch in self._plan(pending, service).items():
+                for start in range(0, len(batch), self.max_concurrent):
+                    chunk = batch[start : start + self.max_concurrent]
+                    confirmed = await self._async_call_batch(
+                        domain, chunk, service, desired_state
+                    )
+                    for entity_id in confirmed:
+                        results[entity_id] = True
+
+            pending = [entity_id for entity_id in pending if not results[entity_id]]
+            for entity_id in pending:
+                self.stats[entity_id].failures += 1
+            if not pending:
+                break
+            _LOGGER.warning(
+                "%s entidades no llegaron a '%s' tras %s s (intento %s/%s): %s",
+                len(pending),
+                desired_state,
+                self.confirm_timeout_s,
+                attempt + 1,
+                self.max_retries + 1,
+                pending,
+            )
+
+        return results
+
+    async def _async_call_batch(
+        self, domain: str, entity_ids: list[str], service: str, desired_state: str
+    ) -> set[str]:
+        """Llama una vez al servicio del dominio y devuelve las entidades confirmadas."""
+        waiting = set(entity_ids)
+        all_confirmed = asyncio.Event()
+        started = time.monotonic()
+
+        @callback
+        def _state_changed(event: Event) -> None:
+            new_state = event.data.get("new_state")
+            if new_state and new_state.state == desired_state:
+                waiting.discard(event.data["entity_id"])
+                self._record_latency(event.data["entity_id"], started)
+                if not waiting:
+                    all_confirmed.set()
+
+        # Suscribirse antes de llamar para no perder un cambio inmediato
+        unsub = async_track_state_change_event(self.hass, entity_ids, _state_changed)
+        try:
+            await self._async_call(domain, service, entity_ids)
+            for entity_id in list(waiting):
+                current = self.hass.states.get(entity_id)
+                if current and current.state == desired_state:
+                    waiting.discard(entity_id)
+                    self._record_latency(entity_id, started)
+            if waiting:
+                await asyncio.wait_for(all_confirmed.wait(), self.confirm_timeout_s)
+        except asyncio.TimeoutError:
+            pass
+        except Exception as err:
+            _LOGGER.error("Error al llamar a %s.%s: %s", domain, service, err)
+        finally:
+            unsub()
+
+        return set(entity_ids) - waiting
+
+    async def _async_call(self, domain: str, service: str, entity_ids: list[str]) -> None:
+        """Llamada directa al servicio, registrando su duración."""
+        self.service_calls += 1
+        if self.call_listener is not None:
+            self.call_listener(domain, service, entity_ids)
+        started = time.monotonic()
+        try:
+            # Un servicio colgado no debe bloquear la actuación indefinidamente
+            async with asyncio.timeout(self.confirm_timeout_s):
+                await self.hass.services.async_call(
+                    domain,
+                    service,
+                    {"entity_id": entity_ids if len(entity_ids) > 1 else entity_ids[0]},
+                    blocking=True,
+                )
+        except asyncio.TimeoutError:
+            _LOGGER.warning(
+                "%s.%s no respondió en %s s: %s",
+                domain,
+                service,
+                self.confirm_timeout_s,
+                entity_ids,
+            )
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            stats = self.call_stats.setdefault(f"{domain}.{service}", ServiceCallStats())
+            stats.calls += 1
+            stats.entities += len(entity_ids)
+            stats.total_s += elapsed
+            stats.last_s = round(elapsed, 4)
+
+    def _record_latency(self, entity_id: str, started: float) -> None:
+        """Guarda la latencia de confirmación de una entidad."""
+        stats = self.stats.setdefault(entity_id, EntityActuationStats())
+        stats.last_latency_s = round(time.monotonic() - started, 3)
+
+    async def _async_actuate(
+        self,
+        entity_id: str,
+        service: str,
+        desired_state: str,
+        semaphore: asyncio.Semaphore,
+    ) -> bool:
+        """Conmuta una entidad con confirmación y reintentos."""
+        stats = self.stats.setdefault(entity_id, EntityActuationStats())
+        try:
+            for attempt in range(self.max_retries + 1):
+                stats.attempts += 1
+                started = time.monotonic()
+                if await self._async_call_and_confirm(entity_id, service, desired_state):
+                    stats.last_latency_s = round(time.monotonic() - started, 3)
+                    return True
+
+                stats.failures += 1
+                _LOGGER.warning(
+                    "La entidad %s no llegó a '%s' tras %s s (intento %s/%s)",
+                    entity_id,
+                    desired_state,
+                    self.confirm_timeout_s,
+                    attempt + 1,
+                    self.max_retries + 1,
+                )
+            return False
+        finally:
+            semaphore.release()
+
+    async def _async_call_and_confirm(
+        self, entity_id: str, service: str, desired_state: str
+    ) -> bool:
+        """Llama al servicio y espera a que la entidad alcance el estado."""
+        confirmed: asyncio.Future[bool] = self.hass.loop.create_future()
+
+        @callback
+        def _state_changed(event: Event) -> None:
+            new_state = event.data.get("new_state")
+            if new_state and new_state.state == desired_state and not confirmed.done():
+                confirmed.set_result(True)
+
+        # Suscribirse antes de llamar para no perder un cambio inmediato
+        unsub = async_track_state_change_event(self.hass, [entity_id], _state_changed)
+        try:
+            await self._async_call(
+                self._service_domain(entity_id, service), service, [entity_id]
+            )
+            current = self.hass.states.get(entity_id)
+            if current and current.state == desired_state:
+                return True
+            await asyncio.wait_for(confirmed, self.confirm_timeout_s)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        except Exception as err:
+            _LOGGER.error("Error al actuar sobre %s: %s", entity_id, err)
+            return False
+        finally:
+            unsub()
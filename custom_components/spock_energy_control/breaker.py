@@ -0,0 +1,78 @@
+"""Circuit breaker para los endpoints de Spock."""
+from __future__ import annotations
+
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+BREAKER_STATES = [STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN]
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker clásico de tres estados.
+
+    - closed: las peticiones pasan; `failure_threshold` fallos seguidos lo abren.
+    - open: no se hace ninguna petición durante `reset_timeout_s` segundos.
+    - half_open: se deja pasar una única petición de prueba; si va bien
+      se cierra y si falla se vuelve a abrir.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout_s: float) -> None:
+        """Inicializa el breaker cerrado."""
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.state = STATE_CLOSED
+        self.trips = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Indica si se puede hacer una petición ahora."""
+        if self.state == STATE_CLOSED:
+            return True
+        if self.state == STATE_OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout_s:
+                return False
+            self.state = STATE_HALF_OPEN
+            self._probe_in_flight = False
+            _LOGGER.debug("Breaker %s semiabierto: se prueba una petición", self.name)
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        """Registra una petición correcta."""
+        if self.state != STATE_CLOSED:
+            _LOGGER.info("Breaker %s cerrado: la API vuelve a responder", self.name)
+        self.state = STATE_CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Registra un fallo y abre el breaker si corresponde."""
+        self._failures += 1
+        self._probe_in_flight = False
+        if self.state == STATE_HALF_OPEN or (
+            self.state == STATE_CLOSED and self._failures >= self.failure_threshold
+        ):
+            self.state = STATE_OPEN
+            self._opened_at = time.monotonic()
+            self.trips += 1
+            _LOGGER.warning(
+                "Breaker %s abierto tras %s fallos; sin peticiones durante %s s",
+                self.name,
+                self._failures,
+                self.reset_timeout_s,
+            )
+
+    def abort(self) -> None:
+        """La petición de prueba se canceló sin resultado."""
+        self._probe_in_flight = False
@@ -1,19 +1,17 @@
 """Config flow for Spock Energy Control."""
 from __future__ import annotations
 
-import asyncio
 import logging
 from typing import Any
 
 import voluptuous as vol
-from aiohttp import ClientError
-
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.config_entries import ConfigFlow, ConfigEntry, OptionsFlow
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.selector import (
     EntitySelector,
     EntitySelectorConfig,
+    SelectSelector,
+    SelectSelectorConfig,
 )
 from homeassistant.data_entry_flow import FlowResult
 
@@ -23,8 +21,47 @@ from .const import (
     CONF_PLANT_ID, 
     CONF_GREEN_DEVICES,
     CONF_YELLOW_DEVICES,
-    HARDCODED_API_URL,
+    CONF_TELEMETRY_BATCH,
+    CONF_TELEMETRY_CONCURRENCY,
+    CONF_TELEMETRY_MODE,
+    CONF_TELEMETRY_FLUSH_INTERVAL,
+    CONF_TELEMETRY_QUEUE_SIZE,
+    CONF_PUSH_ENABLED,
+    CONF_ACTUATION_STAGGER,
+    CONF_ACTUATION_MAX_CONCURRENT,
+    CONF_RECONCILE_GRACE,
+    CONF_MIN_SWITCH_INTERVAL,
+    CONF_FAST_START,
+    CONF_FALLBACK_GREEN,
+    CONF_FALLBACK_YELLOW,
+    CONF_SURPLUS_SENSOR,
+    CONF_SURPLUS_THRESHOLD,
+    CONF_DEADBAND_ABSOLUTE,
+    CONF_DEADBAND_RELATIVE,
+    CONF_TELEMETRY_HEARTBEAT,
+    CONF_DISPATCH_ENABLED,
+    CONF_DISPATCH_TARGET_SENSOR,
+    DEFAULT_TELEMETRY_BATCH,
+    DEFAULT_TELEMETRY_CONCURRENCY,
+    DEFAULT_TELEMETRY_MODE,
+    DEFAULT_TELEMETRY_FLUSH_INTERVAL_S,
+    DEFAULT_TELEMETRY_QUEUE_SIZE,
+    DEFAULT_PUSH_ENABLED,
+    DEFAULT_ACTUATION_STAGGER_S,
+    DEFAULT_ACTUATION_MAX_CONCURRENT,
+    DEFAULT_RECONCILE_GRACE_S,
+    DEFAULT_MIN_SWITCH_INTERVAL_S,
+    DEFAULT_FAST_START,
+    DEFAULT_FALLBACK_POLICY,
+    DEFAULT_SURPLUS_THRESHOLD_W,
+    DEFAULT_DEADBAND_ABSOLUTE_W,
+    DEFAULT_DEADBAND_RELATIVE_PCT,
+    DEFAULT_TELEMETRY_HEARTBEAT_S,
+    DEFAULT_DISPATCH_ENABLED,
+    FALLBACK_POLICIES,
+    TELEMETRY_MODES,
 )
+from .transport import ENDPOINT_STATUS, SpockTransport, SpockTransportError
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -33,28 +70,24 @@ async def validate_auth(
     hass: HomeAssistant, api_token: str, plant_id: str
 ) -> dict[str, str]:
     """Valida la autenticación haciendo un POST con el plant_id."""
-    session = async_get_clientsession(hass)
-    headers = {"X-Auth-Token": api_token}
-    json_payload = {"plant_id": plant_id}
+    transport = SpockTransport(hass, api_token)
     
     try:
-        async with session.post(
-            HARDCODED_API_URL, 
-            headers=headers, 
-            json=json_payload, 
-            timeout=10
-        ) as resp:
-            if resp.status == 403:
-                # 403 sigue siendo "Token inválido" o "Plant ID incorrecto"
-                return {"base": "invalid_auth"}
-            resp.raise_for_status() 
-            return {} 
+        resp = await transport.async_post(ENDPOINT_STATUS, {"plant_id": plant_id})
+        if resp.status == 403:
+            # 403 sigue siendo "Token inválido" o "Plant ID incorrecto"
+            return {"base": "invalid_auth"}
+        if resp.error_kind is not None:
+            return {"base": "cannot_connect"}
+        return {} 
             
-    except (asyncio.TimeoutError, ClientError):
+    except SpockTransportError:
         return {"base": "cannot_connect"}
     except Exception:
         _LOGGER.exception("Error desconocido al validar API token")
         return {"base": "unknown"}
+    finally:
+        await transport.async_close()
 
 
 class SpockEnergyControlConfigFlow(ConfigFlow, domain=DOMAIN):
@@ -189,6 +222,127 @@ class OptionsFlowHandler(OptionsFlow):
                         domain=["switch", "light", "input_boolean", "automation"]
                     )
                 ),
+                vol.Optional(
+                    CONF_TELEMETRY_BATCH,
+                    default=current_config.get(CONF_TELEMETRY_BATCH, DEFAULT_TELEMETRY_BATCH),
+                ): bool,
+                vol.Optional(
+                    CONF_TELEMETRY_CONCURRENCY,
+                    default=current_config.get(
+                        CONF_TELEMETRY_CONCURRENCY, DEFAULT_TELEMETRY_CONCURRENCY
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=64)),
+                vol.Optional(
+                    CONF_TELEMETRY_MODE,
+                    default=current_config.get(CONF_TELEMETRY_MODE, DEFAULT_TELEMETRY_MODE),
+                ): SelectSelector(
+                    SelectSelectorConfig(
+                        options=TELEMETRY_MODES,
+                        translation_key=CONF_TELEMETRY_MODE,
+                    )
+                ),
+                vol.Optional(
+                    CONF_TELEMETRY_FLUSH_INTERVAL,
+                    default=current_config.get(
+                        CONF_TELEMETRY_FLUSH_INTERVAL, DEFAULT_TELEMETRY_FLUSH_INTERVAL_S
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=3600)),
+                vol.Optional(
+                    CONF_TELEMETRY_QUEUE_SIZE,
+                    default=current_config.get(
+                        CONF_TELEMETRY_QUEUE_SIZE, DEFAULT_TELEMETRY_QUEUE_SIZE
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=500000)),
+                vol.Optional(
+                    CONF_PUSH_ENABLED,
+                    default=current_config.get(CONF_PUSH_ENABLED, DEFAULT_PUSH_ENABLED),
+                ): bool,
+                vol.Optional(
+                    CONF_ACTUATION_STAGGER,
+                    default=current_config.get(
+                        CONF_ACTUATION_STAGGER, DEFAULT_ACTUATION_STAGGER_S
+                    ),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=600)),
+                vol.Optional(
+                    CONF_ACTUATION_MAX_CONCURRENT,
+                    default=current_config.get(
+                        CONF_ACTUATION_MAX_CONCURRENT, DEFAULT_ACTUATION_MAX_CONCURRENT
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+                vol.Optional(
+                    CONF_RECONCILE_GRACE,
+                    default=current_config.get(CONF_RECONCILE_GRACE, DEFAULT_RECONCILE_GRACE_S),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=3600)),
+                vol.Optional(
+                    CONF_MIN_SWITCH_INTERVAL,
+                    default=current_config.get(
+                        CONF_MIN_SWITCH_INTERVAL, DEFAULT_MIN_SWITCH_INTERVAL_S
+                    ),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=3600)),
+                vol.Optional(
+                    CONF_FAST_START,
+                    default=current_config.get(CONF_FAST_START, DEFAULT_FAST_START),
+                ): bool,
+                vol.Optional(
+                    CONF_FALLBACK_GREEN,
+                    default=current_config.get(CONF_FALLBACK_GREEN, DEFAULT_FALLBACK_POLICY),
+                ): SelectSelector(
+                    SelectSelectorConfig(
+                        options=FALLBACK_POLICIES,
+                        translation_key="fallback_policy",
+                    )
+                ),
+                vol.Optional(
+                    CONF_FALLBACK_YELLOW,
+                    default=current_config.get(CONF_FALLBACK_YELLOW, DEFAULT_FALLBACK_POLICY),
+                ): SelectSelector(
+                    SelectSelectorConfig(
+                        options=FALLBACK_POLICIES,
+                        translation_key="fallback_policy",
+                    )
+                ),
+                vol.Optional(
+                    CONF_SURPLUS_SENSOR,
+                    description={"suggested_value": current_config.get(CONF_SURPLUS_SENSOR)},
+                ): EntitySelector(
+                    EntitySelectorConfig(domain="sensor", device_class="power")
+                ),
+                vol.Optional(
+                    CONF_SURPLUS_THRESHOLD,
+                    default=current_config.get(
+                        CONF_SURPLUS_THRESHOLD, DEFAULT_SURPLUS_THRESHOLD_W
+                    ),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_DEADBAND_ABSOLUTE,
+                    default=current_config.get(
+                        CONF_DEADBAND_ABSOLUTE, DEFAULT_DEADBAND_ABSOLUTE_W
+                    ),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=10000)),
+                vol.Optional(
+                    CONF_DEADBAND_RELATIVE,
+                    default=current_config.get(
+                        CONF_DEADBAND_RELATIVE, DEFAULT_DEADBAND_RELATIVE_PCT
+                    ),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=100)),
+                vol.Optional(
+                    CONF_TELEMETRY_HEARTBEAT,
+                    default=current_config.get(
+                        CONF_TELEMETRY_HEARTBEAT, DEFAULT_TELEMETRY_HEARTBEAT_S
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=60, max=86400)),
+                vol.Optional(
+                    CONF_DISPATCH_ENABLED,
+                    default=current_config.get(CONF_DISPATCH_ENABLED, DEFAULT_DISPATCH_ENABLED),
+                ): bool,
+                vol.Optional(
+                    CONF_DISPATCH_TARGET_SENSOR,
+                    description={
+                        "suggested_value": current_config.get(CONF_DISPATCH_TARGET_SENSOR)
+                    },
+                ): EntitySelector(
+                    EntitySelectorConfig(domain="sensor", device_class="power")
+                ),
             }
         )
 
@@ -8,9 +8,142 @@ CONF_API_TOKEN = "api_token"
 CONF_PLANT_ID = "plant_id" 
 CONF_GREEN_DEVICES = "green_devices"
 CONF_YELLOW_DEVICES = "yellow_devices"
+CONF_TELEMETRY_BATCH = "telemetry_batch"
+CONF_TELEMETRY_CONCURRENCY = "telemetry_concurrency"
+CONF_TELEMETRY_MODE = "telemetry_mode"
+CONF_TELEMETRY_FLUSH_INTERVAL = "telemetry_flush_interval"
+CONF_TELEMETRY_QUEUE_SIZE = "telemetry_queue_size"
+CONF_PUSH_ENABLED = "push_enabled"
+CONF_ACTUATION_STAGGER = "actuation_stagger"
+CONF_ACTUATION_MAX_CONCURRENT = "actuation_max_concurrent"
+CONF_RECONCILE_GRACE = "reconcile_grace"
+CONF_MIN_SWITCH_INTERVAL = "min_switch_interval"
+CONF_FAST_START = "fast_start"
+CONF_FALLBACK_GREEN = "fallback_green"
+CONF_FALLBACK_YELLOW = "fallback_yellow"
+CONF_SURPLUS_SENSOR = "surplus_sensor"
+CONF_SURPLUS_THRESHOLD = "surplus_threshold"
+CONF_DEADBAND_ABSOLUTE = "deadband_absolute"
+CONF_DEADBAND_RELATIVE = "deadband_relative"
+CONF_TELEMETRY_HEARTBEAT = "telemetry_heartbeat"
+CONF_DISPATCH_ENABLED = "dispatch_enabled"
+CONF_DISPATCH_TARGET_SENSOR = "dispatch_target_sensor"
 
 # --- Defaults ---
 DEFAULT_SCAN_INTERVAL_S = 60
+# Límites del sondeo adaptativo
+MIN_SCAN_INTERVAL_S = 10
+MAX_SCAN_INTERVAL_S = 900
+DEFAULT_TELEMETRY_BATCH = True
+DEFAULT_TELEMETRY_CONCURRENCY = 8
+DEFAULT_TELEMETRY_FLUSH_INTERVAL_S = 15
+DEFAULT_TELEMETRY_QUEUE_SIZE = 20000
+DEFAULT_PUSH_ENABLED = False
+DEFAULT_ACTUATION_STAGGER_S = 0
+DEFAULT_ACTUATION_MAX_CONCURRENT = 10
+DEFAULT_RECONCILE_GRACE_S = 30
+DEFAULT_MIN_SWITCH_INTERVAL_S = 0
+DEFAULT_FAST_START = True
+DEFAULT_FALLBACK_POLICY = "hold"
+DEFAULT_SURPLUS_THRESHOLD_W = 1000
+DEFAULT_DEADBAND_ABSOLUTE_W = 5
+DEFAULT_DEADBAND_RELATIVE_PCT = 5
+DEFAULT_TELEMETRY_HEARTBEAT_S = 900
+DEFAULT_DISPATCH_ENABLED = False
+
+# Con el canal push conectado el sondeo es solo de respaldo
+PUSH_FALLBACK_SCAN_INTERVAL_S = 300
+# Con una planificación en caché que cubre el futuro se sondea menos
+SCHEDULE_SCAN_INTERVAL_S = 900
+
+# --- Telemetría ---
+# snapshot: una lectura por sensor en cada ciclo
+# stream: se envía cada cambio de estado, acumulado en un buffer
+TELEMETRY_MODE_SNAPSHOT = "snapshot"
+TELEMETRY_MODE_STREAM = "stream"
+TELEMETRY_MODES = [TELEMETRY_MODE_SNAPSHOT, TELEMETRY_MODE_STREAM]
+DEFAULT_TELEMETRY_MODE = TELEMETRY_MODE_SNAPSHOT
+TELEMETRY_BUFFER_MAX_SAMPLES = 240
+
+# Reenvío de la cola offline (lotes limitados para no saturar el servidor)
+TELEMETRY_REPLAY_BATCH_SIZE = 200
+TELEMETRY_REPLAY_INTERVAL_S = 2
+
+# Respuestas con las que el servidor indica que no admite peticiones por lotes
+BATCH_UNSUPPORTED_STATUS = (404, 405, 415)
+# Lote con contenido rechazado (p. ej. un registro no válido): se reintenta
+# más tarde, pero el servidor sí admite el formato
+BATCH_REJECTED_STATUS = (400, 422)
+
+# Ventana en la que el hub reutiliza el estado ya pedido para otra planta
+HUB_DEDUP_WINDOW_S = 5
+
+# --- Actuación ---
+ACTUATION_CONFIRM_TIMEOUT_S = 15
+ACTUATION_MAX_RETRIES = 2
+
+# --- Reparto por presupuesto de potencia ---
+# Campo de la respuesta de estado con el objetivo de potencia (W)
+STATUS_POWER_TARGET = "power_target_w"
+# Consumo supuesto de una carga que aún no se ha medido nunca
+DISPATCH_DEFAULT_DRAW_W = 1000
+# Por debajo de esta lectura la carga se considera en reposo
+DISPATCH_MIN_ON_W = 10
+DISPATCH_TOLERANCE_W = 100
+# Espera para agrupar cambios de lecturas antes de recalcular el reparto
+DISPATCH_RESOLVE_DELAY_S = 5
+
+# --- Transporte HTTP ---
+# Peticiones simultáneas a Spock como máximo (el pool es el de HA)
+TRANSPORT_MAX_IN_FLIGHT = 8
+TRANSPORT_CONNECT_TIMEOUT_S = 5
+TRANSPORT_READ_TIMEOUT_S = 10
+TRANSPORT_TOTAL_TIMEOUT_S = 20
+
+# --- Límite de peticiones (por token) ---
+# Control (estado): prioritario, poco volumen
+RATE_CONTROL_PER_S = 1
+RATE_CONTROL_BURST = 5
+RATE_CONTROL_MAX_WAIT_S = 10
+# Telemetría: más volumen; lo que no cabe se deja en la cola offline
+RATE_TELEMETRY_PER_S = 10
+RATE_TELEMETRY_BURST = 50
+RATE_TELEMETRY_MAX_WAIT_S = 30
+RATE_MIN_PER_S = 0.1
+# Espera si el servidor responde 429 sin Retry-After
+RATE_DEFAULT_RETRY_AFTER_S = 30
+
+# --- Circuit breaker ---
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_RESET_TIMEOUT_S = 120
+
+# --- Política local con la nube caída ---
+# hold: mantener el último estado
+# safe_off: apagar el grupo
+# surplus: encender el grupo si el excedente local supera el umbral
+FALLBACK_HOLD = "hold"
+FALLBACK_SAFE_OFF = "safe_off"
+FALLBACK_SURPLUS = "surplus"
+FALLBACK_POLICIES = [FALLBACK_HOLD, FALLBACK_SAFE_OFF, FALLBACK_SURPLUS]
+
+# --- Métricas ---
+METRICS_CYCLE_HISTORY = 50
+METRICS_LATENCY_WINDOW = 200
+
+# --- Perfilado ---
+SERVICE_PROFILE = "profile"
+ATTR_CYCLES = "cycles"
+DEFAULT_PROFILE_CYCLES = 3
+MAX_PROFILE_CYCLES = 20
+PROFILE_TOP_N = 15
+
+# --- Grabación de sesiones ---
+SERVICE_RECORD = "record"
+ATTR_DURATION = "duration"
+DEFAULT_RECORD_MINUTES = 60
+MAX_RECORD_MINUTES = 24 * 60
+# Cada cuánto se añaden al fichero los eventos acumulados
+SESSION_FLUSH_INTERVAL_S = 30
 
 # --- Plataformas ---
 PLATFORMS: list[str] = ["sensor", "switch"] 
@@ -18,3 +151,4 @@ PLATFORMS: list[str] = ["sensor", "switch"]
 # --- API ---
 HARDCODED_API_URL = "https://flex.spock.es/api/status"
 HARDCODED_API_URL_TELEMETRIA = "https://iot-ha.spock.es/api/iot_telemetry"
+HARDCODED_API_URL_PUSH = "wss://flex.spock.es/api/ws"
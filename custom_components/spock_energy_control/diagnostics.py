@@ -0,0 +1,71 @@
+"""Diagnóstico descargable de Spock Energy Control."""
+from __future__ import annotations
+
+from dataclasses import asdict
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from . import SpockEnergyCoordinator
+from .const import CONF_API_TOKEN, CONF_PLANT_ID, DOMAIN
+
+TO_REDACT = {CONF_API_TOKEN, CONF_PLANT_ID, "etag"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Volcado de configuración, métricas y últimos ciclos."""
+    coordinator: SpockEnergyCoordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    transport = coordinator.hub.transport
+
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": async_redact_data(dict(entry.options), TO_REDACT),
+        },
+        "status": async_redact_data(coordinator.data or {}, TO_REDACT),
+        "metrics": coordinator.metrics.as_dict(),
+        "transport": {
+            endpoint: {
+                "latency": transport.latency[endpoint].as_dict(),
+                "errors": transport.errors[endpoint],
+                "breaker": transport.breakers[endpoint].state,
+                "breaker_trips": transport.breakers[endpoint].trips,
+                "rate_limit": transport.limiter.buckets[endpoint].as_dict(),
+            }
+            for endpoint in transport.latency
+        },
+        "scheduler": {
+            "interval_s": coordinator.scheduler.interval_s,
+            "errors": coordinator.scheduler.errors,
+        },
+        "telemetry": {
+            "mode": coordinator.telemetry_mode,
+            "power_sensors": len(coordinator.power_index.power_sensors),
+            "queue_depth": len(coordinator.telemetry_queue),
+            "queue_evicted": coordinator.telemetry_queue.evicted,
+            "queue_replayed": coordinator.telemetry_queue.replayed,
+        },
+        "actuation": {
+            "service_calls": coordinator.actuation.service_calls,
+            "failures": coordinator.actuation.total_failures,
+            "calls": {
+                service: asdict(stats)
+                for service, stats in coordinator.actuation.call_stats.items()
+            },
+            "drift_corrections": coordinator.reconciler.drift_corrections,
+            "entities": {
+                entity_id: asdict(stats)
+                for entity_id, stats in coordinator.actuation.stats.items()
+            },
+        },
+        "hub_shared": coordinator.hub.is_shared,
+        "push_connected": (
+            coordinator.push_client.connected if coordinator.push_client else None
+        ),
+        "startup_duration_s": coordinator.startup_duration_s,
+        "first_refresh_duration_s": coordinator.first_refresh_duration_s,
+    }
@@ -0,0 +1,101 @@
+"""Reparto de un presupuesto de potencia entre las cargas controladas."""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+# Peso de cada lectura nueva en el consumo típico aprendido
+LEARN_ALPHA = 0.2
+
+
+@dataclass
+class DispatchPlan:
+    """Resultado de un reparto."""
+
+    target_w: float
+    selected: list[str] = field(default_factory=list)
+    planned_w: float = 0.0
+
+
+class LoadDispatcher:
+    """
+    Elige qué entidades encender para ajustarse a un objetivo de potencia.
+
+    - El consumo de cada entidad es el medido si está encendida; si no,
+      el típico aprendido de lecturas anteriores o `default_draw_w`.
+    - Las candidatas se recorren en orden de prioridad y se encienden
+      mientras quepan en el objetivo (más `tolerance_w`).
+    - Si la selección vigente sigue cabiendo y su error no es peor que el
+      de la nueva en más de `tolerance_w`, se mantiene para no conmutar
+      cargas por pequeñas variaciones.
+    """
+
+    def __init__(self, default_draw_w: float, min_on_w: float, tolerance_w: float) -> None:
+        """Inicializa el repartidor."""
+        self.default_draw_w = default_draw_w
+        self.min_on_w = min_on_w
+        self.tolerance_w = tolerance_w
+        self._typical_w: dict[str, float] = {}
+        self._measured_w: dict[str, float] = {}
+        self.plan: DispatchPlan | None = None
+
+    def observe(self, entity_id: str, power_w: float, is_on: bool) -> None:
+        """Registra una lectura de potencia de una entidad controlada."""
+        if not is_on or power_w < self.min_on_w:
+            self._measured_w.pop(entity_id, None)
+            return
+        self._measured_w[entity_id] = power_w
+        typical = self._typical_w.get(entity_id)
+        self._typical_w[entity_id] = (
+            power_w if typical is None else typical + LEARN_ALPHA * (power_w - typical)
+        )
+
+    def draw(self, entity_id: str) -> float:
+        """Consumo estimado de la entidad al encenderse."""
+        if (measured := self._measured_w.get(entity_id)) is not None:
+            return measured
+        return self._typical_w.get(entity_id, self.default_draw_w)
+
+    def typical_draws(self) -> dict[str, float]:
+        """Consumo típico aprendido por entidad."""
+        return {entity_id: round(draw, 1) for entity_id, draw in self._typical_w.items()}
+
+    def solve(self, candidates: Iterable[str], target_w: float) -> DispatchPlan:
+        """Calcula qué candidatas encender (en orden de prioridad)."""
+        candidates = list(candidates)
+        limit = target_w + self.tolerance_w
+
+        plan = DispatchPlan(target_w)
+        for entity_id in candidates:
+            draw = self.draw(entity_id)
+            if plan.planned_w + draw <= limit:
+                plan.selected.append(entity_id)
+                plan.planned_w += draw
+
+        previous = self.plan
+        if previous is not None and previous.selected:
+            kept = [entity_id for entity_id in candidates if entity_id in previous.selected]
+            kept_w = sum(self.draw(entity_id) for entity_id in kept)
+            if (
+                kept_w <= limit
+                and abs(target_w - kept_w) <= abs(target_w - plan.planned_w) + self.tolerance_w
+            ):
+                plan = DispatchPlan(target_w, kept, kept_w)
+
+        if previous is None or previous.selected != plan.selected:
+            _LOGGER.debug(
+                "Reparto para %.0f W: %s (%.0f W previstos)",
+                target_w,
+                plan.selected,
+                plan.planned_w,
+            )
+        plan.planned_w = round(plan.planned_w, 1)
+        self.plan = plan
+        return plan
+
+    def reset(self) -> None:
+        """Olvida el reparto vigente (p. ej. al parar los grupos)."""
+        self.plan = None
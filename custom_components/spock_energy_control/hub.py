@@ -0,0 +1,170 @@
+"""Hub compartido por las entradas que usan el mismo API token."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import (
+    DOMAIN,
+    BATCH_REJECTED_STATUS,
+    BATCH_UNSUPPORTED_STATUS,
+    HUB_DEDUP_WINDOW_S,
+)
+from .transport import ENDPOINT_STATUS, SpockResponse, SpockTransport
+
+if TYPE_CHECKING:
+    from . import SpockEnergyCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_HUBS = f"{DOMAIN}_hubs"
+
+
+@callback
+def async_get_hub(hass: HomeAssistant, api_token: str) -> SpockHub:
+    """Devuelve el hub del token, creándolo si no existe."""
+    hubs: dict[str, SpockHub] = hass.data.setdefault(DATA_HUBS, {})
+    if (hub := hubs.get(api_token)) is None:
+        hub = hubs[api_token] = SpockHub(hass, api_token)
+    return hub
+
+
+class SpockHub:
+    """
+    Agrupa los coordinadores de un mismo API token.
+
+    Con varias plantas pide el estado de todas en una única petición por
+    lotes y reparte el resultado a cada coordinador; así los ciclos de
+    todas las plantas quedan alineados y no se repiten peticiones. Las
+    entradas con tokens distintos usan hubs distintos.
+    """
+
+    def __init__(self, hass: HomeAssistant, api_token: str) -> None:
+        """Inicializa el hub."""
+        self.hass = hass
+        self.api_token = api_token
+        self.transport = SpockTransport(hass, api_token)
+        self._coordinators: dict[str, SpockEnergyCoordinator] = {}
+        # None = aún no se sabe si el servidor admite lotes
+        self._batch_supported: bool | None = None
+        self._inflight: asyncio.Task[dict[str, SpockResponse] | None] | None = None
+        self._waiting: set[str] = set()
+        self._cache: dict[str, tuple[float, SpockResponse]] = {}
+
+    @property
+    def is_shared(self) -> bool:
+        """Hay más de una planta con este token."""
+        return len(self._coordinators) > 1
+
+    @callback
+    def async_register(self, coordinator: SpockEnergyCoordinator) -> CALLBACK_TYPE:
+        """Añade un coordinador al hub. Devuelve la función para quitarlo."""
+        self._coordinators[coordinator.plant_id] = coordinator
+
+        @callback
+        def _unregister() -> None:
+            if self._coordinators.get(coordinator.plant_id) is coordinator:
+                self._coordinators.pop(coordinator.plant_id)
+            self._cache.pop(coordinator.plant_id, None)
+            if not self._coordinators:
+                self.hass.data.get(DATA_HUBS, {}).pop(self.api_token, None)
+                self.hass.async_create_task(self.transport.async_close())
+
+        return _unregister
+
+    async def async_fetch_status(self, coordinator: SpockEnergyCoordinator) -> SpockResponse:
+        """Obtiene el estado de la planta del coordinador."""
+        if self.is_shared and self._batch_supported is not False:
+            result = await self._async_fetch_batched(coordinator.plant_id)
+            if result is not None:
+                return result
+
+        return await self._async_fetch_single(
+            coordinator.plant_id, coordinator.scheduler.request_headers()
+        )
+
+    async def _async_fetch_single(
+        self, plant_id: str, extra_headers: dict[str, str]
+    ) -> SpockResponse:
+        """Petición de estado de una sola planta."""
+        return await self.transport.async_post(
+            ENDPOINT_STATUS, {"plant_id": plant_id}, extra_headers
+        )
+
+    async def _async_fetch_batched(self, plant_id: str) -> SpockResponse | None:
+        """
+        Estado de una planta a partir de una petición por lotes, compartida
+        con las demás plantas que lo pidan a la vez o muy poco después.
+        """
+        cached = self._cache.get(plant_id)
+        if cached is not None and time.monotonic() - cached[0] < HUB_DEDUP_WINDOW_S:
+            _LOGGER.debug("Estado de la planta %s servido desde el hub", plant_id)
+            return cached[1]
+
+        self._waiting.add(plant_id)
+        if self._inflight is None or self._inflight.done():
+            self._inflight = self.hass.async_create_task(self._async_batch())
+
+        results = await asyncio.shield(self._inflight)
+        if results is None:
+            return None
+        return results.get(
+            plant_id, SpockResponse(502, text="Planta ausente en la respuesta")
+        )
+
+    async def _async_batch(self) -> dict[str, SpockResponse] | None:
+        """Pide el estado de todas las plantas y lo reparte."""
+        plant_ids = list(self._coordinators)
+        _LOGGER.debug("Pidiendo estado por lotes para %s plantas", len(plant_ids))
+
+        try:
+            batch = await self.transport.async_post(
+                ENDPOINT_STATUS, {"plant_ids": plant_ids}
+            )
+        finally:
+            waiting, self._waiting = self._waiting, set()
+
+        # El lote de estado solo lleva identificadores de planta: si el
+        # servidor lo rechaza es que no entiende el formato
+        if batch.status in BATCH_UNSUPPORTED_STATUS or batch.status in BATCH_REJECTED_STATUS:
+            self._batch_supported = False
+            _LOGGER.info(
+                "El servidor no admite estado por lotes (HTTP %s). "
+                "Cada planta se consultará por separado.",
+                batch.status,
+            )
+            return None
+
+        if batch.status != 200:
+            return {plant_id: batch for plant_id in plant_ids}
+
+        plants = batch.body.get("plants") if isinstance(batch.body, dict) else None
+        if not isinstance(plants, dict):
+            self._batch_supported = False
+            _LOGGER.info("Respuesta sin 'plants'; se consultará cada planta por separado.")
+            return None
+
+        self._batch_supported = True
+        # El ETag del lote no vale para las peticiones condicionales de cada planta
+        plant_headers = batch.headers.copy()
+        plant_headers.popall("ETag", None)
+
+        now = time.monotonic()
+        results: dict[str, SpockResponse] = {}
+        for plant_id in plant_ids:
+            if plant_id not in plants:
+                continue
+            results[plant_id] = SpockResponse(200, plant_headers, plants[plant_id])
+            self._cache[plant_id] = (now, results[plant_id])
+
+        # Repartir a las plantas que no estaban esperando esta respuesta
+        for plant_id, result in results.items():
+            coordinator = self._coordinators.get(plant_id)
+            if coordinator is not None and plant_id not in waiting:
+                self.hass.async_create_task(coordinator.async_handle_hub_status(result))
+
+        return results
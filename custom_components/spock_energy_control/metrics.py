@@ -0,0 +1,90 @@
+"""Métricas de rendimiento del coordinador de Spock Energy Control."""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any
+
+from homeassistant.util import dt as dt_util
+
+CYCLE_OK = "ok"
+CYCLE_FALLBACK = "fallback"
+CYCLE_ERROR = "error"
+
+
+@dataclass
+class CycleRecord:
+    """Tiempos de un ciclo de actualización."""
+
+    started_at: str
+    duration_s: float
+    status_rtt_s: float | None
+    result: str
+    error: str | None = None
+
+
+class CoordinatorMetrics:
+    """
+    Contadores y tiempos del coordinador.
+
+    Los últimos ciclos se guardan en un buffer circular de tamaño fijo
+    para el volcado de diagnóstico; el resto son contadores acumulados
+    desde el arranque.
+    """
+
+    def __init__(self, history_size: int) -> None:
+        """Inicializa las métricas vacías."""
+        self.cycles: deque[CycleRecord] = deque(maxlen=history_size)
+        self.last_cycle_s: float | None = None
+        self.telemetry_sent = 0
+        self.telemetry_failed = 0
+        self.last_status_success: datetime | None = None
+
+    def record_cycle(
+        self,
+        started_at: datetime,
+        duration_s: float,
+        status_rtt_s: float | None,
+        result: str,
+        error: str | None = None,
+    ) -> None:
+        """Añade un ciclo al buffer."""
+        self.last_cycle_s = round(duration_s, 3)
+        self.cycles.append(
+            CycleRecord(
+                started_at.isoformat(),
+                self.last_cycle_s,
+                None if status_rtt_s is None else round(status_rtt_s, 3),
+                result,
+                error,
+            )
+        )
+
+    def record_status_success(self) -> None:
+        """Marca la recepción de un estado correcto de la API."""
+        self.last_status_success = dt_util.utcnow()
+
+    def record_telemetry(self, results: list[bool]) -> None:
+        """Cuenta los resultados (uno por registro) de una subida de telemetría."""
+        sent = sum(results)
+        self.telemetry_sent += sent
+        self.telemetry_failed += len(results) - sent
+
+    def seconds_since_status(self) -> float | None:
+        """Segundos desde el último estado correcto de la API."""
+        if self.last_status_success is None:
+            return None
+        return round((dt_util.utcnow() - self.last_status_success).total_seconds(), 1)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Representación serializable."""
+        return {
+            "last_cycle_s": self.last_cycle_s,
+            "telemetry_sent": self.telemetry_sent,
+            "telemetry_failed": self.telemetry_failed,
+            "last_status_success": (
+                self.last_status_success.isoformat() if self.last_status_success else None
+            ),
+            "cycles": [asdict(cycle) for cycle in self.cycles],
+        }
@@ -0,0 +1,182 @@
+"""Modelos de la respuesta de estado y de los registros de telemetría."""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from homeassistant.helpers.json import json_bytes
+from homeassistant.util import dt as dt_util
+
+from .const import STATUS_POWER_TARGET
+from .telemetry import AGGREGATE_FIELDS
+
+GROUPS = ("green", "yellow")
+GROUP_STATES = ("start", "stop")
+
+# [timestamp_epoch, sensor_id, desc_device, power, agregados]
+# con los agregados como lista en el orden de AGGREGATE_FIELDS, o None.
+CompactRecord = list[Any]
+
+
+class StatusFormatError(ValueError):
+    """La respuesta de estado no tiene el formato esperado."""
+
+
+def _is_number(value: Any) -> bool:
+    """Número JSON (los booleanos no cuentan)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class SpockStatus:
+    """
+    Respuesta de estado validada.
+
+    Solo se conservan los campos conocidos; los estados de cada grupo
+    deben ser 'start' o 'stop'. La planificación (`schedule`) se guarda
+    tal cual: la valida SgReadySchedule.
+    """
+
+    __slots__ = ("green", "yellow", "version", "next_change_at", "power_target_w", "schedule")
+
+    def __init__(
+        self,
+        green: str,
+        yellow: str,
+        version: str | int | None = None,
+        next_change_at: str | None = None,
+        power_target_w: float | None = None,
+        schedule: list[Any] | None = None,
+    ) -> None:
+        """Inicializa el estado."""
+        self.green = green
+        self.yellow = yellow
+        self.version = version
+        self.next_change_at = next_change_at
+        self.power_target_w = power_target_w
+        self.schedule = schedule
+
+    @classmethod
+    def from_payload(cls, data: Any) -> SpockStatus:
+        """Valida el cuerpo de la respuesta. Eleva StatusFormatError si no es válido."""
+        if not isinstance(data, dict):
+            raise StatusFormatError(f"Formato de respuesta inesperado: {data}")
+
+        for group in GROUPS:
+            if group not in data:
+                raise StatusFormatError(f"Falta el grupo '{group}' en la respuesta: {data}")
+            if data[group] not in GROUP_STATES:
+                raise StatusFormatError(f"Estado desconocido para {group}: {data[group]!r}")
+
+        version = data.get("version")
+        if version is not None and not isinstance(version, (str, int)):
+            raise StatusFormatError(f"Versión no válida: {version!r}")
+
+        next_change_at = data.get("next_change_at")
+        if next_change_at is not None and (
+            not isinstance(next_change_at, str) or dt_util.parse_datetime(next_change_at) is None
+        ):
+            raise StatusFormatError(f"next_change_at no válido: {next_change_at!r}")
+
+        power_target = data.get(STATUS_POWER_TARGET)
+        if power_target is not None and not _is_number(power_target):
+            raise StatusFormatError(f"{STATUS_POWER_TARGET} no válido: {power_target!r}")
+
+        schedule = data.get("schedule")
+        if schedule is not None and not isinstance(schedule, list):
+            raise StatusFormatError(f"Planificación no válida: {schedule!r}")
+
+        return cls(
+            data["green"],
+            data["yellow"],
+            version,
+            next_change_at,
+            None if power_target is None else float(power_target),
+            schedule,
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Datos del coordinador: los grupos y los campos presentes."""
+        data: dict[str, Any] = {"green": self.green, "yellow": self.yellow}
+        if self.version is not None:
+            data["version"] = self.version
+        if self.next_change_at is not None:
+            data["next_change_at"] = self.next_change_at
+        if self.power_target_w is not None:
+            data[STATUS_POWER_TARGET] = self.power_target_w
+        if self.schedule is not None:
+            data["schedule"] = self.schedule
+        return data
+
+
+class TelemetryRecord:
+    """Lectura de un sensor de potencia pendiente de enviar."""
+
+    __slots__ = ("sensor_id", "desc_device", "power", "timestamp", "aggregates")
+
+    def __init__(
+        self,
+        sensor_id: str,
+        desc_device: str,
+        power: float,
+        timestamp: datetime,
+        aggregates: dict[str, Any] | None = None,
+    ) -> None:
+        """Inicializa el registro."""
+        self.sensor_id = sensor_id
+        self.desc_device = desc_device
+        self.power = power
+        self.timestamp = timestamp
+        self.aggregates = aggregates
+
+    def __repr__(self) -> str:
+        """Representación para los logs."""
+        return f"TelemetryRecord({self.sensor_id}, {self.power}, {self.timestamp.isoformat()})"
+
+    def as_payload(
+        self, plant_id: str | None = None, with_timestamp: bool = True
+    ) -> dict[str, Any]:
+        """
+        Campos del registro en la API. Por sensor se envían con `plant_id`
+        y sin marca de tiempo; en los lotes, al revés.
+        """
+        payload: dict[str, Any] = {}
+        if plant_id is not None:
+            payload["plant_id"] = plant_id
+        payload["desc_device"] = self.desc_device
+        payload["sensor_id"] = self.sensor_id
+        payload["power"] = self.power
+        if with_timestamp:
+            payload["timestamp"] = self.timestamp
+        if self.aggregates:
+            payload.update(self.aggregates)
+        return payload
+
+    def to_compact(self) -> CompactRecord:
+        """Formato compacto para la cola persistente."""
+        return [
+            round(self.timestamp.timestamp(), 3),
+            self.sensor_id,
+            self.desc_device,
+            self.power,
+            [self.aggregates[field] for field in AGGREGATE_FIELDS] if self.aggregates else None,
+        ]
+
+    @classmethod
+    def from_compact(cls, compact: CompactRecord) -> TelemetryRecord:
+        """Registro a partir del formato compacto (los antiguos no tienen agregados)."""
+        timestamp, sensor_id, desc_device, power, *rest = compact
+        aggregates = dict(zip(AGGREGATE_FIELDS, rest[0])) if rest and rest[0] else None
+        return cls(
+            sensor_id,
+            desc_device,
+            float(power),
+            dt_util.utc_from_timestamp(timestamp),
+            aggregates,
+        )
+
+
+def encode_telemetry_batch(plant_id: str, records: list[TelemetryRecord]) -> bytes:
+    """Cuerpo JSON de un envío por lotes."""
+    return json_bytes(
+        {"plant_id": plant_id, "records": [record.as_payload() for record in records]}
+    )
@@ -0,0 +1,135 @@
+"""Cola persistente de telemetría para Spock Energy Control."""
+from __future__ import annotations
+
+from collections import deque
+from itertools import islice
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .models import CompactRecord, TelemetryRecord
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY_S = 10
+THROUGHPUT_WINDOW_S = 60
+
+
+class TelemetryQueue:
+    """
+    Cola de telemetría pendiente guardada en .storage.
+
+    Tiene un tamaño máximo; al llenarse se descartan primero los registros
+    más antiguos. Los registros se extraen en orden de llegada. En disco se
+    guardan en el formato compacto de TelemetryRecord.to_compact; los de
+    versiones anteriores no tienen agregados.
+
+    Cada registro tiene un número de secuencia implícito: `_head` es el del
+    más antiguo y avanza cada vez que sale uno por la izquierda. Así `ack`
+    sabe qué registros de un `peek` anterior siguen en la cola aunque
+    entretanto se hayan descartado otros.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, max_records: int) -> None:
+        """Inicializa la cola."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.telemetry_queue"
+        )
+        self._records: deque[CompactRecord] = deque(maxlen=max_records)
+        self._head: int = 0
+        self.evicted: int = 0
+        self.replayed: int = 0
+        self._replay_log: deque[tuple[float, int]] = deque()
+
+    def __len__(self) -> int:
+        """Número de registros pendientes."""
+        return len(self._records)
+
+    async def async_load(self) -> None:
+        """Carga la cola guardada en disco."""
+        data = await self._store.async_load()
+        if not data:
+            return
+        self._records.extend(data.get("records", []))
+        _LOGGER.debug("Cola de telemetría cargada: %s registros pendientes", len(self._records))
+
+    async def async_save(self) -> None:
+        """Guarda la cola en disco de inmediato."""
+        await self._store.async_save(self._data_to_save())
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Datos a persistir."""
+        return {"records": list(self._records)}
+
+    def resize(self, max_records: int) -> None:
+        """Cambia el tamaño máximo; si sobra se descartan los más antiguos."""
+        if max_records == self._records.maxlen:
+            return
+        overflow = max(0, len(self._records) - max_records)
+        self.evicted += overflow
+        self._head += overflow
+        self._records = deque(self._records, maxlen=max_records)
+        if overflow:
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY_S)
+
+    def push(self, records: list[TelemetryRecord]) -> None:
+        """Añade registros de telemetría a la cola."""
+        if not records:
+            return
+
+        maxlen = self._records.maxlen or 0
+        overflow = len(self._records) + len(records) - maxlen
+        if overflow > 0:
+            self.evicted += overflow
+            self._head += overflow
+            _LOGGER.warning(
+                "Cola de telemetría llena: se descartan %s registros antiguos", overflow
+            )
+
+        self._records.extend(record.to_compact() for record in records)
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY_S)
+
+    def peek(self, count: int) -> tuple[int, list[TelemetryRecord]]:
+        """
+        Devuelve los `count` registros más antiguos sin extraerlos, junto
+        con el número de secuencia del primero para pasarlo a `ack`.
+        """
+        return self._head, [
+            TelemetryRecord.from_compact(compact)
+            for compact in islice(self._records, count)
+        ]
+
+    def ack(self, first: int, delivered: list[bool]) -> None:
+        """
+        Confirma el reenvío de un lote obtenido con `peek`: `first` es su
+        número de secuencia y `delivered` indica, en orden, si se envió cada
+        registro. Los enviados se extraen y los demás se quedan al frente
+        de la cola sin cambiar su orden. Los que se descartaron mientras el
+        lote estaba en vuelo ya se contaron en `evicted` y se ignoran.
+        """
+        delivered = delivered[max(0, self._head - first) :][: len(self._records)]
+        sent = [self._records.popleft() for _ in delivered]
+        # Se vuelven a meter como mucho tantos como se acaban de sacar:
+        # extendleft nunca llega a descartar nada por la derecha
+        failed = [compact for compact, ok in zip(sent, delivered) if not ok]
+        self._records.extendleft(reversed(failed))
+        self._head += len(sent) - len(failed)
+        count = sum(delivered)
+
+        now = time.monotonic()
+        self.replayed += count
+        self._replay_log.append((now, count))
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY_S)
+
+    @property
+    def replay_throughput(self) -> float:
+        """Registros reenviados por minuto en la última ventana."""
+        cutoff = time.monotonic() - THROUGHPUT_WINDOW_S
+        while self._replay_log and self._replay_log[0][0] < cutoff:
+            self._replay_log.popleft()
+        return float(sum(count for _, count in self._replay_log))
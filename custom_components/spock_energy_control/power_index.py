@@ -0,0 +1,246 @@
+"""Índice de sensores de potencia para Spock Energy Control."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import logging
+
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+
+_LOGGER = logging.getLogger(__name__)
+
+UNKNOWN_DEVICE = "Dispositivo Desconocido"
+
+
+def _is_power_sensor(entity: er.RegistryEntry) -> bool:
+    """Busca por 'device_class: power' O por entity_id que termine en '_power'."""
+    if entity.domain != "sensor":
+        return False
+    return entity.device_class == "power" or entity.entity_id.endswith("_power")
+
+
+class PowerSensorIndex:
+    """
+    Índice entidad controlada -> dispositivo -> sensores de potencia,
+    con la descripción de cada dispositivo ya resuelta.
+
+    Se construye una vez y se actualiza de forma incremental con los
+    eventos de los registros de entidades y dispositivos, de modo que el
+    ciclo de telemetría no toca los registros.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entity_registry: er.EntityRegistry,
+        device_registry: dr.DeviceRegistry,
+    ) -> None:
+        """Inicializa el índice."""
+        self.hass = hass
+        self._entity_registry = entity_registry
+        self._device_registry = device_registry
+
+        self._controlled: list[str] = []
+        # entidad controlada -> device_id
+        self._controlled_device: dict[str, str | None] = {}
+        # device_id -> sensores de potencia del dispositivo
+        self._device_sensors: dict[str, set[str]] = {}
+        # sensor -> device_id / descripción del dispositivo
+        self._sensor_device: dict[str, str] = {}
+        self._sensor_desc: dict[str, str] = {}
+
+        self._power_sensors: set[str] = set()
+        self._listeners: list[Callable[[], None]] = []
+        self._unsubs: list[CALLBACK_TYPE] = []
+
+    @property
+    def power_sensors(self) -> set[str]:
+        """Sensores de potencia de los dispositivos controlados."""
+        return self._power_sensors
+
+    def describe(self, sensor_id: str) -> str:
+        """Nombre del dispositivo al que pertenece el sensor."""
+        return self._sensor_desc.get(sensor_id, UNKNOWN_DEVICE)
+
+    def controlled_for_sensor(self, sensor_id: str) -> list[str]:
+        """Entidades controladas del dispositivo al que pertenece el sensor."""
+        device_id = self._sensor_device.get(sensor_id)
+        if device_id is None:
+            return []
+        return [
+            entity_id
+            for entity_id, entity_device in self._controlled_device.items()
+            if entity_device == device_id
+        ]
+
+    @callback
+    def async_add_listener(self, update_callback: Callable[[], None]) -> CALLBACK_TYPE:
+        """Registra un callback que se llama cuando cambia el conjunto de sensores."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def _remove() -> None:
+            self._listeners.remove(update_callback)
+
+        return _remove
+
+    @callback
+    def async_start(self) -> None:
+        """Se suscribe a los eventos de los registros."""
+        if self._unsubs:
+            return
+        self._unsubs = [
+            self.hass.bus.async_listen(
+                er.EVENT_ENTITY_REGISTRY_UPDATED, self._async_entity_registry_updated
+            ),
+            self.hass.bus.async_listen(
+                dr.EVENT_DEVICE_REGISTRY_UPDATED, self._async_device_registry_updated
+            ),
+        ]
+
+    @callback
+    def async_stop(self) -> None:
+        """Cancela las suscripciones."""
+        while self._unsubs:
+            self._unsubs.pop()()
+
+    @callback
+    def async_set_controlled(self, entity_ids: list[str]) -> None:
+        """(Re)construye el índice para las entidades controladas."""
+        self._controlled = list(entity_ids)
+        self._controlled_device.clear()
+        self._device_sensors.clear()
+        self._sensor_device.clear()
+        self._sensor_desc.clear()
+
+        if not self._controlled:
+            _LOGGER.debug("No hay dispositivos Green/Yellow configurados, no se buscan sensores.")
+
+        for entity_id in self._controlled:
+            self._index_controlled(entity_id)
+
+        self._async_publish()
+
+    def _index_controlled(self, entity_id: str) -> None:
+        """Resuelve el dispositivo de una entidad controlada."""
+        entry = self._entity_registry.async_get(entity_id)
+        device_id = entry.device_id if entry else None
+        self._controlled_device[entity_id] = device_id
+
+        if not device_id:
+            _LOGGER.debug("Entidad '%s' no tiene device_id, omitiendo.", entity_id)
+            return
+
+        if device_id not in self._device_sensors:
+            _LOGGER.debug("Inspeccionando dispositivo '%s' (de la entidad '%s')", device_id, entity_id)
+            self._index_device(device_id)
+
+    def _index_device(self, device_id: str) -> None:
+        """Busca los sensores de potencia de un dispositivo."""
+        for sensor_id in self._device_sensors.pop(device_id, set()):
+            self._sensor_device.pop(sensor_id, None)
+            self._sensor_desc.pop(sensor_id, None)
+
+        desc_device = self._device_description(device_id)
+        sensors: set[str] = set()
+
+        for device_entity in er.async_entries_for_device(self._entity_registry, device_id):
+            if not _is_power_sensor(device_entity):
+                continue
+            if device_entity.entity_id not in self._power_sensors:
+                _LOGGER.info(
+                    "¡Sensor de potencia encontrado! (Dispositivo: '%s', Entidad: %s, Clase: %s)",
+                    device_id,
+                    device_entity.entity_id,
+                    device_entity.device_class
+                )
+            sensors.add(device_entity.entity_id)
+            self._sensor_device[device_entity.entity_id] = device_id
+            self._sensor_desc[device_entity.entity_id] = desc_device
+
+        self._device_sensors[device_id] = sensors
+
+    def _device_description(self, device_id: str) -> str:
+        """Nombre visible del dispositivo."""
+        device_entry = self._device_registry.async_get(device_id)
+        if not device_entry:
+            return UNKNOWN_DEVICE
+        return device_entry.name_by_user or device_entry.name or UNKNOWN_DEVICE
+
+    def _tracked_devices(self) -> set[str]:
+        """Dispositivos de las entidades controladas."""
+        return {device_id for device_id in self._controlled_device.values() if device_id}
+
+    @callback
+    def _async_publish(self) -> None:
+        """Recalcula el conjunto de sensores y avisa si ha cambiado."""
+        power_sensors = set(self._sensor_device)
+        if power_sensors == self._power_sensors:
+            return
+
+        self._power_sensors = power_sensors
+        if not power_sensors and self._controlled:
+            _LOGGER.debug(
+                "No se encontraron sensores de potencia para los dispositivos: %s",
+                self._tracked_devices(),
+            )
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @callback
+    def _async_entity_registry_updated(self, event: Event) -> None:
+        """Actualiza el índice al crear, borrar o renombrar entidades."""
+        entity_id: str = event.data["entity_id"]
+        old_entity_id: str | None = event.data.get("old_entity_id")
+
+        # Cambia una entidad controlada (p. ej. se asigna a otro dispositivo)
+        if entity_id in self._controlled_device or old_entity_id in self._controlled_device:
+            controlled = entity_id if entity_id in self._controlled_device else old_entity_id
+            self._index_controlled(controlled)
+            # Los dispositivos que ya no controla ninguna entidad se olvidan
+            for device_id in set(self._device_sensors) - self._tracked_devices():
+                self._device_sensors.pop(device_id)
+                for sensor_id in [s for s, d in self._sensor_device.items() if d == device_id]:
+                    self._sensor_device.pop(sensor_id, None)
+                    self._sensor_desc.pop(sensor_id, None)
+            self._async_publish()
+            return
+
+        # Afecta a un dispositivo seguido: antes o después del cambio
+        affected: set[str] = set()
+        for candidate in (entity_id, old_entity_id):
+            if candidate and candidate in self._sensor_device:
+                affected.add(self._sensor_device[candidate])
+
+        entry = self._entity_registry.async_get(entity_id)
+        if entry and entry.device_id in self._device_sensors:
+            affected.add(entry.device_id)
+
+        if not affected:
+            return
+
+        for device_id in affected:
+            self._index_device(device_id)
+        self._async_publish()
+
+    @callback
+    def _async_device_registry_updated(self, event: Event) -> None:
+        """Actualiza las descripciones al renombrar o borrar dispositivos."""
+        device_id: str = event.data["device_id"]
+        if device_id not in self._device_sensors:
+            return
+
+        if event.data.get("action") == "remove":
+            for controlled, controlled_device in self._controlled_device.items():
+                if controlled_device == device_id:
+                    self._controlled_device[controlled] = None
+            for sensor_id in self._device_sensors.pop(device_id):
+                self._sensor_device.pop(sensor_id, None)
+                self._sensor_desc.pop(sensor_id, None)
+            self._async_publish()
+            return
+
+        desc_device = self._device_description(device_id)
+        for sensor_id in self._device_sensors[device_id]:
+            self._sensor_desc[sensor_id] = desc_device
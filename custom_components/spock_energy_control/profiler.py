@@ -0,0 +1,135 @@
+"""Perfilado bajo demanda de los ciclos del coordinador."""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+
+from homeassistant.components import persistent_notification
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, PROFILE_TOP_N
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_PROFILER = f"{DOMAIN}_profiler"
+
+
+@callback
+def async_get_profiler(hass: HomeAssistant) -> CycleProfiler:
+    """Devuelve el perfilador compartido, creándolo si no existe."""
+    if (profiler := hass.data.get(DATA_PROFILER)) is None:
+        profiler = hass.data[DATA_PROFILER] = CycleProfiler(hass)
+    return profiler
+
+
+class CycleProfiler:
+    """
+    Perfila con cProfile los próximos N ciclos de los coordinadores.
+
+    El perfil se activa al empezar el primer ciclo y se detiene cuando el
+    último ha terminado junto con su telemetría y su actuación, así que
+    incluye todo lo que corre en el event loop durante ese intervalo.
+    Mientras no está armado los coordinadores solo leen `active`.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Inicializa el perfilador desarmado."""
+        self.hass = hass
+        self.active = False
+        self._cycles = 0
+        self._remaining = 0
+        self._profile: cProfile.Profile | None = None
+        self.last_report: str | None = None
+
+    @callback
+    def async_arm(self, cycles: int) -> bool:
+        """Perfila los próximos `cycles` ciclos. False si ya hay uno en curso."""
+        if self.active or self._profile is not None:
+            return False
+        self._cycles = self._remaining = cycles
+        self.active = True
+        _LOGGER.info("Perfilando los próximos %s ciclos de Spock Energy Control", cycles)
+        return True
+
+    @callback
+    def async_cancel(self) -> None:
+        """Detiene el perfilado en curso sin generar informe."""
+        self.active = False
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile = None
+
+    @callback
+    def async_cycle_started(self) -> None:
+        """Arranca el perfil al empezar el primer ciclo."""
+        if self._profile is not None:
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as err:
+            # Otro perfilador (p. ej. la integración profiler) ya está activo
+            _LOGGER.error("No se pudo iniciar el perfilado: %s", err)
+            self.active = False
+            return
+        self._profile = profile
+
+    @callback
+    def async_cycle_finished(self, pending: list[asyncio.Task]) -> None:
+        """Cuenta un ciclo; tras el último espera a `pending` y genera el informe."""
+        if self._profile is None:
+            return
+        self._remaining -= 1
+        if self._remaining > 0:
+            return
+        self.active = False
+        self.hass.async_create_background_task(
+            self._async_finish(pending), f"{DOMAIN}_profile_report"
+        )
+
+    async def _async_finish(self, pending: list[asyncio.Task]) -> None:
+        """Detiene el perfil y escribe el informe."""
+        await asyncio.gather(*pending, return_exceptions=True)
+        profile, self._profile = self._profile, None
+        if profile is None:
+            return
+        profile.disable()
+
+        path, summary = await self.hass.async_add_executor_job(self._write_report, profile)
+        self.last_report = path
+        _LOGGER.info("Perfil de %s ciclos guardado en %s\n%s", self._cycles, path, summary)
+        persistent_notification.async_create(
+            self.hass,
+            f"Perfil de {self._cycles} ciclos guardado en `{path}`.\n\n```\n{summary}\n```",
+            title="Spock Energy Control: perfil",
+            notification_id=f"{DOMAIN}_profile",
+        )
+
+    def _write_report(self, profile: cProfile.Profile) -> tuple[str, str]:
+        """Guarda el perfil (.prof) y el informe de texto. Devuelve ruta y resumen."""
+        stamp = dt_util.now().strftime("%Y%m%d_%H%M%S")
+        base = self.hass.config.path(f"{DOMAIN}_profile_{stamp}")
+        profile.dump_stats(f"{base}.prof")
+
+        report = io.StringIO()
+        stats = pstats.Stats(profile, stream=report)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(100)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(100)
+        with open(f"{base}.txt", "w", encoding="utf-8") as report_file:
+            report_file.write(report.getvalue())
+
+        # Resumen: funciones con más tiempo propio
+        rows = sorted(
+            stats.stats.items(),  # type: ignore[attr-defined]
+            key=lambda item: item[1][2],
+            reverse=True,
+        )[:PROFILE_TOP_N]
+        summary = "\n".join(
+            f"{tottime:8.3f}s {cumtime:8.3f}s {calls:>8} {func[0].rsplit('/', 1)[-1]}:{func[1]}({func[2]})"
+            for func, (_cc, calls, tottime, cumtime, _callers) in rows
+        )
+        return f"{base}.txt", f"  tottime  cumtime    calls función\n{summary}"
@@ -0,0 +1,135 @@
+"""Canal push (WebSocket) para las órdenes SGReady de Spock."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import logging
+import random
+from typing import Any
+
+from aiohttp import ClientSession, WSMsgType
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util.json import json_loads
+
+from .const import DOMAIN
+from .models import SpockStatus, StatusFormatError
+
+_LOGGER = logging.getLogger(__name__)
+
+PUSH_HEARTBEAT_S = 30
+PUSH_BACKOFF_BASE_S = 2
+PUSH_BACKOFF_MAX_S = 300
+
+
+class SpockPushClient:
+    """
+    Mantiene una conexión WebSocket de larga duración con la API y
+    entrega cada orden recibida en cuanto llega.
+
+    Si la conexión se cae se reintenta con backoff exponencial y jitter;
+    mientras tanto el coordinador sigue con el sondeo normal.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        session: ClientSession,
+        url: str,
+        api_token: str,
+        plant_id: str,
+        on_status: Callable[[dict[str, Any]], Awaitable[None]],
+        on_connection_change: Callable[[bool], None],
+    ) -> None:
+        """Inicializa el cliente. `url` permite apuntar a un servidor local."""
+        self._hass = hass
+        self._session = session
+        self._url = url
+        self._api_token = api_token
+        self._plant_id = plant_id
+        self._on_status = on_status
+        self._on_connection_change = on_connection_change
+        self._task: asyncio.Task | None = None
+        self.connected = False
+        self.reconnects = 0
+
+    def start(self) -> None:
+        """Arranca el bucle de conexión."""
+        if self._task is None or self._task.done():
+            self._task = self._hass.async_create_background_task(
+                self._async_run(), f"{DOMAIN}_push_{self._plant_id}"
+            )
+
+    async def async_stop(self) -> None:
+        """Cierra la conexión y detiene el bucle."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        # Sin notificar: el coordinador se está descargando
+        self.connected = False
+
+    def _set_connected(self, connected: bool) -> None:
+        """Notifica los cambios de estado de la conexión."""
+        if connected == self.connected:
+            return
+        self.connected = connected
+        self._on_connection_change(connected)
+
+    async def _async_run(self) -> None:
+        """Conecta y reconecta indefinidamente."""
+        attempt = 0
+        while True:
+            try:
+                await self._async_listen()
+                attempt = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                _LOGGER.debug("Canal push desconectado: %s", err)
+
+            self._set_connected(False)
+            self.reconnects += 1
+            delay = min(PUSH_BACKOFF_MAX_S, PUSH_BACKOFF_BASE_S * 2**attempt)
+            delay += random.uniform(0, delay / 2)
+            attempt += 1
+            _LOGGER.debug("Reconectando el canal push en %.1f s", delay)
+            await asyncio.sleep(delay)
+
+    async def _async_listen(self) -> None:
+        """Abre el WebSocket y procesa las órdenes hasta que se cierre."""
+        headers = {"X-Auth-Token": self._api_token}
+        async with self._session.ws_connect(
+            self._url, headers=headers, heartbeat=PUSH_HEARTBEAT_S
+        ) as ws:
+            await ws.send_json({"plant_id": self._plant_id})
+            self._set_connected(True)
+            _LOGGER.info("Canal push conectado a %s", self._url)
+
+            async for msg in ws:
+                if msg.type == WSMsgType.TEXT:
+                    await self._async_handle_message(msg.data)
+                elif msg.type in (WSMsgType.CLOSE, WSMsgType.CLOSED, WSMsgType.ERROR):
+                    break
+
+    async def _async_handle_message(self, raw: str) -> None:
+        """Entrega al coordinador las órdenes con formato válido."""
+        try:
+            data = json_loads(raw)
+        except ValueError:
+            _LOGGER.warning("Mensaje push no válido: %s", raw)
+            return
+
+        try:
+            data = SpockStatus.from_payload(data).as_dict()
+        except StatusFormatError as err:
+            _LOGGER.debug("Mensaje push ignorado: %s", err)
+            return
+
+        try:
+            await self._on_status(data)
+        except Exception:
+            _LOGGER.exception("Error al aplicar la orden recibida por push")
@@ -0,0 +1,135 @@
+"""Limitador de peticiones a la API de Spock."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+# Cada respuesta correcta recupera esta fracción del ritmo máximo
+RECOVERY_STEP = 0.1
+# Espera de la telemetría mientras hay peticiones de control pendientes
+PRIORITY_YIELD_S = 0.05
+
+
+class TokenBucket:
+    """
+    Token bucket con ritmo adaptativo.
+
+    Un 429 (o Retry-After) bloquea el bucket durante el tiempo indicado y
+    reduce el ritmo a la mitad; cada respuesta correcta lo recupera poco a
+    poco hasta el máximo configurado.
+    """
+
+    def __init__(self, rate_per_s: float, capacity: float, min_rate_per_s: float) -> None:
+        """Inicializa el bucket lleno."""
+        self.max_rate = self.rate = rate_per_s
+        self.min_rate = min_rate_per_s
+        self.capacity = capacity
+        self.tokens = capacity
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self.deferred = 0
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        """Añade los tokens acumulados desde la última consulta."""
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self._updated = now
+
+    def delay(self, now: float) -> float:
+        """Segundos hasta que haya un token disponible."""
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self, now: float) -> None:
+        """Consume un token."""
+        self._refill(now)
+        self.tokens -= 1
+
+    def throttle(self, retry_after_s: float, now: float) -> None:
+        """El servidor ha pedido esperar."""
+        self.throttled += 1
+        self.blocked_until = max(self.blocked_until, now + retry_after_s)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0.0
+        self._updated = now
+
+    def as_dict(self) -> dict[str, Any]:
+        """Representación serializable."""
+        return {
+            "rate_per_s": round(self.rate, 3),
+            "max_rate_per_s": self.max_rate,
+            "tokens": round(self.tokens, 2),
+            "blocked_s": round(max(0.0, self.blocked_until - time.monotonic()), 1),
+            "throttled": self.throttled,
+            "deferred": self.deferred,
+        }
+
+    def recover(self) -> None:
+        """Respuesta correcta: se recupera parte del ritmo."""
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_STEP)
+
+
+class SpockRateLimiter:
+    """
+    Presupuestos separados por endpoint para todas las peticiones de un
+    token. Las peticiones del endpoint prioritario (control) nunca esperan
+    por la telemetría; la telemetría cede mientras haya control pendiente,
+    y un 429 en control frena también la telemetría.
+    """
+
+    def __init__(self, buckets: dict[str, TokenBucket], priority: str) -> None:
+        """Inicializa el limitador."""
+        self.buckets = buckets
+        self.priority = priority
+        self._priority_waiting = 0
+
+    async def async_acquire(self, endpoint: str, max_wait_s: float) -> bool:
+        """
+        Espera un token del endpoint. Devuelve False, sin consumirlo, si
+        habría que esperar más de `max_wait_s` segundos.
+        """
+        bucket = self.buckets[endpoint]
+        is_priority = endpoint == self.priority
+        deadline = time.monotonic() + max_wait_s
+        if is_priority:
+            self._priority_waiting += 1
+        try:
+            while True:
+                now = time.monotonic()
+                wait = bucket.delay(now)
+                if not is_priority and self._priority_waiting:
+                    wait = max(wait, PRIORITY_YIELD_S)
+                if wait <= 0:
+                    bucket.take(now)
+                    return True
+                if now + wait > deadline:
+                    bucket.deferred += 1
+                    return False
+                await asyncio.sleep(wait)
+        finally:
+            if is_priority:
+                self._priority_waiting -= 1
+
+    def record_throttled(self, endpoint: str, retry_after_s: float) -> None:
+        """Aplica un 429 / Retry-After recibido en un endpoint."""
+        now = time.monotonic()
+        targets = self.buckets if endpoint == self.priority else {endpoint: self.buckets[endpoint]}
+        for name, bucket in targets.items():
+            bucket.throttle(retry_after_s, now)
+            _LOGGER.debug(
+                "Limitando %s durante %.0f s (ritmo %.2f/s)", name, retry_after_s, bucket.rate
+            )
+
+    def record_success(self, endpoint: str) -> None:
+        """Respuesta correcta de un endpoint."""
+        self.buckets[endpoint].recover()
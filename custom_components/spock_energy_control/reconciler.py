@@ -0,0 +1,193 @@
+"""Reconciliador del estado deseado de los grupos SGReady."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import logging
+
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, State, callback
+from homeassistant.helpers.event import async_call_later, async_track_state_change_event
+from homeassistant.util import dt as dt_util
+
+_LOGGER = logging.getLogger(__name__)
+
+IGNORED_STATES = ("unknown", "unavailable")
+
+# apply(grupo, entidades, servicio, estado_deseado)
+ApplyCallback = Callable[[str, list[str], str, str], None]
+
+
+class DesiredStateReconciler:
+    """
+    Guarda la última orden aplicada a cada grupo y la mantiene.
+
+    - Solo se llama a servicios cuando la orden del grupo cambia o cuando
+      una entidad se desvía del estado deseado.
+    - Las desviaciones se corrigen tras `grace_s` segundos si persisten.
+    - Ninguna entidad se conmuta antes de `min_hold_s` segundos desde su
+      último cambio (histéresis contra el traqueteo de relés).
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        apply: ApplyCallback,
+        is_enabled: Callable[[], bool],
+        grace_s: float,
+        min_hold_s: float,
+    ) -> None:
+        """Inicializa el reconciliador."""
+        self.hass = hass
+        self._apply = apply
+        self._is_enabled = is_enabled
+        self.grace_s = grace_s
+        self.min_hold_s = min_hold_s
+
+        self._groups: dict[str, list[str]] = {}
+        self._entity_group: dict[str, str] = {}
+        self._commands: dict[str, tuple[str, str]] = {}
+        self._pending: dict[str, CALLBACK_TYPE] = {}
+        self._unsub_state: CALLBACK_TYPE | None = None
+        self.drift_corrections = 0
+
+    @callback
+    def async_set_groups(self, groups: dict[str, list[str]]) -> None:
+        """Define las entidades de cada grupo y se suscribe a sus cambios."""
+        if groups == self._groups:
+            return
+        for group, entity_ids in groups.items():
+            if self._groups.get(group) != entity_ids:
+                # Las entidades nuevas deben comprobarse con la próxima orden
+                self._commands.pop(group, None)
+        self._groups = {group: list(entity_ids) for group, entity_ids in groups.items()}
+        self._entity_group = {
+            entity_id: group
+            for group, entity_ids in self._groups.items()
+            for entity_id in entity_ids
+        }
+
+        for entity_id in list(self._pending):
+            if entity_id not in self._entity_group:
+                self._pending.pop(entity_id)()
+
+        if self._unsub_state is not None:
+            self._unsub_state()
+            self._unsub_state = None
+        if self._entity_group:
+            self._unsub_state = async_track_state_change_event(
+                self.hass, list(self._entity_group), self._async_state_changed
+            )
+
+    @callback
+    def async_stop(self) -> None:
+        """Cancela suscripciones y temporizadores."""
+        if self._unsub_state is not None:
+            self._unsub_state()
+            self._unsub_state = None
+        while self._pending:
+            self._pending.popitem()[1]()
+
+    @callback
+    def async_resync(self) -> None:
+        """Olvida las órdenes aplicadas para revisar todo con la siguiente."""
+        self._commands.clear()
+
+    @callback
+    def async_set_command(self, group: str, service: str, desired_state: str) -> list[str]:
+        """
+        Registra la orden de un grupo. Solo actúa si es una transición.
+        Devuelve las entidades sobre las que se ha actuado.
+        """
+        command = (service, desired_state)
+        if self._commands.get(group) == command:
+            return []
+        self._commands[group] = command
+        return self._async_enforce(group, self._groups.get(group, []))
+
+    @callback
+    def _async_enforce(self, group: str, entity_ids: list[str]) -> list[str]:
+        """Conmuta las entidades del grupo que no estén en el estado deseado."""
+        service, desired_state = self._commands[group]
+        to_action: list[str] = []
+
+        for entity_id in entity_ids:
+            state = self.hass.states.get(entity_id)
+            if not state:
+                _LOGGER.warning(
+                    "No se pudo encontrar el estado de la entidad '%s' (grupo %s). Se omitirá.",
+                    entity_id,
+                    group
+                )
+                continue
+            if state.state == desired_state or state.state in IGNORED_STATES:
+                self._async_cancel_pending(entity_id)
+                continue
+
+            hold = self._hold_remaining(state)
+            if hold > 0:
+                _LOGGER.debug("%s cambió hace poco; se conmutará en %.0f s", entity_id, hold)
+                self._async_schedule_check(entity_id, hold)
+                continue
+
+            to_action.append(entity_id)
+
+        if to_action:
+            self._apply(group, to_action, service, desired_state)
+        return to_action
+
+    def _hold_remaining(self, state: State) -> float:
+        """Segundos que faltan para poder conmutar la entidad."""
+        if not self.min_hold_s:
+            return 0.0
+        elapsed = (dt_util.utcnow() - state.last_changed).total_seconds()
+        return max(0.0, self.min_hold_s - elapsed)
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Detecta desviaciones respecto a la orden vigente."""
+        entity_id: str = event.data["entity_id"]
+        new_state: State | None = event.data.get("new_state")
+        group = self._entity_group.get(entity_id)
+        if group is None or group not in self._commands or new_state is None:
+            return
+
+        desired_state = self._commands[group][1]
+        if new_state.state == desired_state or new_state.state in IGNORED_STATES:
+            self._async_cancel_pending(entity_id)
+            return
+
+        if not self._is_enabled():
+            return
+
+        _LOGGER.debug(
+            "Desviación detectada en %s (%s, se esperaba %s)",
+            entity_id,
+            new_state.state,
+            desired_state,
+        )
+        if entity_id not in self._pending:
+            self._async_schedule_check(entity_id, self.grace_s)
+
+    @callback
+    def _async_schedule_check(self, entity_id: str, delay: float) -> None:
+        """Programa la revisión de una entidad."""
+        self._async_cancel_pending(entity_id)
+
+        @callback
+        def _check(_now) -> None:
+            self._pending.pop(entity_id, None)
+            group = self._entity_group.get(entity_id)
+            if group is None or group not in self._commands or not self._is_enabled():
+                return
+            if self._async_enforce(group, [entity_id]):
+                self.drift_corrections += 1
+                _LOGGER.info(
+                    "Corrigiendo desviación de %s (grupo %s)", entity_id, group
+                )
+
+        self._pending[entity_id] = async_call_later(self.hass, delay, _check)
+
+    @callback
+    def _async_cancel_pending(self, entity_id: str) -> None:
+        """Cancela la revisión pendiente de una entidad."""
+        if (unsub := self._pending.pop(entity_id, None)) is not None:
+            unsub()
@@ -0,0 +1,115 @@
+"""Planificación SGReady cacheada (day-ahead) para Spock Energy Control."""
+from __future__ import annotations
+
+from bisect import bisect_right
+from datetime import datetime
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+GROUPS = ("green", "yellow")
+
+
+class SgReadySchedule:
+    """
+    Lista ordenada de estados green/yellow planificados.
+
+    Cada tramo empieza en `start` y dura hasta el siguiente; el último
+    termina en `end` si el servidor lo indica. Sin `end`, el inicio del
+    último tramo marca el horizonte de la caché.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Inicializa la planificación."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.schedule"
+        )
+        self._starts: list[datetime] = []
+        self._states: list[dict[str, str]] = []
+        self.horizon: datetime | None = None
+
+    def __len__(self) -> int:
+        """Número de tramos en caché."""
+        return len(self._starts)
+
+    async def async_load(self) -> None:
+        """Carga la planificación guardada."""
+        data = await self._store.async_load()
+        if data:
+            self._parse(data.get("slots", []))
+            _LOGGER.debug("Planificación SGReady cargada: %s tramos", len(self))
+
+    def update(self, slots: Any) -> bool:
+        """
+        Sustituye la planificación por la recibida de la API.
+        Devuelve True si ha cambiado.
+        """
+        previous = (list(self._starts), list(self._states), self.horizon)
+        self._parse(slots)
+        if previous == (self._starts, self._states, self.horizon):
+            return False
+
+        self._store.async_delay_save(self._data_to_save, 1)
+        _LOGGER.info(
+            "Planificación SGReady actualizada: %s tramos hasta %s", len(self), self.horizon
+        )
+        return True
+
+    def _parse(self, slots: Any) -> None:
+        """Valida y ordena los tramos recibidos."""
+        parsed: list[tuple[datetime, dict[str, str]]] = []
+        horizon: datetime | None = None
+
+        for slot in slots if isinstance(slots, list) else []:
+            if not isinstance(slot, dict):
+                continue
+            start = dt_util.parse_datetime(str(slot.get("start", "")))
+            if start is None or any(slot.get(group) not in ("start", "stop") for group in GROUPS):
+                _LOGGER.debug("Tramo de planificación ignorado: %s", slot)
+                continue
+            parsed.append((dt_util.as_utc(start), {group: slot[group] for group in GROUPS}))
+
+            end = dt_util.parse_datetime(str(slot.get("end", "")))
+            if end is not None and (horizon is None or end > horizon):
+                horizon = dt_util.as_utc(end)
+
+        parsed.sort(key=lambda item: item[0])
+        self._starts = [start for start, _ in parsed]
+        self._states = [state for _, state in parsed]
+        if horizon is None and self._starts:
+            horizon = self._starts[-1]
+        self.horizon = horizon
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Datos a persistir."""
+        slots = [
+            {"start": start.isoformat(), **state}
+            for start, state in zip(self._starts, self._states)
+        ]
+        if slots and self.horizon is not None:
+            slots[-1]["end"] = self.horizon.isoformat()
+        return {"slots": slots}
+
+    def state_at(self, when: datetime) -> dict[str, str] | None:
+        """Estado planificado en `when`, o None fuera de la caché."""
+        if self.horizon is None or when >= self.horizon:
+            return None
+        index = bisect_right(self._starts, when) - 1
+        if index < 0:
+            return None
+        return dict(self._states[index])
+
+    def next_boundary(self, after: datetime) -> datetime | None:
+        """Siguiente inicio de tramo posterior a `after`."""
+        index = bisect_right(self._starts, after)
+        if index >= len(self._starts):
+            return None
+        return self._starts[index]
@@ -0,0 +1,95 @@
+"""Planificador adaptativo del sondeo de estado de Spock."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+import random
+
+from homeassistant.util import dt as dt_util
+
+# Margen tras la hora de cambio anunciada para leer ya el estado nuevo
+TRANSITION_MARGIN_S = 2
+
+
+def parse_retry_after(value: str | None, now: datetime) -> float | None:
+    """Interpreta Retry-After (segundos o fecha HTTP). Devuelve segundos."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=dt_util.UTC)
+    return max(0.0, (when - now).total_seconds())
+
+
+class AdaptivePollScheduler:
+    """
+    Calcula el intervalo del siguiente sondeo.
+
+    - Guarda el ETag para pedir el estado de forma condicional.
+    - Respeta Retry-After y la hora del próximo cambio anunciada por el
+      servidor, acercando el sondeo a esa transición.
+    - Ante errores aplica backoff exponencial con jitter.
+    """
+
+    def __init__(self, base_interval_s: float, min_interval_s: float, max_interval_s: float) -> None:
+        """Inicializa el planificador."""
+        self.base_interval_s = base_interval_s
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self.etag: str | None = None
+        self.errors = 0
+        self._retry_after_s: float | None = None
+        self._next_change_at: datetime | None = None
+        self.interval_s: float = base_interval_s
+
+    def request_headers(self) -> dict[str, str]:
+        """Cabeceras para una petición condicional."""
+        if self.etag:
+            return {"If-None-Match": self.etag}
+        return {}
+
+    def record_success(
+        self,
+        etag: str | None,
+        retry_after_s: float | None,
+        next_change_at: datetime | None,
+    ) -> None:
+        """Registra una respuesta válida (200 o 304)."""
+        self.errors = 0
+        if etag:
+            self.etag = etag
+        self._retry_after_s = retry_after_s
+        self._next_change_at = next_change_at
+
+    def record_error(self, retry_after_s: float | None = None) -> None:
+        """Registra un fallo de la API."""
+        self.errors += 1
+        self._retry_after_s = retry_after_s
+
+    def next_interval(self, now: datetime | None = None) -> timedelta:
+        """Devuelve el intervalo hasta el siguiente sondeo."""
+        now = now or dt_util.utcnow()
+        interval = self.base_interval_s
+
+        if self.errors:
+            backoff = min(self.max_interval_s, self.base_interval_s * 2**self.errors)
+            interval = random.uniform(backoff / 2, backoff)
+        elif self._next_change_at is not None:
+            until_change = (self._next_change_at - now).total_seconds() + TRANSITION_MARGIN_S
+            if 0 < until_change < interval:
+                interval = until_change
+
+        interval = max(self.min_interval_s, min(self.max_interval_s, interval))
+
+        # Retry-After manda sobre los límites propios
+        if self._retry_after_s is not None:
+            interval = max(interval, self._retry_after_s)
+
+        self.interval_s = interval
+        return timedelta(seconds=interval)
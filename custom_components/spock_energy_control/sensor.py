@@ -1,17 +1,28 @@
 from __future__ import annotations
 
+from collections.abc import Callable
+from dataclasses import dataclass
 import logging
 from typing import Any
 
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfPower, UnitOfTime
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers.entity import DeviceInfo
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import (
+    RestoreSensor,
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
 
+from .breaker import BREAKER_STATES
 from .const import DOMAIN
 from . import SpockEnergyCoordinator  # Importar el coordinador desde init.py
+from .transport import ENDPOINT_STATUS, ENDPOINT_TELEMETRY
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -21,6 +32,257 @@ SENSOR_TYPES: tuple[tuple[str, str], ...] = (
     ("yellow", "Yellow Devices Status"),
 )
 
+# Entidades con más fallos que se muestran en los atributos; la tabla
+# completa está en los diagnósticos
+TOP_FAILING_ENTITIES = 5
+
+
+@dataclass(frozen=True, kw_only=True)
+class SpockDiagnosticSensorEntityDescription(SensorEntityDescription):
+    """Describe un sensor de diagnóstico leído del coordinador."""
+
+    value_fn: Callable[[SpockEnergyCoordinator], Any]
+    attrs_fn: Callable[[SpockEnergyCoordinator], dict[str, Any]] | None = None
+
+
+# Sensores de diagnóstico (estado interno del coordinador)
+DIAGNOSTIC_SENSORS: tuple[SpockDiagnosticSensorEntityDescription, ...] = (
+    SpockDiagnosticSensorEntityDescription(
+        key="telemetry_queue_depth",
+        translation_key="telemetry_queue_depth",
+        icon="mdi:tray-full",
+        native_unit_of_measurement="records",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda coordinator: len(coordinator.telemetry_queue),
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="telemetry_replay_throughput",
+        translation_key="telemetry_replay_throughput",
+        icon="mdi:upload-multiple",
+        native_unit_of_measurement="records/min",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda coordinator: coordinator.telemetry_queue.replay_throughput,
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="poll_interval",
+        translation_key="poll_interval",
+        icon="mdi:timer-sync-outline",
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        suggested_display_precision=0,
+        value_fn=lambda coordinator: coordinator.scheduler.interval_s,
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="cycle_duration",
+        translation_key="cycle_duration",
+        icon="mdi:timer-outline",
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=3,
+        value_fn=lambda coordinator: coordinator.metrics.last_cycle_s,
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="status_latency",
+        translation_key="status_latency",
+        icon="mdi:speedometer",
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=3,
+        value_fn=lambda coordinator: coordinator.hub.transport.latency[
+            ENDPOINT_STATUS
+        ].percentile(50),
+        attrs_fn=lambda coordinator: coordinator.hub.transport.latency[
+            ENDPOINT_STATUS
+        ].percentiles(),
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="telemetry_latency",
+        translation_key="telemetry_latency",
+        icon="mdi:speedometer",
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=3,
+        value_fn=lambda coordinator: coordinator.hub.transport.latency[
+            ENDPOINT_TELEMETRY
+        ].percentile(50),
+        attrs_fn=lambda coordinator: coordinator.hub.transport.latency[
+            ENDPOINT_TELEMETRY
+        ].percentiles(),
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="telemetry_sent",
+        translation_key="telemetry_sent",
+        icon="mdi:upload",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda coordinator: coordinator.metrics.telemetry_sent,
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="telemetry_failed",
+        translation_key="telemetry_failed",
+        icon="mdi:upload-off",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda coordinator: coordinator.metrics.telemetry_failed,
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="telemetry_suppressed",
+        translation_key="telemetry_suppressed",
+        icon="mdi:filter-outline",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda coordinator: coordinator.telemetry_filter.suppressed,
+        attrs_fn=lambda coordinator: {
+            "sent": coordinator.telemetry_filter.sent,
+            "suppression_ratio": coordinator.telemetry_filter.suppression_ratio,
+        },
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="power_sensors",
+        translation_key="power_sensors",
+        icon="mdi:flash",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda coordinator: len(coordinator.power_index.power_sensors),
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="service_calls",
+        translation_key="service_calls",
+        icon="mdi:gesture-tap",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda coordinator: coordinator.actuation.service_calls,
+        attrs_fn=lambda coordinator: {
+            service: {
+                "calls": stats.calls,
+                "entities": stats.entities,
+                "avg_ms": round(stats.total_s / stats.calls * 1000, 2) if stats.calls else None,
+            }
+            for service, stats in coordinator.actuation.call_stats.items()
+        },
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="last_status_age",
+        translation_key="last_status_age",
+        icon="mdi:clock-alert-outline",
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=0,
+        value_fn=lambda coordinator: coordinator.metrics.seconds_since_status(),
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="status_breaker",
+        translation_key="status_breaker",
+        icon="mdi:electric-switch",
+        device_class=SensorDeviceClass.ENUM,
+        options=BREAKER_STATES,
+        value_fn=lambda coordinator: coordinator.hub.transport.breakers[ENDPOINT_STATUS].state,
+        attrs_fn=lambda coordinator: {
+            "trips": coordinator.hub.transport.breakers[ENDPOINT_STATUS].trips,
+        },
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="telemetry_breaker",
+        translation_key="telemetry_breaker",
+        icon="mdi:electric-switch",
+        device_class=SensorDeviceClass.ENUM,
+        options=BREAKER_STATES,
+        value_fn=lambda coordinator: coordinator.hub.transport.breakers[ENDPOINT_TELEMETRY].state,
+        attrs_fn=lambda coordinator: {
+            "trips": coordinator.hub.transport.breakers[ENDPOINT_TELEMETRY].trips,
+        },
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="breaker_trips",
+        translation_key="breaker_trips",
+        icon="mdi:counter",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda coordinator: sum(
+            breaker.trips for breaker in coordinator.hub.transport.breakers.values()
+        ),
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="rate_limited",
+        translation_key="rate_limited",
+        icon="mdi:speedometer-slow",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda coordinator: sum(
+            bucket.throttled + bucket.deferred
+            for bucket in coordinator.hub.transport.limiter.buckets.values()
+        ),
+        attrs_fn=lambda coordinator: {
+            endpoint: bucket.as_dict()
+            for endpoint, bucket in coordinator.hub.transport.limiter.buckets.items()
+        },
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="dispatched_power",
+        translation_key="dispatched_power",
+        icon="mdi:scale-balance",
+        native_unit_of_measurement=UnitOfPower.WATT,
+        device_class=SensorDeviceClass.POWER,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda coordinator: (
+            coordinator.dispatcher.plan.planned_w
+            if coordinator.dispatcher and coordinator.dispatcher.plan
+            else None
+        ),
+        attrs_fn=lambda coordinator: (
+            {
+                "target_w": (
+                    coordinator.dispatcher.plan.target_w if coordinator.dispatcher.plan else None
+                ),
+                "selected": (
+                    coordinator.dispatcher.plan.selected if coordinator.dispatcher.plan else []
+                ),
+                "typical_draw_w": coordinator.dispatcher.typical_draws(),
+            }
+            if coordinator.dispatcher
+            else {}
+        ),
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="startup_duration",
+        translation_key="startup_duration",
+        icon="mdi:timer-play-outline",
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        suggested_display_precision=3,
+        value_fn=lambda coordinator: coordinator.startup_duration_s,
+        attrs_fn=lambda coordinator: {
+            "first_refresh_s": coordinator.first_refresh_duration_s,
+        },
+    ),
+    SpockDiagnosticSensorEntityDescription(
+        key="actuation_failures",
+        translation_key="actuation_failures",
+        icon="mdi:toggle-switch-off-outline",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda coordinator: coordinator.actuation.total_failures,
+        attrs_fn=lambda coordinator: _actuation_failure_attrs(coordinator),
+    ),
+)
+
+
+def _actuation_failure_attrs(coordinator: SpockEnergyCoordinator) -> dict[str, Any]:
+    """Totales de actuación y las entidades que más fallan."""
+    stats = coordinator.actuation.stats
+    latencies = [s.last_latency_s for s in stats.values() if s.last_latency_s is not None]
+    failing = sorted(
+        (item for item in stats.items() if item[1].failures),
+        key=lambda item: item[1].failures,
+        reverse=True,
+    )
+    return {
+        "entities": len(stats),
+        "attempts": sum(s.attempts for s in stats.values()),
+        "failing_entities": len(failing),
+        "max_latency_s": max(latencies, default=None),
+        "top_failing": {
+            entity_id: {"failures": s.failures, "attempts": s.attempts}
+            for entity_id, s in failing[:TOP_FAILING_ENTITIES]
+        },
+    }
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -37,12 +299,21 @@ async def async_setup_entry(
         SpockApiStatusSensor(coordinator, entry, data_key, name)
         for data_key, name in SENSOR_TYPES
     ]
+    entities_to_add.extend(
+        SpockDiagnosticSensor(coordinator, entry, description)
+        for description in DIAGNOSTIC_SENSORS
+    )
 
-    async_add_entities(entities_to_add, True)
+    # Sin update_before_add: no se fuerza un fetch al añadir las entidades
+    async_add_entities(entities_to_add)
 
 
-class SpockApiStatusSensor(CoordinatorEntity[SpockEnergyCoordinator], SensorEntity):
-    """Sensor que representa el estado (start/stop) de un grupo de dispositivos."""
+class SpockApiStatusSensor(CoordinatorEntity[SpockEnergyCoordinator], RestoreSensor):
+    """
+    Sensor que representa el estado (start/stop) de un grupo de dispositivos.
+
+    Hasta el primer fetch muestra el último valor conocido antes del reinicio.
+    """
 
     _attr_has_entity_name = True
 
@@ -56,6 +327,7 @@ class SpockApiStatusSensor(CoordinatorEntity[SpockEnergyCoordinator], SensorEnti
         """Inicializa el sensor."""
         super().__init__(coordinator)  # Enlazar con el coordinador
         self._data_key = data_key
+        self._restored_value: str | None = None
         
         # --- Atributos de la entidad ---
         self._attr_name = name
@@ -72,11 +344,17 @@ class SpockApiStatusSensor(CoordinatorEntity[SpockEnergyCoordinator], SensorEnti
             model="API Status",
         )
 
+    async def async_added_to_hass(self) -> None:
+        """Restaura el último estado conocido."""
+        await super().async_added_to_hass()
+        if (last := await self.async_get_last_sensor_data()) is not None:
+            self._restored_value = last.native_value
+
     @property
     def native_value(self) -> str | None:
         """Devuelve el estado actual ('start' o 'stop') desde el coordinador."""
         if not self.coordinator.data:
-            return None
+            return self._restored_value
         
         # Acceder a self.coordinator.data["green"] o self.coordinator.data["yellow"]
         return self.coordinator.data.get(self._data_key)
@@ -94,3 +372,47 @@ class SpockApiStatusSensor(CoordinatorEntity[SpockEnergyCoordinator], SensorEnti
         
         # Desconocido
         return "mdi:help-rhombus-outline"
+
+
+class SpockDiagnosticSensor(CoordinatorEntity[SpockEnergyCoordinator], SensorEntity):
+    """Sensor de diagnóstico con el estado interno del coordinador."""
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    entity_description: SpockDiagnosticSensorEntityDescription
+
+    def __init__(
+        self,
+        coordinator: SpockEnergyCoordinator,
+        entry: ConfigEntry,
+        description: SpockDiagnosticSensorEntityDescription,
+    ) -> None:
+        """Inicializa el sensor."""
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._attr_unique_id = f"{entry.entry_id}_{description.key}"
+
+        # Mismo dispositivo que los sensores de estado
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, entry.entry_id)},
+            name="Spock Energy Control Status",
+            manufacturer="Spock",
+            model="API Status",
+        )
+
+    @property
+    def available(self) -> bool:
+        """El diagnóstico está disponible aunque falle la API."""
+        return True
+
+    @property
+    def native_value(self) -> Any:
+        """Devuelve el valor actual desde el coordinador."""
+        return self.entity_description.value_fn(self.coordinator)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Detalle adicional, si la descripción lo define."""
+        if self.entity_description.attrs_fn is None:
+            return None
+        return self.entity_description.attrs_fn(self.coordinator)
@@ -0,0 +1,84 @@
+"""Servicios de Spock Energy Control."""
+from __future__ import annotations
+
+from datetime import timedelta
+import logging
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import (
+    ATTR_CYCLES,
+    ATTR_DURATION,
+    DEFAULT_PROFILE_CYCLES,
+    DEFAULT_RECORD_MINUTES,
+    DOMAIN,
+    MAX_PROFILE_CYCLES,
+    MAX_RECORD_MINUTES,
+    SERVICE_PROFILE,
+    SERVICE_RECORD,
+)
+from .profiler import DATA_PROFILER, async_get_profiler
+
+_LOGGER = logging.getLogger(__name__)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CYCLES, default=DEFAULT_PROFILE_CYCLES): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=MAX_PROFILE_CYCLES)
+        ),
+    }
+)
+
+RECORD_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_DURATION, default=DEFAULT_RECORD_MINUTES): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=MAX_RECORD_MINUTES)
+        ),
+    }
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Registra los servicios de la integración (una sola vez)."""
+    if hass.services.has_service(DOMAIN, SERVICE_PROFILE):
+        return
+
+    async def _async_profile(call: ServiceCall) -> None:
+        profiler = async_get_profiler(hass)
+        if not profiler.async_arm(call.data[ATTR_CYCLES]):
+            raise HomeAssistantError("Ya hay un perfilado en curso")
+        # Adelantar el siguiente ciclo de cada planta
+        for entry_data in hass.data.get(DOMAIN, {}).values():
+            await entry_data["coordinator"].async_request_refresh()
+
+    async def _async_record(call: ServiceCall) -> None:
+        duration = timedelta(minutes=call.data[ATTR_DURATION])
+        paths = [
+            path
+            for entry_data in hass.data.get(DOMAIN, {}).values()
+            if (path := entry_data["coordinator"].session_recorder.async_start(duration))
+        ]
+        if not paths:
+            raise HomeAssistantError("Ya hay una grabación en curso")
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_PROFILE, _async_profile, schema=PROFILE_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_RECORD, _async_record, schema=RECORD_SCHEMA
+    )
+
+
+@callback
+def async_unload_services(hass: HomeAssistant) -> None:
+    """Quita los servicios cuando no queda ninguna entrada."""
+    if hass.data.get(DOMAIN):
+        return
+    hass.services.async_remove(DOMAIN, SERVICE_PROFILE)
+    hass.services.async_remove(DOMAIN, SERVICE_RECORD)
+    if (profiler := hass.data.pop(DATA_PROFILER, None)) is not None:
+        profiler.async_cancel()
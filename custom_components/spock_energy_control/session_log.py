@@ -0,0 +1,241 @@
+"""Grabación de sesiones del bucle de control para reproducirlas después."""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components import persistent_notification
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_state_change_event,
+    async_track_time_interval,
+)
+from homeassistant.helpers.json import json_bytes
+from homeassistant.util import dt as dt_util
+from homeassistant.util.json import json_loads
+
+from .const import DOMAIN, SESSION_FLUSH_INTERVAL_S
+
+if TYPE_CHECKING:
+    from . import SpockEnergyCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+SESSION_LOG_VERSION = 1
+
+# Tipos de evento. Cada línea del fichero (salvo la cabecera) es una
+# lista JSON [t, tipo, ...] con t en segundos desde el inicio:
+#   [t, "status", http, cuerpo]      respuesta de estado (cuerpo solo con 200)
+#   [t, "status_error", clase]       fallo de red al pedir el estado
+#   [t, "push", cuerpo]              orden recibida por el canal push
+#   [t, "power", entidad, valor]     lectura de un sensor de potencia
+#   [t, "state", entidad, estado]    estado de una entidad controlada
+#   [t, "call", dominio, servicio, [entidades]]  llamada de la integración
+EVENT_STATUS = "status"
+EVENT_STATUS_ERROR = "status_error"
+EVENT_PUSH = "push"
+EVENT_POWER = "power"
+EVENT_STATE = "state"
+EVENT_CALL = "call"
+
+
+@dataclass
+class SessionLog:
+    """Sesión grabada: la instalación (cabecera) y sus eventos en orden."""
+
+    started: datetime
+    green: list[str]
+    yellow: list[str]
+    # sensor de potencia -> entidades controladas de su dispositivo
+    power_sensors: dict[str, list[str]]
+    events: list[list[Any]] = field(default_factory=list)
+
+    @property
+    def duration_s(self) -> float:
+        """Segundos entre el inicio y el último evento."""
+        return self.events[-1][0] if self.events else 0.0
+
+
+def load_session_log(path: str) -> SessionLog:
+    """Lee una sesión grabada (bloqueante: ejecutar fuera del event loop)."""
+    with open(path, "rb") as log_file:
+        header = json_loads(log_file.readline())
+        if not isinstance(header, dict) or header.get("version") != SESSION_LOG_VERSION:
+            raise ValueError(f"Cabecera de sesión no válida: {header}")
+        started = dt_util.parse_datetime(header["started"])
+        if started is None:
+            raise ValueError(f"Inicio de sesión no válido: {header['started']}")
+        log = SessionLog(
+            started, header["green"], header["yellow"], header["power_sensors"]
+        )
+        for line in log_file:
+            if line.strip():
+                log.events.append(json_loads(line))
+    return log
+
+
+class SessionRecorder:
+    """
+    Graba en un fichero de solo añadir lo que ve un coordinador: respuestas
+    de estado, lecturas de potencia, estados de las entidades controladas
+    y las llamadas a servicios que hace la integración.
+
+    Los eventos se acumulan en memoria y se añaden al fichero cada
+    SESSION_FLUSH_INTERVAL_S segundos desde el executor. Mientras no está
+    grabando el coordinador solo lee `active`.
+    """
+
+    def __init__(self, hass: HomeAssistant, coordinator: SpockEnergyCoordinator) -> None:
+        """Inicializa el grabador parado."""
+        self.hass = hass
+        self.coordinator = coordinator
+        self.active = False
+        self.path: str | None = None
+        self.events = 0
+        self._started = 0.0
+        self._pending: list[bytes] = []
+        self._flush_lock = asyncio.Lock()
+        self._unsubs: list[CALLBACK_TYPE] = []
+
+    @callback
+    def async_start(self, duration: timedelta) -> str | None:
+        """Graba durante `duration`. Devuelve la ruta, o None si ya estaba grabando."""
+        if self.active:
+            return None
+        coordinator = self.coordinator
+        power_sensors = {
+            sensor_id: coordinator.power_index.controlled_for_sensor(sensor_id)
+            for sensor_id in coordinator.power_index.power_sensors
+        }
+        controlled = coordinator.green_devices + coordinator.yellow_devices
+
+        stamp = dt_util.now().strftime("%Y%m%d_%H%M%S")
+        entry_id = coordinator.config_entry.entry_id
+        self.path = self.hass.config.path(f"{DOMAIN}_session_{entry_id}_{stamp}.jsonl")
+        self.active = True
+        self.events = 0
+        self._started = time.monotonic()
+        self._pending = [
+            json_bytes(
+                {
+                    "version": SESSION_LOG_VERSION,
+                    "started": dt_util.utcnow().isoformat(),
+                    "green": coordinator.green_devices,
+                    "yellow": coordinator.yellow_devices,
+                    "power_sensors": power_sensors,
+                }
+            )
+        ]
+
+        if power_sensors:
+            self._unsubs.append(
+                async_track_state_change_event(
+                    self.hass, list(power_sensors), self._async_power_changed
+                )
+            )
+        if controlled:
+            self._unsubs.append(
+                async_track_state_change_event(
+                    self.hass, controlled, self._async_controlled_changed
+                )
+            )
+        coordinator.actuation.call_listener = self.record_call
+        self._unsubs.append(
+            async_track_time_interval(
+                self.hass, self._async_flush, timedelta(seconds=SESSION_FLUSH_INTERVAL_S)
+            )
+        )
+        self._unsubs.append(
+            async_call_later(self.hass, duration, self._async_finish)
+        )
+        _LOGGER.info("Grabando la sesión de Spock Energy Control en %s", self.path)
+        return self.path
+
+    @callback
+    def async_stop(self) -> None:
+        """Deja de grabar y añade al fichero lo pendiente."""
+        if not self.active:
+            return
+        self.active = False
+        if self.coordinator.actuation.call_listener == self.record_call:
+            self.coordinator.actuation.call_listener = None
+        while self._unsubs:
+            self._unsubs.pop()()
+        self.hass.async_create_task(self._async_flush())
+
+    @callback
+    def _async_finish(self, _now: datetime) -> None:
+        """Fin de la grabación programada."""
+        self.async_stop()
+        persistent_notification.async_create(
+            self.hass,
+            f"Sesión grabada en `{self.path}` ({self.events} eventos).",
+            title="Spock Energy Control: sesión grabada",
+            notification_id=f"{DOMAIN}_session_{self.coordinator.config_entry.entry_id}",
+        )
+
+    def _record(self, *event: Any) -> None:
+        """Añade un evento con su tiempo relativo al inicio."""
+        self._pending.append(
+            json_bytes([round(time.monotonic() - self._started, 3), *event])
+        )
+        self.events += 1
+
+    def record_status(self, status: int, body: Any) -> None:
+        """Respuesta de estado de la API."""
+        if self.active:
+            self._record(EVENT_STATUS, status, body if status == 200 else None)
+
+    def record_status_error(self, kind: str) -> None:
+        """Fallo de red al pedir el estado."""
+        if self.active:
+            self._record(EVENT_STATUS_ERROR, kind)
+
+    def record_push(self, body: dict[str, Any]) -> None:
+        """Orden recibida por el canal push."""
+        if self.active:
+            self._record(EVENT_PUSH, body)
+
+    def record_call(self, domain: str, service: str, entity_ids: list[str]) -> None:
+        """Llamada a un servicio hecha por la integración."""
+        if self.active:
+            self._record(EVENT_CALL, domain, service, entity_ids)
+
+    @callback
+    def _async_power_changed(self, event: Event) -> None:
+        """Lectura de un sensor de potencia."""
+        new_state = event.data.get("new_state")
+        if new_state is None:
+            return
+        try:
+            value = float(new_state.state)
+        except ValueError:
+            return
+        self._record(EVENT_POWER, event.data["entity_id"], value)
+
+    @callback
+    def _async_controlled_changed(self, event: Event) -> None:
+        """Cambio de estado de una entidad controlada."""
+        new_state = event.data.get("new_state")
+        if new_state is not None:
+            self._record(EVENT_STATE, event.data["entity_id"], new_state.state)
+
+    async def _async_flush(self, _now: datetime | None = None) -> None:
+        """Añade los eventos acumulados al fichero."""
+        # En orden: un vaciado no empieza hasta que termina el anterior
+        async with self._flush_lock:
+            if not self._pending or self.path is None:
+                return
+            lines, self._pending = self._pending, []
+            await self.hass.async_add_executor_job(self._append, self.path, lines)
+
+    @staticmethod
+    def _append(path: str, lines: list[bytes]) -> None:
+        """Añade líneas al fichero (bloqueante)."""
+        with open(path, "ab") as log_file:
+            log_file.write(b"\n".join(lines) + b"\n")
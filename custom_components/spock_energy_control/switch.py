@@ -8,6 +8,7 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.restore_state import RestoreEntity
 
 from .const import DOMAIN
 
@@ -25,8 +26,12 @@ async def async_setup_entry(
     async_add_entities([SpockActionsSwitch(hass, entry)])
 
 
-class SpockActionsSwitch(SwitchEntity):
-    """Interruptor para controlar la ejecución de acciones SGReady."""
+class SpockActionsSwitch(SwitchEntity, RestoreEntity):
+    """
+    Interruptor para controlar la ejecución de acciones SGReady.
+
+    Su estado sobrevive a los reinicios de Home Assistant.
+    """
 
     _attr_has_entity_name = True
     _attr_translation_key = "sgready_actions" # Usará los archivos de traducción
@@ -48,6 +53,14 @@ class SpockActionsSwitch(SwitchEntity):
             model="SGReady Control",
         )
 
+    async def async_added_to_hass(self) -> None:
+        """Restaura el último estado del interruptor."""
+        await super().async_added_to_hass()
+        last_state = await self.async_get_last_state()
+        if last_state is not None and last_state.state in ("on", "off"):
+            self.hass.data[DOMAIN][self._entry_id]["run_actions"] = last_state.state == "on"
+            _LOGGER.debug("Acciones SGReady restauradas: %s", last_state.state)
+
     @property
     def is_on(self) -> bool:
         """Devuelve true si las acciones están habilitadas."""
@@ -58,6 +71,8 @@ class SpockActionsSwitch(SwitchEntity):
         """Habilita la ejecución de acciones."""
         _LOGGER.debug("Habilitando acciones SGReady")
         self.hass.data[DOMAIN][self._entry_id]["run_actions"] = True
+        # Revisar todos los grupos con la siguiente orden
+        self.hass.data[DOMAIN][self._entry_id]["coordinator"].reconciler.async_resync()
         
         self.async_write_ha_state() # Corregido de async_write_state_changed()
 
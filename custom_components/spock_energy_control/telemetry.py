@@ -0,0 +1,253 @@
+"""Buffers de telemetría para Spock Energy Control."""
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from datetime import datetime
+from typing import Any
+
+# Campos de agregados por ventana que se añaden a cada registro
+AGGREGATE_FIELDS: tuple[str, ...] = (
+    "window_s",
+    "energy_wh",
+    "power_min",
+    "power_max",
+    "power_mean",
+    "power_avg",
+    "samples",
+)
+
+
+class TelemetryBuffer:
+    """
+    Buffer en memoria de cambios de potencia por sensor.
+
+    Solo guarda las lecturas que cambian respecto a la anterior del mismo
+    sensor y limita el número de muestras pendientes por sensor (se
+    descartan las más antiguas).
+    """
+
+    def __init__(self, max_samples_per_sensor: int) -> None:
+        """Inicializa el buffer."""
+        self._max_samples = max_samples_per_sensor
+        self._samples: dict[str, deque[tuple[datetime, float]]] = {}
+        self._last_value: dict[str, float] = {}
+
+    def __len__(self) -> int:
+        """Número total de muestras pendientes de enviar."""
+        return sum(len(samples) for samples in self._samples.values())
+
+    def add(self, sensor_id: str, value: float, timestamp: datetime) -> bool:
+        """Añade una lectura. Devuelve False si no supone un cambio."""
+        if self._last_value.get(sensor_id) == value:
+            return False
+        self._last_value[sensor_id] = value
+
+        samples = self._samples.get(sensor_id)
+        if samples is None:
+            samples = self._samples[sensor_id] = deque(maxlen=self._max_samples)
+        samples.append((timestamp, value))
+        return True
+
+    def drain(self) -> dict[str, list[tuple[datetime, float]]]:
+        """Extrae y vacía todas las muestras pendientes."""
+        drained = {
+            sensor_id: list(samples)
+            for sensor_id, samples in self._samples.items()
+            if samples
+        }
+        self._samples.clear()
+        return drained
+
+    def retain(self, sensor_ids: set[str]) -> None:
+        """Olvida los sensores que ya no se siguen."""
+        for sensor_id in set(self._last_value) - sensor_ids:
+            self._last_value.pop(sensor_id, None)
+            self._samples.pop(sensor_id, None)
+
+
+class DeadbandFilter:
+    """
+    Decide por sensor si una lectura merece enviarse.
+
+    Se envía si el valor (o la media de la ventana) se aleja del último
+    enviado más que la banda muerta, max(absolute_w, relative * |último|),
+    o si han pasado `heartbeat_s` segundos desde el último envío.
+    """
+
+    def __init__(self, absolute_w: float, relative: float, heartbeat_s: float) -> None:
+        """Inicializa el filtro."""
+        self.absolute_w = absolute_w
+        self.relative = relative
+        self.heartbeat_s = heartbeat_s
+        # sensor -> (valor enviado, ts epoch del envío)
+        self._last_sent: dict[str, tuple[float, float]] = {}
+        self.sent = 0
+        self.suppressed = 0
+
+    @property
+    def suppression_ratio(self) -> float:
+        """Fracción de lecturas no enviadas."""
+        total = self.sent + self.suppressed
+        return round(self.suppressed / total, 3) if total else 0.0
+
+    def should_send(
+        self, sensor_id: str, value: float, ts: float, window_avg: float | None = None
+    ) -> bool:
+        """Indica si la lectura se envía; si es así la toma como enviada."""
+        last = self._last_sent.get(sensor_id)
+        if (
+            last is None
+            or ts - last[1] >= self.heartbeat_s
+            or self._significant(last[0], value)
+            or (window_avg is not None and self._significant(last[0], window_avg))
+        ):
+            self._last_sent[sensor_id] = (value, ts)
+            self.sent += 1
+            return True
+
+        self.suppressed += 1
+        return False
+
+    def retain(self, sensor_ids: set[str]) -> None:
+        """Olvida los sensores que ya no se siguen."""
+        for sensor_id in set(self._last_sent) - sensor_ids:
+            self._last_sent.pop(sensor_id)
+
+    def _significant(self, reference: float, value: float) -> bool:
+        """El cambio supera la banda muerta."""
+        return abs(value - reference) > max(self.absolute_w, self.relative * abs(reference))
+
+
+class PowerAggregator:
+    """
+    Agregados por ventana de cada sensor de potencia.
+
+    Con cada cambio de estado integra la energía (potencia anterior por
+    tiempo transcurrido) y actualiza mínimo, máximo, suma y número de
+    muestras. Al cerrar la ventana devuelve los agregados y empieza otra
+    con el valor vigente. Los datos de cada sensor ocupan una posición en
+    arrays de doubles, sin objetos por muestra.
+    """
+
+    def __init__(self) -> None:
+        """Inicializa el agregador vacío."""
+        self._slots: dict[str, int] = {}
+        self._free: list[int] = []
+        self._window_start = array("d")
+        self._last_ts = array("d")
+        self._last_value = array("d")
+        self._energy_ws = array("d")
+        self._min = array("d")
+        self._max = array("d")
+        self._sum = array("d")
+        self._count = array("q")
+
+    def __len__(self) -> int:
+        """Número de sensores seguidos."""
+        return len(self._slots)
+
+    def __contains__(self, sensor_id: object) -> bool:
+        """Indica si el sensor se está siguiendo."""
+        return sensor_id in self._slots
+
+    def track(self, sensor_id: str, value: float, ts: float) -> None:
+        """Empieza a seguir un sensor con su valor actual."""
+        if sensor_id in self._slots:
+            return
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self._count)
+            for column in (
+                self._window_start,
+                self._last_ts,
+                self._last_value,
+                self._energy_ws,
+                self._min,
+                self._max,
+                self._sum,
+            ):
+                column.append(0.0)
+            self._count.append(0)
+
+        self._slots[sensor_id] = slot
+        self._window_start[slot] = self._last_ts[slot] = ts
+        self._reset(slot, value)
+
+    def add(self, sensor_id: str, value: float, ts: float) -> None:
+        """Añade una lectura (ts en segundos epoch)."""
+        slot = self._slots.get(sensor_id)
+        if slot is None:
+            self.track(sensor_id, value, ts)
+            return
+
+        self._integrate(slot, ts)
+        self._last_value[slot] = value
+        if value < self._min[slot]:
+            self._min[slot] = value
+        if value > self._max[slot]:
+            self._max[slot] = value
+        self._sum[slot] += value
+        self._count[slot] += 1
+
+    def close_window(self, sensor_id: str, ts: float) -> dict[str, Any] | None:
+        """
+        Cierra la ventana del sensor en `ts` y devuelve sus agregados, o
+        None si el sensor no se sigue o la ventana está vacía.
+        """
+        slot = self._slots.get(sensor_id)
+        if slot is None:
+            return None
+        self._integrate(slot, ts)
+        window_s = ts - self._window_start[slot]
+        if window_s <= 0:
+            return None
+
+        count = self._count[slot]
+        last_value = self._last_value[slot]
+        energy_ws = self._energy_ws[slot]
+        aggregates = {
+            "window_s": round(window_s, 1),
+            "energy_wh": round(energy_ws / 3600, 4),
+            "power_min": self._min[slot],
+            "power_max": self._max[slot],
+            "power_mean": round(self._sum[slot] / count if count else last_value, 2),
+            "power_avg": round(energy_ws / window_s, 2),
+            "samples": count,
+        }
+        self._window_start[slot] = ts
+        self._reset(slot, last_value)
+        return aggregates
+
+    def window_avg(self, sensor_id: str, ts: float) -> float | None:
+        """Media ponderada en el tiempo de la ventana abierta, sin cerrarla."""
+        slot = self._slots.get(sensor_id)
+        if slot is None:
+            return None
+        window_s = ts - self._window_start[slot]
+        if window_s <= 0:
+            return None
+        pending_s = max(0.0, ts - self._last_ts[slot])
+        energy_ws = self._energy_ws[slot] + self._last_value[slot] * pending_s
+        return energy_ws / window_s
+
+    def retain(self, sensor_ids: set[str]) -> None:
+        """Olvida los sensores que ya no se siguen y libera sus posiciones."""
+        for sensor_id in set(self._slots) - sensor_ids:
+            self._free.append(self._slots.pop(sensor_id))
+
+    def _integrate(self, slot: int, ts: float) -> None:
+        """Acumula la energía del valor vigente hasta `ts`."""
+        elapsed = ts - self._last_ts[slot]
+        if elapsed > 0:
+            self._energy_ws[slot] += self._last_value[slot] * elapsed
+            self._last_ts[slot] = ts
+
+    def _reset(self, slot: int, value: float) -> None:
+        """Empieza una ventana nueva con el valor vigente."""
+        self._last_value[slot] = value
+        self._energy_ws[slot] = 0.0
+        self._min[slot] = self._max[slot] = value
+        self._sum[slot] = 0.0
+        self._count[slot] = 0
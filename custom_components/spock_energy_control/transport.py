@@ -0,0 +1,311 @@
+"""Transporte HTTP para los endpoints de Spock."""
+from __future__ import annotations
+
+import asyncio
+from bisect import bisect_left
+from collections import deque
+from dataclasses import dataclass, field
+import logging
+import time
+from typing import Any
+
+import aiohttp
+from multidict import CIMultiDict
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.helpers.json import json_bytes
+from homeassistant.util import dt as dt_util
+from homeassistant.util.json import json_loads
+
+from .breaker import CircuitBreaker
+from .const import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_TIMEOUT_S,
+    HARDCODED_API_URL,
+    HARDCODED_API_URL_TELEMETRIA,
+    METRICS_LATENCY_WINDOW,
+    RATE_CONTROL_BURST,
+    RATE_CONTROL_MAX_WAIT_S,
+    RATE_CONTROL_PER_S,
+    RATE_DEFAULT_RETRY_AFTER_S,
+    RATE_MIN_PER_S,
+    RATE_TELEMETRY_BURST,
+    RATE_TELEMETRY_MAX_WAIT_S,
+    RATE_TELEMETRY_PER_S,
+    TRANSPORT_CONNECT_TIMEOUT_S,
+    TRANSPORT_MAX_IN_FLIGHT,
+    TRANSPORT_READ_TIMEOUT_S,
+    TRANSPORT_TOTAL_TIMEOUT_S,
+)
+from .ratelimit import SpockRateLimiter, TokenBucket
+from .scheduler import parse_retry_after
+
+_LOGGER = logging.getLogger(__name__)
+
+# --- Endpoints ---
+ENDPOINT_STATUS = "status"
+ENDPOINT_TELEMETRY = "telemetry"
+
+ENDPOINT_URLS: dict[str, str] = {
+    ENDPOINT_STATUS: HARDCODED_API_URL,
+    ENDPOINT_TELEMETRY: HARDCODED_API_URL_TELEMETRIA,
+}
+
+# --- Clasificación de errores ---
+ERROR_TIMEOUT = "timeout"
+ERROR_CONNECT = "connect"
+ERROR_PROTOCOL = "protocol"
+ERROR_AUTH = "auth"
+ERROR_THROTTLED = "throttled"
+ERROR_CLIENT = "client"
+ERROR_SERVER = "server"
+ERROR_CIRCUIT_OPEN = "circuit_open"
+# Petición no enviada: el limitador local no tenía presupuesto
+ERROR_RATE_LIMITED = "rate_limited"
+
+# Clases de error que cuentan como fallo para el circuit breaker
+BREAKER_FAILURES = (ERROR_TIMEOUT, ERROR_CONNECT, ERROR_PROTOCOL, ERROR_THROTTLED, ERROR_SERVER)
+
+# Espera máxima por un token de cada endpoint
+RATE_MAX_WAIT_S: dict[str, float] = {
+    ENDPOINT_STATUS: RATE_CONTROL_MAX_WAIT_S,
+    ENDPOINT_TELEMETRY: RATE_TELEMETRY_MAX_WAIT_S,
+}
+
+# Límites (segundos) de los buckets del histograma de latencia
+LATENCY_BUCKETS_S: tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def classify_status(status: int) -> str | None:
+    """Clase de error de un código HTTP, o None si no es un error."""
+    if status < 400:
+        return None
+    if status in (401, 403):
+        return ERROR_AUTH
+    if status == 429:
+        return ERROR_THROTTLED
+    if status < 500:
+        return ERROR_CLIENT
+    return ERROR_SERVER
+
+
+class SpockTransportError(Exception):
+    """Error de red al hablar con la API de Spock."""
+
+    def __init__(self, kind: str, message: str) -> None:
+        """Inicializa el error con su clase."""
+        super().__init__(message)
+        self.kind = kind
+
+
+@dataclass
+class SpockResponse:
+    """Respuesta HTTP ya leída."""
+
+    status: int
+    headers: CIMultiDict[str] = field(default_factory=CIMultiDict)
+    body: Any = None
+    text: str = ""
+
+    @property
+    def error_kind(self) -> str | None:
+        """Clase de error de la respuesta, o None si fue correcta."""
+        return classify_status(self.status)
+
+
+class LatencyHistogram:
+    """
+    Histograma de latencias con buckets fijos. Guarda además las últimas
+    muestras para calcular percentiles recientes.
+    """
+
+    def __init__(self) -> None:
+        """Inicializa el histograma vacío."""
+        self.counts = [0] * (len(LATENCY_BUCKETS_S) + 1)
+        self.total_s = 0.0
+        self.samples = 0
+        self._recent: deque[float] = deque(maxlen=METRICS_LATENCY_WINDOW)
+
+    def observe(self, seconds: float) -> None:
+        """Añade una muestra."""
+        self.counts[bisect_left(LATENCY_BUCKETS_S, seconds)] += 1
+        self.total_s += seconds
+        self.samples += 1
+        self._recent.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        """Percentil `q` (0-100) de las muestras recientes, en segundos."""
+        if not self._recent:
+            return None
+        ordered = sorted(self._recent)
+        index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+        return round(ordered[index], 3)
+
+    def percentiles(self) -> dict[str, float | None]:
+        """p50, p90 y p99 de las muestras recientes."""
+        return {f"p{q}": self.percentile(q) for q in (50, 90, 99)}
+
+    def as_dict(self) -> dict[str, Any]:
+        """Representación serializable."""
+        labels = [f"le_{bound}" for bound in LATENCY_BUCKETS_S] + ["le_inf"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.samples,
+            "sum_s": round(self.total_s, 3),
+            **self.percentiles(),
+        }
+
+
+class SpockTransport:
+    """
+    Sesión HTTP propia para los endpoints de Spock.
+
+    Usa el pool de conexiones compartido de Home Assistant (keep-alive,
+    caché DNS y SSL los gestiona su conector) y limita las peticiones en
+    curso a Spock; aplica timeouts separados de conexión y lectura;
+    clasifica los errores de forma uniforme y registra la latencia de
+    cada endpoint.
+    """
+
+    def __init__(self, hass: HomeAssistant, api_token: str) -> None:
+        """Inicializa el transporte (la sesión se crea al primer uso)."""
+        self.hass = hass
+        self.api_token = api_token
+        self._session: aiohttp.ClientSession | None = None
+        self._in_flight = asyncio.Semaphore(TRANSPORT_MAX_IN_FLIGHT)
+        self._timeout = aiohttp.ClientTimeout(
+            total=TRANSPORT_TOTAL_TIMEOUT_S,
+            sock_connect=TRANSPORT_CONNECT_TIMEOUT_S,
+            sock_read=TRANSPORT_READ_TIMEOUT_S,
+        )
+        self.latency: dict[str, LatencyHistogram] = {
+            endpoint: LatencyHistogram() for endpoint in ENDPOINT_URLS
+        }
+        self.errors: dict[str, dict[str, int]] = {endpoint: {} for endpoint in ENDPOINT_URLS}
+        self.breakers: dict[str, CircuitBreaker] = {
+            endpoint: CircuitBreaker(endpoint, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT_S)
+            for endpoint in ENDPOINT_URLS
+        }
+        self.limiter = SpockRateLimiter(
+            {
+                ENDPOINT_STATUS: TokenBucket(
+                    RATE_CONTROL_PER_S, RATE_CONTROL_BURST, RATE_MIN_PER_S
+                ),
+                ENDPOINT_TELEMETRY: TokenBucket(
+                    RATE_TELEMETRY_PER_S, RATE_TELEMETRY_BURST, RATE_MIN_PER_S
+                ),
+            },
+            priority=ENDPOINT_STATUS,
+        )
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Sesión sobre el conector de Home Assistant con los timeouts propios.
+        La comparten varias entradas (hub), así que se libera a mano.
+        """
+        if self._session is None or self._session.closed:
+            self._session = async_create_clientsession(
+                self.hass, auto_cleanup=False, timeout=self._timeout
+            )
+        return self._session
+
+    async def async_close(self) -> None:
+        """Libera la sesión; las conexiones son del conector compartido."""
+        if self._session is not None and not self._session.closed:
+            self._session.detach()
+        self._session = None
+
+    def _count_error(self, endpoint: str, kind: str) -> None:
+        """Cuenta un error por endpoint y clase."""
+        errors = self.errors[endpoint]
+        errors[kind] = errors.get(kind, 0) + 1
+        if kind in BREAKER_FAILURES:
+            self.breakers[endpoint].record_failure()
+
+    async def async_post(
+        self,
+        endpoint: str,
+        payload: Any,
+        headers: dict[str, str] | None = None,
+    ) -> SpockResponse:
+        """
+        POST a un endpoint de Spock. Devuelve la respuesta sea cual sea su
+        código HTTP; los fallos de red se elevan como SpockTransportError.
+        `payload` puede llegar ya codificado en bytes.
+
+        Con el circuit breaker del endpoint abierto no se hace la petición
+        ni se gasta un token del limitador. Cada petición consume un token;
+        si no llega a tiempo se eleva un error `rate_limited` sin contactar
+        con el servidor.
+        """
+        breaker = self.breakers[endpoint]
+        if not breaker.allow_request():
+            self._count_error(endpoint, ERROR_CIRCUIT_OPEN)
+            raise SpockTransportError(ERROR_CIRCUIT_OPEN, f"Circuito abierto en {endpoint}")
+
+        try:
+            acquired = await self.limiter.async_acquire(endpoint, RATE_MAX_WAIT_S[endpoint])
+        except asyncio.CancelledError:
+            breaker.abort()
+            raise
+        if not acquired:
+            # La petición de prueba del breaker semiabierto no llegó a salir
+            breaker.abort()
+            self._count_error(endpoint, ERROR_RATE_LIMITED)
+            raise SpockTransportError(
+                ERROR_RATE_LIMITED, f"Límite de peticiones alcanzado en {endpoint}"
+            )
+
+        request_headers = {
+            "X-Auth-Token": self.api_token,
+            "Content-Type": "application/json",
+            **(headers or {}),
+        }
+        body = payload if isinstance(payload, bytes) else json_bytes(payload)
+        await self._in_flight.acquire()
+        started = time.monotonic()
+
+        try:
+            async with self._get_session().post(
+                ENDPOINT_URLS[endpoint], headers=request_headers, data=body
+            ) as resp:
+                response = SpockResponse(resp.status, resp.headers.copy())
+                if resp.status == 304:
+                    pass
+                elif resp.status < 300:
+                    try:
+                        response.body = await resp.json(content_type=None, loads=json_loads)
+                    except ValueError:
+                        response.body = None
+                else:
+                    response.text = await resp.text()
+        except asyncio.CancelledError:
+            self.breakers[endpoint].abort()
+            raise
+        except asyncio.TimeoutError as err:
+            self._count_error(endpoint, ERROR_TIMEOUT)
+            raise SpockTransportError(ERROR_TIMEOUT, f"Timeout en {endpoint}") from err
+        except aiohttp.ClientConnectionError as err:
+            self._count_error(endpoint, ERROR_CONNECT)
+            raise SpockTransportError(ERROR_CONNECT, f"Error de conexión en {endpoint}: {err}") from err
+        except aiohttp.ClientError as err:
+            self._count_error(endpoint, ERROR_PROTOCOL)
+            raise SpockTransportError(ERROR_PROTOCOL, f"Error HTTP en {endpoint}: {err}") from err
+        finally:
+            self.latency[endpoint].observe(time.monotonic() - started)
+            self._in_flight.release()
+
+        if (kind := response.error_kind) is not None:
+            self._count_error(endpoint, kind)
+        if kind not in BREAKER_FAILURES:
+            self.breakers[endpoint].record_success()
+
+        retry_after = parse_retry_after(response.headers.get("Retry-After"), dt_util.utcnow())
+        if response.status == 429 or (retry_after is not None and response.status >= 500):
+            self.limiter.record_throttled(
+                endpoint, RATE_DEFAULT_RETRY_AFTER_S if retry_after is None else retry_after
+            )
+        elif kind is None:
+            self.limiter.record_success(endpoint)
+        return response